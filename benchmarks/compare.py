@@ -0,0 +1,77 @@
+"""
+Compare two benchmark result files (e.g. from two commits).
+
+Usage:
+    python benchmarks/compare.py baseline.json candidate.json [--metric p50] [--threshold 0.10]
+
+Prints one line per (case, size) with the chosen latency metric, the
+throughput and the peak RSS of both runs. Exits with status 1 if any case
+got slower than the threshold allows, so it can gate CI.
+"""
+import argparse
+import json
+import sys
+
+
+def load_results(path):
+    """Return {(case, size): result} from a run_benchmarks.py report."""
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    return report.get("meta", {}), {
+        (result["case"], result["size"]): result for result in report["results"]
+    }
+
+
+def format_change(old, new):
+    """Return a relative change such as '+12.5%' (or '' when unknown)."""
+    if not old or new is None:
+        return ""
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare benchmark results")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--metric", default="p50",
+                        choices=["min", "mean", "p50", "p90", "p99", "max"])
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="allowed latency increase before failing (default: 10%%)")
+    args = parser.parse_args()
+
+    old_meta, old_results = load_results(args.baseline)
+    new_meta, new_results = load_results(args.candidate)
+    print(f"baseline:  {old_meta.get('git_commit')} ({old_meta.get('timestamp')})")
+    print(f"candidate: {new_meta.get('git_commit')} ({new_meta.get('timestamp')})")
+    print()
+
+    header = (f"{'case':<26} {'size':>8} {args.metric + ' old':>12} {args.metric + ' new':>12} "
+              f"{'change':>9} {'ops/s new':>11} {'rss KiB new':>12}")
+    print(header)
+    print("-" * len(header))
+
+    regressions = []
+    for key in sorted(set(old_results) | set(new_results), key=lambda k: (k[0], k[1] or 0)):
+        old = old_results.get(key)
+        new = new_results.get(key)
+        old_latency = old["latency_ms"][args.metric] if old else None
+        new_latency = new["latency_ms"][args.metric] if new else None
+        case, size = key
+        print(f"{case:<26} {size if size is not None else '-':>8} "
+              f"{old_latency if old_latency is not None else '-':>12} "
+              f"{new_latency if new_latency is not None else '-':>12} "
+              f"{format_change(old_latency, new_latency):>9} "
+              f"{new['ops_per_s'] if new else '-':>11} "
+              f"{new['peak_rss_kb'] if new else '-':>12}")
+        if old_latency and new_latency and new_latency > old_latency * (1 + args.threshold):
+            regressions.append(key)
+
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than the {args.threshold:.0%} threshold:")
+        for case, size in regressions:
+            print(f"  - {case} ({size})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Load test for movie_server.py.
+
+Starts the server in-process against a database (or targets a running one
+with --url), then hammers a mix of endpoints from several client threads for
+a fixed duration. A share of the requests revalidate with If-None-Match, as
+a caching client would, to exercise the 304 path.
+
+Usage:
+    python benchmarks/load_test_server.py --size 100k --threads 16 --duration 10
+    python benchmarks/load_test_server.py --url http://127.0.0.1:8000 --conditional 0.8
+
+Prints throughput, status counts and latency percentiles (ms); --output
+writes the same figures as JSON.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from run_benchmarks import parse_size, percentile  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+SEARCH_TERMS = ("night", "the dark", "star", "love", "ghost", "iron", "zero", "empire")
+
+
+def request_paths(rng, max_id, pages):
+    """Yield an endless, weighted mix of API paths."""
+    while True:
+        roll = rng.random()
+        if roll < 0.4:
+            yield f"/movies?page={rng.randint(1, max(1, min(pages, 20)))}&per_page=50"
+        elif roll < 0.7:
+            yield f"/movies/{rng.randint(1, max(1, max_id))}"
+        elif roll < 0.9:
+            yield f"/movies/search?q={rng.choice(SEARCH_TERMS).replace(' ', '+')}&per_page=20"
+        else:
+            yield "/stats"
+
+
+def client(base_url, deadline, conditional, seed, max_id, pages, results):
+    """Issue requests over one keep-alive connection until the deadline."""
+    rng = random.Random(seed)
+    parts = urlsplit(base_url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+    etags = {}
+    latencies = []
+    statuses = {}
+    paths = request_paths(rng, max_id, pages)
+    while time.perf_counter() < deadline:
+        path = next(paths)
+        headers = {}
+        if path in etags and rng.random() < conditional:
+            headers["If-None-Match"] = etags[path]
+        start = time.perf_counter()
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            statuses["error"] = statuses.get("error", 0) + 1
+            connection.close()
+            connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status] = statuses.get(response.status, 0) + 1
+        etag = response.getheader("ETag")
+        if etag:
+            etags[path] = etag
+    connection.close()
+    results.append((latencies, statuses))
+
+
+def run_load(base_url, threads, duration, conditional, max_id, pages):
+    """Run the clients and return a summary dict."""
+    results = []
+    deadline = time.perf_counter() + duration
+    workers = [
+        threading.Thread(target=client,
+                         args=(base_url, deadline, conditional, seed, max_id, pages, results))
+        for seed in range(threads)
+    ]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for thread_latencies, _ in results for latency in thread_latencies)
+    statuses = {}
+    for _, thread_statuses in results:
+        for status, number in thread_statuses.items():
+            statuses[str(status)] = statuses.get(str(status), 0) + number
+
+    def ms(value):
+        return round(value * 1000, 3) if value is not None else None
+
+    return {
+        "threads": threads,
+        "duration_s": round(elapsed, 3),
+        "requests": len(latencies),
+        "requests_per_s": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "statuses": statuses,
+        "latency_ms": {
+            "min": ms(latencies[0]) if latencies else None,
+            "p50": ms(percentile(latencies, 0.50)),
+            "p90": ms(percentile(latencies, 0.90)),
+            "p99": ms(percentile(latencies, 0.99)),
+            "max": ms(latencies[-1]) if latencies else None
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the movie JSON API")
+    parser.add_argument("--url", help="test a running server instead of starting one")
+    parser.add_argument("--size", type=parse_size, default=10000,
+                        help="synthetic library size when starting the server (default: 10k)")
+    parser.add_argument("--db", help="database to serve instead of a synthetic one")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds (default: 5)")
+    parser.add_argument("--conditional", type=float, default=0.5,
+                        help="share of repeat requests sent with If-None-Match (default: 0.5)")
+    parser.add_argument("--output", "-o", help="write the summary as JSON to this file")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+        max_id, pages = args.size, args.size // 50
+    else:
+        db_path = args.db or os.path.join(DATA_DIR, f"movies_{args.size}.db")
+        if not args.db:
+            from synthetic_db import create_database
+            create_database(db_path, args.size)
+        os.environ["MOVIES_DB_URL"] = f"sqlite:///{os.path.abspath(db_path)}"
+        os.environ.setdefault("MOVIES_DB_POOL_SIZE", str(args.threads))
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        import movie_server
+        import movie_storage_sql
+
+        max_id = movie_storage_sql.get_change_marker()[1] or 1
+        pages = movie_storage_sql.count_movies() // 50
+        server, base_url = movie_server.start_server()
+
+    print(f"Load testing {base_url} with {args.threads} threads for {args.duration}s", file=sys.stderr)
+    try:
+        summary = run_load(base_url, args.threads, args.duration, args.conditional, max_id, pages)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    summary["url"] = base_url
+    latency = summary["latency_ms"]
+    print(f"{summary['requests']} requests in {summary['duration_s']}s "
+          f"({summary['requests_per_s']} req/s)")
+    print(f"statuses: {summary['statuses']}")
+    print(f"latency ms: p50 {latency['p50']}  p90 {latency['p90']}  "
+          f"p99 {latency['p99']}  max {latency['max']}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
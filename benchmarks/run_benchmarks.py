@@ -0,0 +1,447 @@
+"""
+Reproducible benchmarks for storage, CLI paths, site generation and the API layer.
+
+Each library size runs in its own worker process against a synthetic
+movies.db (see synthetic_db.py), so the module-level database engine, the
+caches and the peak RSS figures are isolated per size. API lookups run
+against the offline OMDb stub (omdb_stub_server.py), never the live API.
+
+Usage:
+    python benchmarks/run_benchmarks.py --sizes 1k,100k,1m --output results.json
+    python benchmarks/compare.py baseline.json results.json
+
+Every result records iterations, total time, throughput, latency
+percentiles (ms) and peak RSS (KiB) for the case.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+DATA_DIR = os.path.join(BENCH_DIR, "data")
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# ---------- Measurement helpers ----------
+class NullWriter:
+    """stdout replacement that discards (but counts) output."""
+
+    def __init__(self):
+        self.bytes_written = 0
+
+    def write(self, text):
+        self.bytes_written += len(text)
+        return len(text)
+
+    def isatty(self):
+        return False
+
+    def flush(self):
+        pass
+
+
+def parse_size(value):
+    """Parse '1000', '100k' or '1m' into an integer."""
+    value = value.strip().lower()
+    multiplier = {"k": 1000, "m": 1000000}.get(value[-1:], 1)
+    if multiplier != 1:
+        value = value[:-1]
+    return int(float(value) * multiplier)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def reset_peak_rss():
+    """Reset the kernel's peak-RSS counter (Linux only); return True on success."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_kb():
+    """Return the peak resident set size in KiB."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def measure(case, size, fn, repeat, max_seconds, items=None, warmup=True):
+    """
+    Time ``fn`` up to ``repeat`` times (stopping once ``max_seconds`` is used).
+
+    Args:
+        items (int): work items per call (rows, requests...), for throughput
+
+    Returns:
+        dict: the result record for this case
+    """
+    peak_scope = "case" if reset_peak_rss() else "process"
+    if warmup:
+        fn()
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+        if time.perf_counter() - started > max_seconds:
+            break
+    total = sum(latencies)
+    latencies.sort()
+    result = {
+        "case": case,
+        "size": size,
+        "iterations": len(latencies),
+        "total_s": round(total, 6),
+        "ops_per_s": round(len(latencies) / total, 3) if total else None,
+        "latency_ms": {
+            "min": round(latencies[0] * 1000, 3),
+            "mean": round(total / len(latencies) * 1000, 3),
+            "p50": round(percentile(latencies, 0.50) * 1000, 3),
+            "p90": round(percentile(latencies, 0.90) * 1000, 3),
+            "p99": round(percentile(latencies, 0.99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3)
+        },
+        "peak_rss_kb": peak_rss_kb(),
+        "peak_rss_scope": peak_scope
+    }
+    if items:
+        result["items_per_call"] = items
+        result["items_per_s"] = round(items * len(latencies) / total, 1) if total else None
+    return result
+
+
+def measure_requests(case, size, calls, concurrency=1):
+    """
+    Run independent calls (e.g. API lookups), timing each one.
+
+    Throughput is calls per wall-clock second; latency is per call.
+    """
+    peak_scope = "case" if reset_peak_rss() else "process"
+
+    def timed(call):
+        t0 = time.perf_counter()
+        call()
+        return time.perf_counter() - t0
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(timed, calls))
+    else:
+        latencies = [timed(call) for call in calls]
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "case": case,
+        "size": size,
+        "iterations": len(latencies),
+        "concurrency": concurrency,
+        "total_s": round(wall, 6),
+        "ops_per_s": round(len(latencies) / wall, 3) if wall else None,
+        "latency_ms": {
+            "min": round(latencies[0] * 1000, 3),
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3),
+            "p50": round(percentile(latencies, 0.50) * 1000, 3),
+            "p90": round(percentile(latencies, 0.90) * 1000, 3),
+            "p99": round(percentile(latencies, 0.99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3)
+        },
+        "peak_rss_kb": peak_rss_kb(),
+        "peak_rss_scope": peak_scope
+    }
+
+
+# ---------- Benchmark cases (run inside a worker process) ----------
+def storage_and_cli_cases(size, repeat, max_seconds):
+    """Storage reads, CLI list/sort/search/stats and site generation."""
+    import movie_storage_sql
+    import movie_app
+    import website_generator
+
+    results = []
+    sink = NullWriter()
+    quiet = contextlib.redirect_stdout(sink)
+
+    results.append(measure("storage.list_movies", size, movie_storage_sql.list_movies,
+                           repeat, max_seconds, items=size))
+
+    # Re-applies the current ratings of up to 1000 movies, so the data set
+    # stays unchanged between runs
+    batch = [(movie["id"], movie["user_rating"])
+             for movie in movie_storage_sql.iter_movies(order_by="added", limit=1000)]
+    results.append(measure("storage.update_ratings_batch", size,
+                           lambda: movie_storage_sql.update_ratings_batch(batch),
+                           repeat, max_seconds, items=len(batch)))
+
+    try:
+        import movie_analytics
+        import numpy  # noqa: F401
+    except ImportError:
+        movie_analytics = None
+    if movie_analytics is not None:
+        results.append(measure("analytics.load_columns", size, movie_analytics.load_columns,
+                               repeat, max_seconds, items=size))
+        columns = movie_analytics.load_columns()
+        # A fresh dict each time, so the derived rating codes are not reused
+        results.append(measure("analytics.summarize", size,
+                               lambda: movie_analytics.summarize(dict(columns, _prepared=None)),
+                               repeat, max_seconds, items=size))
+        del columns
+
+    with tempfile.TemporaryDirectory() as copy_dir:
+        # Diffing against an identical copy still pairs and compares every movie
+        copy_path = os.path.join(copy_dir, "copy.db")
+        with sqlite3.connect(movie_storage_sql.engine.url.database) as source, \
+                sqlite3.connect(copy_path) as copy:
+            source.backup(copy)
+        results.append(measure("storage.diff_database", size,
+                               lambda: sum(1 for _ in movie_storage_sql.diff_database(copy_path)),
+                               repeat, max_seconds, items=size))
+        results.append(measure("storage.merge_database_dry_run", size,
+                               lambda: movie_storage_sql.merge_database(copy_path, "max", dry_run=True),
+                               repeat, max_seconds, items=size))
+
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        import movie_snapshot
+
+        snapshot_path = os.path.join(snapshot_dir, "movies.snapshot")
+        results.append(measure("snapshot.write", size,
+                               lambda: movie_snapshot.write_snapshot(snapshot_path),
+                               repeat, max_seconds, items=size))
+
+        def open_and_search():
+            with movie_snapshot.MovieSnapshot(snapshot_path) as snapshot:
+                movies = snapshot.as_mapping()
+                return [title for title in movies if "night" in title.lower()]
+
+        results.append(measure("snapshot.open_and_search", size, open_and_search,
+                               repeat, max_seconds, items=size))
+
+    # The CLI prompts are answered by a module-level stand-in for input()
+    movie_app.input = lambda prompt="": "night"
+    cli_cases = [
+        ("cli.list_movies", movie_app.list_movies),
+        ("cli.sort_by_rating", movie_app.sort_movies_by_rating),
+        ("cli.sort_by_year", movie_app.sort_movies_by_year),
+        ("cli.search", movie_app.search_movie),
+        ("cli.stats", movie_app.show_stats),
+        ("cli.random_movie", movie_app.random_movie)
+    ]
+    for case, fn in cli_cases:
+        with quiet:
+            results.append(measure(case, size, fn, repeat, max_seconds, items=size))
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        website_generator.OUTPUT_DIR = output_dir
+        website_generator.IMAGES_DIR = os.path.join(output_dir, "images")
+        movies = movie_storage_sql.get_movies()
+        with quiet:
+            results.append(measure("site.generate_html", size,
+                                   lambda: website_generator.generate_html(movies, use_cache=False),
+                                   repeat, max_seconds, items=size))
+            # The first iteration fills the fragment cache, later ones reuse it
+            results.append(measure("site.generate_html_fragment_cache", size,
+                                   lambda: website_generator.generate_html(movies, use_cache=True),
+                                   repeat, max_seconds, items=size))
+            results.append(measure("site.generate_website", size,
+                                   lambda: website_generator.generate_website(open_browser=False),
+                                   repeat, max_seconds, items=size))
+        del movies
+    return results
+
+
+def api_cases(requests_count, concurrency, latency_ms):
+    """OMDb lookups against the local stub: cold, warm, concurrent, paged, with errors."""
+    from omdb_stub_server import start_stub_server
+
+    server, base_url = start_stub_server(synthesize=True, latency_ms=latency_ms, seed=7)
+    faulty_server, faulty_url = start_stub_server(synthesize=True, latency_ms=latency_ms,
+                                                  error_rate=0.2, seed=7)
+    os.environ["OMDB_BASE_URL"] = base_url
+    import movie_api
+
+    movie_api.BASE_URL = base_url
+    movie_api.RETRY_BACKOFF = 0.01
+    titles = [f"Benchmark Movie {number}" for number in range(requests_count)]
+    results = []
+    with contextlib.redirect_stdout(NullWriter()):
+        movie_api.clear_cache()
+        results.append(measure_requests(
+            "api.lookup_cold", None,
+            [lambda t=t: movie_api.get_movie_with_rating(t) for t in titles]
+        ))
+        results.append(measure_requests(
+            "api.lookup_cached", None,
+            [lambda t=t: movie_api.get_movie_with_rating(t) for t in titles]
+        ))
+        movie_api.clear_cache()
+        results.append(measure_requests(
+            "api.lookup_concurrent", None,
+            [lambda t=t: movie_api.get_movie_with_rating(t) for t in titles],
+            concurrency=concurrency
+        ))
+        movie_api.clear_cache()
+        results.append(measure_requests(
+            "api.paged_search", None,
+            [lambda: sum(1 for _ in movie_api.PagedSearch("Benchmark"))]
+        ))
+
+        movie_api.BASE_URL = faulty_url
+        movie_api.clear_cache()
+        results.append(measure_requests(
+            "api.lookup_with_errors", None,
+            [lambda t=t: movie_api.get_movie_with_rating(t) for t in titles]
+        ))
+        movie_api.BASE_URL = base_url
+    movie_api.shutdown_prefetch()
+    server.shutdown()
+    faulty_server.shutdown()
+    return results
+
+
+def run_worker(args):
+    """Benchmark one library size in this process and write the results."""
+    from synthetic_db import create_database
+
+    db_path = os.path.join(args.data_dir, f"movies_{args.worker_size}.db")
+    started = time.perf_counter()
+    create_database(db_path, args.worker_size, args.seed)
+    setup_seconds = time.perf_counter() - started
+
+    os.environ["MOVIES_DB_URL"] = f"sqlite:///{os.path.abspath(db_path)}"
+    sys.path.insert(0, REPO_DIR)
+    os.chdir(REPO_DIR)
+
+    results = storage_and_cli_cases(args.worker_size, args.repeat, args.max_seconds)
+    if args.api:
+        results += api_cases(args.api_requests, args.concurrency, args.api_latency_ms)
+
+    with open(args.worker_output, "w", encoding="utf-8") as f:
+        json.dump({"setup_s": round(setup_seconds, 3), "results": results}, f)
+
+
+def git_commit():
+    """Return the current commit hash (and whether the tree is dirty)."""
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO_DIR,
+                                         stderr=subprocess.DEVNULL, text=True).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"],
+                                             cwd=REPO_DIR, stderr=subprocess.DEVNULL, text=True).strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Movie app benchmark suite")
+    parser.add_argument("--sizes", default="1k,100k,1m",
+                        help="comma-separated library sizes (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case")
+    parser.add_argument("--max-seconds", type=float, default=30.0,
+                        help="stop repeating a case after this long")
+    parser.add_argument("--api-requests", type=int, default=200)
+    parser.add_argument("--api-latency-ms", type=float, default=20.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--no-api", action="store_true", help="skip the API layer cases")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", default=DATA_DIR,
+                        help="where synthetic databases are cached")
+    parser.add_argument("--output", "-o", help="write JSON here (default: stdout)")
+    # Internal: run one size in a worker process
+    parser.add_argument("--worker-size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--worker-output", help=argparse.SUPPRESS)
+    parser.add_argument("--api", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker_size is not None:
+        run_worker(args)
+        return
+
+    sizes = [parse_size(size) for size in args.sizes.split(",") if size.strip()]
+    commit, dirty = git_commit()
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": commit,
+            "git_dirty": dirty,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sqlite": sqlite3.sqlite_version,
+            "sizes": sizes,
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "api_requests": args.api_requests,
+            "api_latency_ms": args.api_latency_ms,
+            "concurrency": args.concurrency
+        },
+        "setup_s": {},
+        "results": []
+    }
+
+    for index, size in enumerate(sizes):
+        print(f"Benchmarking {size} movies...", file=sys.stderr)
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+            worker_output = tmp.name
+        command = [
+            sys.executable, os.path.abspath(__file__),
+            "--worker-size", str(size), "--worker-output", worker_output,
+            "--repeat", str(args.repeat), "--max-seconds", str(args.max_seconds),
+            "--api-requests", str(args.api_requests),
+            "--api-latency-ms", str(args.api_latency_ms),
+            "--concurrency", str(args.concurrency),
+            "--seed", str(args.seed), "--data-dir", os.path.abspath(args.data_dir)
+        ]
+        if index == 0 and not args.no_api:
+            command.append("--api")
+        try:
+            subprocess.run(command, check=True, cwd=BENCH_DIR)
+            with open(worker_output, encoding="utf-8") as f:
+                worker = json.load(f)
+        finally:
+            os.unlink(worker_output)
+        report["setup_s"][str(size)] = worker["setup_s"]
+        report["results"].extend(worker["results"])
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
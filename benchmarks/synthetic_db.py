@@ -0,0 +1,85 @@
+"""
+Generate synthetic movies.db libraries for benchmarking.
+
+The schema is created by importing movie_storage_sql (so benchmarks always
+run against the current schema and indexes); rows are then bulk-inserted
+with the sqlite3 module. Generation is deterministic for a given size and
+seed, so results from different commits are comparable.
+
+Usage:
+    python benchmarks/synthetic_db.py 100000 benchmarks/data/movies_100000.db
+"""
+import os
+import random
+import sqlite3
+import sys
+
+WORDS = (
+    "Night", "Return", "Dark", "City", "Love", "Last", "Star", "Dead", "King",
+    "Blue", "Secret", "Lost", "War", "Summer", "Shadow", "Island", "Ghost",
+    "River", "Fire", "Dream", "Road", "Stranger", "Iron", "Silent", "Golden",
+    "Wild", "Empire", "Storm", "Midnight", "Heart", "Game", "House", "Edge",
+    "Time", "Crime", "Zero", "Paradise", "Hunter", "Angel", "Machine"
+)
+BATCH_SIZE = 10000
+
+
+def synthetic_rows(size, seed=42):
+    """Yield (title, year, omdb_rating, user_rating, poster, imdb_id) tuples."""
+    rng = random.Random(seed)
+    for number in range(1, size + 1):
+        words = rng.sample(WORDS, rng.randint(1, 3))
+        if rng.random() < 0.3:
+            title = f"The {' '.join(words)}"
+        else:
+            title = " ".join(words)
+        if rng.random() < 0.2:
+            title += f": {rng.choice(WORDS)} {rng.choice(WORDS)}"
+        title = f"{title} {number}"
+        year = rng.randint(1920, 2025)
+        omdb_rating = round(rng.uniform(1.0, 9.9), 1)
+        user_rating = round(rng.uniform(0.0, 10.0), 1) if rng.random() < 0.3 else None
+        yield title, year, omdb_rating, user_rating, None, f"tt{number:08d}"
+
+
+def populate(db_path, size, seed=42):
+    """Fill an (empty) movies table with ``size`` synthetic rows."""
+    connection = sqlite3.connect(db_path)
+    try:
+        existing = connection.execute("SELECT COUNT(*) FROM movies").fetchone()[0]
+        if existing == size:
+            return
+        connection.execute("DELETE FROM movies")
+        rows = synthetic_rows(size, seed)
+        while True:
+            batch = [row for _, row in zip(range(BATCH_SIZE), rows)]
+            if not batch:
+                break
+            connection.executemany(
+                "INSERT INTO movies (title, year, omdb_rating, user_rating, poster, imdb_id) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                batch
+            )
+        connection.commit()
+        connection.execute("ANALYZE")
+    finally:
+        connection.close()
+
+
+def create_database(db_path, size, seed=42):
+    """Create the schema via movie_storage_sql, then populate it."""
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    os.environ["MOVIES_DB_URL"] = f"sqlite:///{os.path.abspath(db_path)}"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import movie_storage_sql  # noqa: F401  (creates the schema on import)
+
+    movie_storage_sql.engine.dispose()
+    populate(db_path, size, seed)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+    create_database(sys.argv[2], int(sys.argv[1]))
+    print(f"Created {sys.argv[2]} with {sys.argv[1]} movies")
@@ -0,0 +1,240 @@
+"""
+Lightweight timing spans and counters for the movie app's hot paths.
+
+Everything is off unless the MOVIE_TRACE environment variable is set. While
+it is unset, span() hands out a shared no-op context manager, count() returns
+at once and traced() leaves functions undecorated, so the disabled cost is
+one call; once it is set, spans and counters are recorded.
+
+MOVIE_TRACE is a comma-separated list of outputs:
+
+    MOVIE_TRACE=1                          summary table on stderr at exit
+    MOVIE_TRACE=summary,json=trace.json    ... plus a Chrome/Perfetto trace
+    MOVIE_TRACE=profile=run.prof           cProfile dump (main thread)
+
+Example:
+    from instrumentation import span, count
+
+    with span("db.list_movies"):
+        rows = connection.execute(query).fetchall()
+        count("db.rows_read", len(rows))
+"""
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+# Keep at most this many individual span events for the JSON trace;
+# per-name aggregates are always complete.
+MAX_EVENTS = 200000
+
+
+def _parse_options(value):
+    """Turn the MOVIE_TRACE value into {"summary": True, "json": path, ...}."""
+    options = {}
+    for part in (value or "").split(","):
+        part = part.strip()
+        if not part or part.lower() in ("0", "false", "off"):
+            continue
+        name, _, argument = part.partition("=")
+        options[name.strip().lower()] = argument.strip() or True
+    if options.keys() & {"1", "true", "on"}:
+        for flag in ("1", "true", "on"):
+            options.pop(flag, None)
+        options["summary"] = True
+    return options
+
+
+OPTIONS = _parse_options(os.environ.get("MOVIE_TRACE"))
+ENABLED = bool(OPTIONS)
+
+_lock = threading.Lock()
+_origin = time.perf_counter()
+_spans = {}      # name -> [calls, total seconds, min, max]
+_counters = {}   # name -> value
+_events = []     # (name, start, duration, thread id, attributes)
+_profiler = None
+
+
+class _NullSpan:
+    """Shared do-nothing span used while instrumentation is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """Times one block and records it on exit."""
+
+    __slots__ = ("name", "attributes", "start")
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        _record(self.name, self.start, duration, self.attributes)
+        return False
+
+    def set(self, **attributes):
+        """Attach attributes (rows, bytes, ...) to the span's trace event."""
+        self.attributes.update(attributes)
+
+
+def _record(name, start, duration, attributes):
+    with _lock:
+        stats = _spans.get(name)
+        if stats is None:
+            _spans[name] = [1, duration, duration, duration]
+        else:
+            stats[0] += 1
+            stats[1] += duration
+            if duration < stats[2]:
+                stats[2] = duration
+            if duration > stats[3]:
+                stats[3] = duration
+        if len(_events) < MAX_EVENTS:
+            _events.append((name, start, duration, threading.get_ident(), attributes))
+
+
+def span(name, **attributes):
+    """Return a context manager timing the enclosed block as ``name``."""
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(name, attributes)
+
+
+def count(name, value=1):
+    """Add ``value`` to the counter ``name``."""
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def traced(name):
+    """Decorator timing every call of a function (no-op when disabled)."""
+    def decorator(function):
+        if not ENABLED:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with _Span(name, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    """Return the aggregated spans and counters collected so far."""
+    with _lock:
+        return {
+            "spans": {
+                name: {
+                    "calls": calls,
+                    "total_ms": round(total * 1000, 3),
+                    "mean_ms": round(total / calls * 1000, 3),
+                    "min_ms": round(low * 1000, 3),
+                    "max_ms": round(high * 1000, 3)
+                }
+                for name, (calls, total, low, high) in _spans.items()
+            },
+            "counters": dict(_counters)
+        }
+
+
+def summary_table():
+    """Return the spans and counters as a plain-text table."""
+    data = snapshot()
+    lines = [f"{'span':<32} {'calls':>8} {'total ms':>12} {'mean ms':>10} {'max ms':>10}"]
+    lines.append("-" * len(lines[0]))
+    for name, stats in sorted(data["spans"].items(), key=lambda item: -item[1]["total_ms"]):
+        lines.append(f"{name:<32} {stats['calls']:>8} {stats['total_ms']:>12.3f} "
+                     f"{stats['mean_ms']:>10.3f} {stats['max_ms']:>10.3f}")
+    if data["counters"]:
+        lines.append("")
+        lines.append(f"{'counter':<32} {'value':>12}")
+        lines.append("-" * 45)
+        for name, value in sorted(data["counters"].items()):
+            lines.append(f"{name:<32} {value:>12}")
+    return "\n".join(lines)
+
+
+def export_json(path):
+    """Write a Chrome trace-event file (open in chrome://tracing or Perfetto)."""
+    with _lock:
+        events = list(_events)
+    trace = {
+        "traceEvents": [
+            {
+                "name": name,
+                "cat": name.split(".", 1)[0],
+                "ph": "X",
+                "ts": round((start - _origin) * 1e6, 1),
+                "dur": round(duration * 1e6, 1),
+                "pid": os.getpid(),
+                "tid": thread_id,
+                "args": attributes
+            }
+            for name, start, duration, thread_id, attributes in events
+        ],
+        "otherData": snapshot()
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(trace, f)
+
+
+def reset():
+    """Discard everything collected so far."""
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+        _events.clear()
+
+
+def _export_at_exit():
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(OPTIONS["profile"])
+        print(f"cProfile stats written to {OPTIONS['profile']}", file=sys.stderr)
+    if OPTIONS.get("json"):
+        export_json(OPTIONS["json"])
+        print(f"Trace written to {OPTIONS['json']}", file=sys.stderr)
+    if OPTIONS.get("summary"):
+        print("\n" + summary_table(), file=sys.stderr)
+
+
+if ENABLED:
+    if OPTIONS.get("json") is True:
+        OPTIONS["json"] = "trace.json"
+    if OPTIONS.get("profile") is True:
+        OPTIONS["profile"] = "profile.prof"
+    if OPTIONS.get("profile"):
+        import cProfile
+
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    atexit.register(_export_at_exit)
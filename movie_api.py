@@ -1,48 +1,289 @@
+import atexit
 import requests
 import os
-from typing import Optional, Dict, Any
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Dict, Any, List
 from dotenv import load_dotenv
 
+import instrumentation
+import omdb_quota
+from omdb_quota import INTERACTIVE, PREFETCH, QuotaExceeded
+
 # Load environment variables from .env file
 load_dotenv()
 
-# Get API key from environment variable
+DEFAULT_BASE_URL = "http://www.omdbapi.com/"
+
+# OMDB_BASE_URL points the client at another OMDb-compatible server,
+# e.g. the offline stub in omdb_stub_server.py
+BASE_URL = os.environ.get('OMDB_BASE_URL', DEFAULT_BASE_URL)
+
+# Get API key from environment variable (only required for the live API)
 API_KEY = os.environ.get('OMDB_API_KEY')
-if not API_KEY:
-    raise ValueError("OMDB_API_KEY not found in environment variables. Please check your .env file.")
 
-BASE_URL = "http://www.omdbapi.com/"
+# Seconds to wait for a response, and how often to retry
+# connection errors, timeouts and 5xx responses
+REQUEST_TIMEOUT = float(os.environ.get('OMDB_TIMEOUT', '10'))
+MAX_RETRIES = int(os.environ.get('OMDB_RETRIES', '2'))
+RETRY_BACKOFF = float(os.environ.get('OMDB_RETRY_BACKOFF', '0.5'))
+
+# In-memory response cache: entry lifetime (seconds) and maximum entries
+CACHE_TTL = float(os.environ.get('OMDB_CACHE_TTL', '3600'))
+CACHE_SIZE = int(os.environ.get('OMDB_CACHE_SIZE', '512'))
+
+# Background detail prefetching for search results
+PREFETCH_WORKERS = int(os.environ.get('OMDB_PREFETCH_WORKERS', '4'))
+PREFETCH_LIMIT = 10
+
+# One HTTP session per thread so connections are reused
+_local = threading.local()
+
+# key -> (expiry time, response); guarded by _cache_lock together with
+# _in_flight, which maps keys being fetched to a Future for their response
+_cache = OrderedDict()
+_in_flight = {}
+_cache_lock = threading.Lock()
+
+_prefetch_executor = None
+_prefetch_lock = threading.Lock()
+
+
+class OMDbConfigError(RuntimeError):
+    """Raised when the client is not configured to reach the OMDb API."""
 
 
-def fetch_movie_data(title: str, year: str = None) -> Optional[Dict[str, Any]]:
+def _get_api_key() -> str:
+    """Return the API key, which only the live OMDb API requires."""
+    if API_KEY:
+        return API_KEY
+    if BASE_URL == DEFAULT_BASE_URL:
+        raise OMDbConfigError("OMDB_API_KEY not found in environment variables. Please check your .env file.")
+    return "offline"
+
+
+def _get_session() -> requests.Session:
+    """Return this thread's HTTP session."""
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        _local.session = session
+    return session
+
+
+def _request(params: Dict[str, Any], priority: str = INTERACTIVE) -> Dict[str, Any]:
     """
-    Fetch movie data from OMDb API by title and optionally year.
+    Send one OMDb request and return the parsed JSON body.
+
+    Connection errors, timeouts and 5xx responses are retried up to
+    MAX_RETRIES times with exponential backoff; anything else is raised
+    to the caller unchanged. The request is booked against the daily
+    quota once, before the first attempt (omdb_quota.reserve), which raises
+    QuotaExceeded when ``priority`` may not spend any more today; retries
+    are not booked again.
 
     Args:
-        title (str): The movie title to search for
-        year (str): Optional year to get specific version
+        params (dict): Query parameters without the API key
+        priority (str): Quota class (interactive, bulk or prefetch)
 
     Returns:
-        Optional[Dict]: Movie data if found, None otherwise
+        dict: The decoded JSON response
     """
-    # Prepare the request parameters
+    params = dict(params, apikey=_get_api_key())
+    omdb_quota.reserve(priority, BASE_URL)
+    attempt = 0
+    while True:
+        try:
+            with instrumentation.span("http.omdb", attempt=attempt):
+                response = _get_session().get(BASE_URL, params=params, timeout=REQUEST_TIMEOUT)
+            instrumentation.count("http.requests")
+            instrumentation.count("http.bytes_downloaded", len(response.content))
+            if response.status_code >= 500 and attempt < MAX_RETRIES:
+                raise requests.exceptions.HTTPError(
+                    f"{response.status_code} Server Error", response=response
+                )
+            if response.status_code == 401 and "limit reached" in response.text.lower():
+                omdb_quota.mark_exhausted(BASE_URL)
+                omdb_quota.defer(priority, BASE_URL)
+                raise QuotaExceeded("OMDb reports the daily request limit reached", priority)
+            response.raise_for_status()  # Raise exception for bad status codes
+            return response.json()
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+                requests.exceptions.HTTPError) as e:
+            retryable = not isinstance(e, requests.exceptions.HTTPError) or (
+                e.response is not None and e.response.status_code >= 500
+            )
+            if not retryable or attempt >= MAX_RETRIES:
+                raise
+            instrumentation.count("http.retries")
+            time.sleep(RETRY_BACKOFF * (2 ** attempt))
+            attempt += 1
+
+
+def _cache_key(params: Dict[str, Any]) -> tuple:
+    """Return a hashable cache key for a set of query parameters."""
+    return tuple(sorted((name, str(value).strip().lower()) for name, value in params.items()))
+
+
+def _cached_request(params: Dict[str, Any], priority: str = INTERACTIVE) -> Dict[str, Any]:
+    """
+    Like _request, but answered from the response cache when possible.
+
+    Concurrent requests for the same parameters share one HTTP call: later
+    callers wait for the request already in flight (e.g. a prefetch).
+    Errors are not cached; a caller whose shared request was refused by
+    the quota tries again at its own priority.
+    """
+    key = _cache_key(params)
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            _cache.move_to_end(key)
+            instrumentation.count("api.cache_hits")
+            return entry[1]
+        future = _in_flight.get(key)
+        owner = future is None
+        if owner:
+            future = Future()
+            _in_flight[key] = future
+
+    if not owner:
+        instrumentation.count("api.in_flight_joins")
+        try:
+            return future.result()
+        except QuotaExceeded as e:
+            if e.priority == priority:
+                raise
+            return _cached_request(params, priority)
+    instrumentation.count("api.cache_misses")
+
+    try:
+        data = _request(params, priority)
+    except BaseException as e:
+        with _cache_lock:
+            _in_flight.pop(key, None)
+        future.set_exception(e)
+        raise
+
+    with _cache_lock:
+        _cache[key] = (time.monotonic() + CACHE_TTL, data)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+        _in_flight.pop(key, None)
+    future.set_result(data)
+    return data
+
+
+def clear_cache() -> None:
+    """Drop all cached API responses."""
+    with _cache_lock:
+        _cache.clear()
+
+
+def _detail_params(title: str, year: str = None, imdb_id: str = None) -> Dict[str, Any]:
+    """Return the query parameters fetch_movie_data uses for a movie."""
+    if imdb_id:
+        return {
+            'i': imdb_id  # 'i' parameter looks up by imdbID
+        }
     params = {
-        'apikey': API_KEY,
         't': title,  # 't' parameter searches by exact title
         'type': 'movie'
     }
-
     # Add year if provided to get specific version
     if year:
         params['y'] = year
+    return params
+
+
+def _get_prefetch_executor() -> ThreadPoolExecutor:
+    """Return the shared prefetch thread pool, creating it on first use."""
+    global _prefetch_executor
+    with _prefetch_lock:
+        if _prefetch_executor is None:
+            _prefetch_executor = ThreadPoolExecutor(
+                max_workers=PREFETCH_WORKERS, thread_name_prefix='omdb-prefetch'
+            )
+        return _prefetch_executor
 
+
+def _prefetch_one(params: Dict[str, Any]) -> None:
+    """Warm the cache for one movie; failures (and quota refusals) are ignored."""
     try:
-        # Make the API request
-        response = requests.get(BASE_URL, params=params)
-        response.raise_for_status()  # Raise exception for bad status codes
+        _cached_request(params, PREFETCH)
+    except Exception:
+        pass
+
+
+def prefetch_movies(search_results: List[Dict[str, Any]],
+                    limit: int = PREFETCH_LIMIT) -> List[Future]:
+    """
+    Fetch detail records for search results in the background.
+
+    The responses land in the API cache, so a later get_movie_with_rating
+    for one of them is answered without waiting on the network.
+
+    Args:
+        search_results (list): Results as returned by search_movies
+        limit (int): Maximum number of results to prefetch
+
+    Returns:
+        list: Futures for the scheduled fetches (pass to cancel_prefetch)
+    """
+    executor = _get_prefetch_executor()
+    futures = []
+    for movie in search_results[:limit]:
+        params = _detail_params(movie.get('Title'), movie.get('Year'), movie.get('imdbID'))
+        futures.append(executor.submit(_prefetch_one, params))
+    return futures
+
+
+def cancel_prefetch(futures: List[Future]) -> None:
+    """Cancel prefetches that have not started yet (running ones finish into the cache)."""
+    for future in futures:
+        future.cancel()
 
-        # Parse JSON response
-        data = response.json()
+
+def shutdown_prefetch() -> None:
+    """Stop the prefetch pool, dropping any queued work."""
+    global _prefetch_executor
+    with _prefetch_lock:
+        executor, _prefetch_executor = _prefetch_executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(shutdown_prefetch)
+
+
+def fetch_movie_data(title: str, year: str = None, imdb_id: str = None,
+                     priority: str = INTERACTIVE) -> Optional[Dict[str, Any]]:
+    """
+    Fetch movie data from OMDb API by title and optionally year.
+
+    Args:
+        title (str): The movie title to search for
+        year (str): Optional year to get specific version
+        imdb_id (str): Optional imdbID; when given it identifies the movie
+            exactly and title/year are ignored
+        priority (str): Quota class of the request (see omdb_quota)
+
+    Returns:
+        Optional[Dict]: Movie data if found, None otherwise
+
+    Raises:
+        QuotaExceeded: the daily OMDb quota refused the request
+    """
+    # Prepare the request parameters
+    params = _detail_params(title, year, imdb_id)
+
+    try:
+        # Make the API request (or reuse a cached/prefetched response)
+        data = _cached_request(params, priority)
 
         # Check if movie was found
         if data.get('Response') == 'True':
@@ -59,27 +300,37 @@ def fetch_movie_data(title: str, year: str = None) -> Optional[Dict[str, Any]]:
         return None
 
 
-def search_movies(search_term: str) -> Optional[list]:
+def _search_params(search_term: str, page: int = 1) -> Dict[str, Any]:
+    """Return the query parameters for one page of search results."""
+    params = {
+        's': search_term,  # 's' parameter searches by partial title
+        'type': 'movie'
+    }
+    if page > 1:
+        params['page'] = page
+    return params
+
+
+def search_movies(search_term: str, page: int = 1,
+                  priority: str = INTERACTIVE) -> Optional[list]:
     """
     Search for movies by partial title match.
 
     Args:
         search_term (str): The search term
+        page (int): Result page to return (OMDb pages hold 10 results)
+        priority (str): Quota class of the request (see omdb_quota)
 
     Returns:
         Optional[list]: List of movie results if found, None otherwise
+
+    Raises:
+        QuotaExceeded: the daily OMDb quota refused the request
     """
-    params = {
-        'apikey': API_KEY,
-        's': search_term,  # 's' parameter searches by partial title
-        'type': 'movie'
-    }
+    params = _search_params(search_term, page)
 
     try:
-        response = requests.get(BASE_URL, params=params)
-        response.raise_for_status()
-
-        data = response.json()
+        data = _cached_request(params, priority)
 
         if data.get('Response') == 'True':
             return data.get('Search', [])
@@ -90,6 +341,106 @@ def search_movies(search_term: str) -> Optional[list]:
     except requests.exceptions.RequestException as e:
         print(f"API request failed: {e}")
         return None
+    except ValueError as e:
+        print(f"Failed to parse API response: {e}")
+        return None
+
+
+class PagedSearch:
+    """
+    Lazy iteration over every OMDb search result for a term.
+
+    Pages are requested only when iteration reaches them, and while one
+    page is being consumed the next is fetched in the background. Pages go
+    through the API cache, so iterating twice (or after search_movies)
+    does not repeat requests.
+
+    Example:
+        search = PagedSearch("Matrix")
+        for movie in itertools.islice(search, 25):
+            ...
+        print(search.total_results)
+    """
+
+    PAGE_SIZE = 10
+    MAX_PAGES = 100  # OMDb does not serve pages beyond 100
+
+    def __init__(self, search_term: str, prefetch: bool = True,
+                 priority: str = INTERACTIVE):
+        """
+        Args:
+            search_term (str): The search term
+            prefetch (bool): Fetch the following page ahead of time
+            priority (str): Quota class of the page requests (prefetched
+                pages always use the prefetch class)
+        """
+        self.search_term = search_term
+        self.prefetch = prefetch
+        self.priority = priority
+        self.error = None
+        self._total_results = None
+
+    @property
+    def total_results(self) -> int:
+        """Total number of matches reported by OMDb (fetches page 1 if needed)."""
+        if self._total_results is None:
+            self.page(1)
+        return self._total_results or 0
+
+    @property
+    def page_count(self) -> int:
+        """Number of result pages available."""
+        pages = -(-self.total_results // self.PAGE_SIZE)
+        return min(pages, self.MAX_PAGES)
+
+    def page(self, number: int) -> list:
+        """
+        Return one page of results ([] past the end or on errors).
+
+        Errors are printed and remembered in ``self.error``; a refusal by
+        the daily quota is raised (QuotaExceeded) so callers can defer.
+        """
+        try:
+            data = _cached_request(_search_params(self.search_term, number), self.priority)
+        except requests.exceptions.RequestException as e:
+            print(f"API request failed: {e}")
+            self.error = str(e)
+            return []
+        except ValueError as e:
+            print(f"Failed to parse API response: {e}")
+            self.error = str(e)
+            return []
+
+        if data.get('Response') != 'True':
+            if self._total_results is None:
+                self._total_results = 0
+                self.error = data.get('Error', 'Unknown error')
+            return []
+
+        try:
+            self._total_results = int(data.get('totalResults', 0))
+        except (TypeError, ValueError):
+            self._total_results = len(data.get('Search', []))
+        return data.get('Search', [])
+
+    def _prefetch_page(self, number: int) -> None:
+        """Warm the cache for a page on the prefetch pool."""
+        if self.prefetch and number <= self.page_count:
+            _get_prefetch_executor().submit(
+                _prefetch_one, _search_params(self.search_term, number)
+            )
+
+    def __iter__(self):
+        number = 1
+        while True:
+            results = self.page(number)
+            if not results:
+                return
+            self._prefetch_page(number + 1)
+            yield from results
+            if number >= self.page_count:
+                return
+            number += 1
 
 
 def extract_movie_info(api_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -133,24 +484,32 @@ def extract_movie_info(api_data: Dict[str, Any]) -> Dict[str, Any]:
         'plot': api_data.get('Plot', 'N/A'),
         'genre': api_data.get('Genre', 'N/A'),
         'runtime': api_data.get('Runtime', 'N/A'),
-        'poster': poster_url
+        'poster': poster_url,
+        'imdb_id': api_data.get('imdbID')
     }
 
     return movie_info
 
 
-def get_movie_with_rating(title: str, year: str = None) -> Optional[Dict[str, Any]]:
+def get_movie_with_rating(title: str, year: str = None, imdb_id: str = None,
+                          priority: str = INTERACTIVE) -> Optional[Dict[str, Any]]:
     """
-    Convenience function to get movie data with year, rating, and poster.
+    Convenience function to get movie data with year, rating, poster and details.
 
     Args:
         title (str): Movie title to search for
         year (str): Optional year to get specific version
+        imdb_id (str): Optional imdbID for an exact lookup
+        priority (str): Quota class of the request (see omdb_quota)
 
     Returns:
-        Optional[Dict]: Dictionary with title, year, rating, and poster if found
+        Optional[Dict]: Dictionary with title, year, rating, poster, imdb_id,
+        director, actors, plot, genre and runtime if found
+
+    Raises:
+        QuotaExceeded: the daily OMDb quota refused the request
     """
-    api_data = fetch_movie_data(title, year)
+    api_data = fetch_movie_data(title, year, imdb_id, priority)
 
     if api_data:
         movie_info = extract_movie_info(api_data)
@@ -161,7 +520,13 @@ def get_movie_with_rating(title: str, year: str = None) -> Optional[Dict[str, An
                 'title': movie_info['title'],
                 'year': movie_info['year'],
                 'rating': movie_info['rating'],
-                'poster': movie_info['poster'] if movie_info['poster'] != 'N/A' else None
+                'poster': movie_info['poster'] if movie_info['poster'] != 'N/A' else None,
+                'imdb_id': movie_info['imdb_id'],
+                'director': movie_info['director'],
+                'actors': movie_info['actors'],
+                'plot': movie_info['plot'],
+                'genre': movie_info['genre'],
+                'runtime': movie_info['runtime']
             }
         else:
             print(f"Incomplete data for '{title}'")
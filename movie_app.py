@@ -1,15 +1,40 @@
-import random
-import statistics
+import shutil
+import sys
 from datetime import datetime
-from movie_api import get_movie_with_rating, search_movies
+from itertools import islice
+from movie_api import (
+    PagedSearch,
+    QuotaExceeded,
+    get_movie_with_rating,
+    prefetch_movies,
+    cancel_prefetch,
+    shutdown_prefetch
+)
+import movie_storage_sql
 from movie_storage_sql import (
-    get_movies,
     add_movie_to_storage,
     delete_movie_from_storage,
-    update_movie_in_storage
+    update_movie_in_storage,
+    get_movie_details,
+    list_movies_by_genre,
+    list_movies_by_director,
+    list_genres,
+    movie_exists,
+    count_movies,
+    find_movies_by_title,
+    iter_movies,
+    iter_movie_pages,
+    pick_random_movie,
+    register_write_listener,
+    get_stats_snapshot,
+    get_titles_for_bucket,
+    get_rating_disagreements
 )
 import requests
-from website_generator import generate_website
+from instrumentation import traced
+from movie_snapshot import load_snapshot
+from title_matcher import TitleIndex
+from website_generator import generate_website, use_collection_output_dir
 
 # ---------- Constants ----------
 current_year = datetime.now().year
@@ -19,11 +44,26 @@ COLOR_INPUT = "\033[92m"
 COLOR_ERROR = "\033[91m"
 COLOR_RESET = "\033[0m"
 
+# Titles longer than this are shortened in aligned listings
+MAX_TITLE_WIDTH = 40
+
+# Ranked suggestions offered when a typed title is not an exact match
+MAX_SUGGESTIONS = 10
+
+# Biggest rating differences listed in the stats view
+DISAGREEMENTS_SHOWN = 3
+
+# Built on first use, then kept current through storage write notifications
+_title_index = None
+
 
 # ---------- Helper Functions ----------
 def clear_screen():
-    """Print blank lines to simulate clearing the terminal screen."""
-    print("\n" * 50)
+    """Clear the terminal (ANSI escape) or start a fresh block when piped."""
+    if sys.stdout.isatty():
+        print("\033[2J\033[H", end="", flush=True)
+    else:
+        print()
 
 
 def print_colored(text, color_code):
@@ -31,64 +71,160 @@ def print_colored(text, color_code):
     print(f"{color_code}{text}{COLOR_RESET}")
 
 
-# ---------- Core Functions ----------
-def list_movies():
-    """List all movies with their OMDb and user ratings."""
-    clear_screen()
-    movies = get_movies()
-    if not movies:
-        print_colored("No movies found in the database.", COLOR_ERROR)
-        return
+def fit_title(title, width):
+    """Pad or shorten a title to exactly ``width`` characters."""
+    if len(title) > width:
+        return title[:width - 1] + "\u2026"
+    return title.ljust(width)
+
+
+def _update_title_index(operation, movie):
+    if operation == "delete":
+        _title_index.remove(movie["id"])
+    else:
+        _title_index.add(movie["id"], movie["title"], movie["year"])
+
+
+def get_title_index():
+    """Return the fuzzy title index, building it from the database once."""
+    global _title_index
+    if _title_index is None:
+        _title_index = TitleIndex()
+        snapshot = load_snapshot()
+        if snapshot is not None:
+            for movie_id, title, year in snapshot.iter_ids_titles():
+                _title_index.add(movie_id, title, year)
+        else:
+            for movie in iter_movies():
+                _title_index.add(movie["id"], movie["title"], movie["year"])
+        register_write_listener(_update_title_index)
+    return _title_index
+
+
+def select_movie(prompt, verb, cancelled_message):
+    """Ask for a title and return the chosen title_matcher.Match, or None.
+
+    An exact title is taken directly; otherwise the best fuzzy matches
+    (typos, accents and a leading "The" are tolerated) are offered.
+    """
+    title_input = input(f"{COLOR_INPUT}{prompt}{COLOR_RESET}").strip()
+    if not title_input:
+        print_colored(cancelled_message, COLOR_MENU)
+        return None
+
+    matches = get_title_index().search(title_input, limit=MAX_SUGGESTIONS)
+    exact = [match for match in matches if match.title == title_input]
+    if len(exact) == 1:
+        return exact[0]
+    if not matches:
+        print_colored("No matching movie found.", COLOR_ERROR)
+        return None
 
-    print_colored(f"\n\U0001F39E\ufe0f  {len(movies)} movie(s):\n", COLOR_TITLE)
+    print_colored("Did you mean one of these?", COLOR_MENU)
+    for index, match in enumerate(matches, start=1):
+        print(f"{index}. {match.title} ({match.data})")
 
-    # Calculate maximum title length for alignment
-    max_title_length = max(len(title) for title in movies.keys()) if movies else 0
+    try:
+        choice = int(input(f"{COLOR_INPUT}Enter number to {verb} or 0 to cancel: {COLOR_RESET}"))
+    except ValueError:
+        print_colored(f"Invalid input. {cancelled_message}", COLOR_ERROR)
+        return None
+    if 1 <= choice <= len(matches):
+        return matches[choice - 1]
+    print_colored(cancelled_message, COLOR_MENU)
+    return None
+
+
+def page_movies(heading, order_by, descending, format_row):
+    """Show movies one screen at a time, fetching each page only when needed.
+
+    ``format_row(info, title_width)`` returns the line for one movie; the
+    title width is computed per page (capped at MAX_TITLE_WIDTH), so nothing
+    beyond the current page is ever loaded.
+    """
+    # Leave room for the heading and the prompt
+    page_size = max(5, shutil.get_terminal_size().lines - 4)
+    interactive = sys.stdin.isatty() and sys.stdout.isatty()
+
+    shown = 0
+    for page in iter_movie_pages(page_size, order_by, descending):
+        if shown and interactive:
+            clear_screen()
+        print_colored(f"{heading} {shown + 1}-{shown + len(page)}:", COLOR_TITLE)
+        title_width = min(max(len(info["title"]) for info in page), MAX_TITLE_WIDTH)
+        for info in page:
+            print(format_row(info, title_width))
+        shown += len(page)
+
+        if len(page) < page_size or not interactive:
+            continue
+        answer = input(f"{COLOR_INPUT}-- Enter for more, q to stop -- {COLOR_RESET}")
+        if answer.strip().lower() == "q":
+            return
+    if shown == 0:
+        print_colored("No movies found in the database.", COLOR_ERROR)
 
-    for title, info in movies.items():
-        # Format title with padding
-        padded_title = title.ljust(max_title_length)
 
-        # Format year
-        year_str = f"({info['year']})"
+def format_movie_row(info, title_width):
+    """Format one line of the full listing with the rating colour code."""
+    padded_title = fit_title(info["title"], title_width)
 
-        # Format OMDb rating (always in cyan/blue)
-        omdb_rating = f"\033[1;36mOMDb: {info['omdb_rating']:.1f}\033[0m"
+    # Format year
+    year_str = f"({info['year']})"
 
-        # Check if user has rated the movie
-        if info['user_rating'] is not None:
-            # Calculate difference for color coding
-            diff = abs(info['user_rating'] - info['omdb_rating'])
+    # Format OMDb rating (always in cyan/blue)
+    omdb_rating = f"\033[1;36mOMDb: {info['omdb_rating']:.1f}\033[0m"
 
-            # Ampel-System for user rating
-            if diff <= 0.5:
-                # Green - very close (≤ 0.5 difference)
-                user_color = "\033[1;32m"  # Bright green
-            elif diff <= 1.5:
-                # Yellow - somewhat different (0.5 - 1.5)
-                user_color = "\033[1;33m"  # Bright yellow
-            elif diff <= 2.5:
-                # Orange - quite different (1.5 - 2.5)
-                user_color = "\033[38;5;208m"  # Orange (256 color)
-            else:
-                # Red - very different (> 2.5)
-                user_color = "\033[1;31m"  # Bright red
+    # Check if user has rated the movie
+    if info['user_rating'] is not None:
+        # Calculate difference for color coding
+        diff = abs(info['user_rating'] - info['omdb_rating'])
 
-            user_rating = f"{user_color}You: {info['user_rating']:.1f}\033[0m"
-            rating_str = f"{omdb_rating} | {user_rating}"
+        # Ampel-System for user rating
+        if diff <= 0.5:
+            # Green - very close (≤ 0.5 difference)
+            user_color = "\033[1;32m"  # Bright green
+        elif diff <= 1.5:
+            # Yellow - somewhat different (0.5 - 1.5)
+            user_color = "\033[1;33m"  # Bright yellow
+        elif diff <= 2.5:
+            # Orange - quite different (1.5 - 2.5)
+            user_color = "\033[38;5;208m"  # Orange (256 color)
         else:
-            rating_str = omdb_rating
+            # Red - very different (> 2.5)
+            user_color = "\033[1;31m"  # Bright red
 
-        # Print movie entry
-        print(
-            f"Movie: \033[1;36m{padded_title}\033[0m {year_str:6} - {rating_str}"
-        )
+        user_rating = f"{user_color}You: {info['user_rating']:.1f}\033[0m"
+        rating_str = f"{omdb_rating} | {user_rating}"
+    else:
+        rating_str = omdb_rating
+
+    return f"Movie: \033[1;36m{padded_title}\033[0m {year_str:6} - {rating_str}"
+
+
+def format_sorted_row(info, title_width):
+    """Format one line of the sorted listings."""
+    return f"{fit_title(info['title'], title_width)} ({info['year']}): {info['rating']:.2f}"
 
 
+# ---------- Core Functions ----------
+@traced("cli.list_movies")
+def list_movies():
+    """List all movies with their OMDb and user ratings, one page at a time."""
+    clear_screen()
+    total = count_movies()
+    if not total:
+        print_colored("No movies found in the database.", COLOR_ERROR)
+        return
+
+    print_colored(f"\n\U0001F39E\ufe0f  {total} movie(s):\n", COLOR_TITLE)
+    page_movies("Movies", "title", False, format_movie_row)
+
+
+@traced("cli.add_movie")
 def add_movie():
     """Add a new movie by fetching data from OMDb API."""
     clear_screen()
-    movies = get_movies()
 
     # Get movie title from user
     while True:
@@ -102,25 +238,50 @@ def add_movie():
     print_colored("Searching for movie data...", COLOR_MENU)
 
     try:
-        # Always search first to show all options
-        search_results = search_movies(title)
+        # Always search first to show all options; further result pages
+        # are only fetched when the user asks for them
+        search = PagedSearch(title)
+        pending_results = iter(search)
+        search_results = list(islice(pending_results, 10))
 
         if search_results:
-            # Show all search results
-            print_colored(f"\nFound {len(search_results)} movie(s):", COLOR_MENU)
-            for i, movie in enumerate(search_results[:10], 1):  # Show up to 10 results
+            # Show the first page of search results
+            total_results = search.total_results
+            print_colored(f"\nFound {total_results} movie(s):", COLOR_MENU)
+            for i, movie in enumerate(search_results, 1):
                 print(f"{i}. {movie.get('Title')} ({movie.get('Year')})")
 
-            print("0. Cancel")
-            print("99. Search again with different title")
+            # Fetch the listed movies' details in the background while the
+            # user reads the list, so the selection resolves from the cache
+            prefetched = prefetch_movies(search_results)
 
             # Let user select
             try:
-                choice = int(input(f"\n{COLOR_INPUT}Select a movie to add: {COLOR_RESET}"))
+                while True:
+                    more_available = len(search_results) < total_results
+                    print("0. Cancel")
+                    if more_available:
+                        print("98. Show more results")
+                    print("99. Search again with different title")
+
+                    choice = int(input(f"\n{COLOR_INPUT}Select a movie to add: {COLOR_RESET}"))
+                    if choice != 98 or not more_available:
+                        break
+
+                    next_results = list(islice(pending_results, 10))
+                    if not next_results:
+                        total_results = len(search_results)
+                        continue
+                    for i, movie in enumerate(next_results, len(search_results) + 1):
+                        print(f"{i}. {movie.get('Title')} ({movie.get('Year')})")
+                    search_results.extend(next_results)
+                    prefetched += prefetch_movies(next_results)
+
                 if choice == 0:
                     print_colored("Operation cancelled.", COLOR_MENU)
                     return
                 elif choice == 99:
+                    cancel_prefetch(prefetched)
                     # Let user try again
                     print_colored("\nTips for better search results:", COLOR_MENU)
                     print("  - Try the complete movie title (e.g., 'The French Connection')")
@@ -129,18 +290,19 @@ def add_movie():
                     print("  - Sometimes 'The' at the beginning helps")
                     add_movie()  # Recursive call
                     return
-                elif 1 <= choice <= min(10, len(search_results)):
+                elif 1 <= choice <= len(search_results):
                     selected = search_results[choice - 1]
                     selected_title = selected.get('Title')
+                    selected_imdb_id = selected.get('imdbID')
 
-                    # Check if movie already exists
-                    if selected_title in movies:
+                    # Check if movie already exists (indexed imdbID lookup)
+                    if movie_exists(selected_imdb_id, selected_title, selected.get('Year')):
                         print_colored(f"\nMovie '{selected_title}' already exists in your database!", COLOR_ERROR)
                         return
 
-                    # Fetch full data for selected movie WITH YEAR
+                    # Fetch full data for selected movie by imdbID (title + year as fallback)
                     selected_year = selected.get('Year')
-                    api_data = get_movie_with_rating(selected_title, selected_year)
+                    api_data = get_movie_with_rating(selected_title, selected_year, selected_imdb_id)
                     if api_data:
                         # Show movie details before adding
                         print_colored(f"\nAdding: {api_data['title']}", COLOR_TITLE)
@@ -150,12 +312,15 @@ def add_movie():
                             print(f"Poster: Available")
 
                         # Add to database
-                        add_movie_to_storage(
+                        if not add_movie_to_storage(
                             api_data['title'],
                             api_data['year'],
                             api_data['rating'],
-                            api_data.get('poster')
-                        )
+                            api_data.get('poster'),
+                            details=api_data
+                        ):
+                            print_colored("Could not add this movie to your database.", COLOR_ERROR)
+                            return
                         print_colored(
                             f"\nSuccessfully added '{api_data['title']}' ({api_data['year']}) "
                             f"with OMDb rating {api_data['rating']:.1f}",
@@ -178,6 +343,8 @@ def add_movie():
             except ValueError:
                 print_colored("Invalid input. Operation cancelled.", COLOR_ERROR)
                 return
+            finally:
+                cancel_prefetch(prefetched)
         else:
             # No results found
             print_colored(
@@ -199,6 +366,9 @@ def add_movie():
                 add_movie()  # Recursive call
                 return
 
+    except QuotaExceeded as e:
+        print_colored(f"\n{e}", COLOR_ERROR)
+        print_colored("Movies already in the cache can still be added.", COLOR_MENU)
     except requests.exceptions.ConnectionError:
         print_colored(
             "\nError: No internet connection.",
@@ -227,78 +397,33 @@ def add_movie():
             COLOR_ERROR
         )
 
+@traced("cli.delete_movie")
 def delete_movie():
-    """Delete a movie from the database, offering fuzzy match suggestions."""
+    """Delete a movie from the database, offering ranked fuzzy suggestions."""
     clear_screen()
-    movies = get_movies()
-    title_input = input(f"{COLOR_INPUT}Enter movie to delete: {COLOR_RESET}").strip()
-
-    if title_input in movies:
-        delete_movie_from_storage(title_input)
-        print_colored(f"Deleted '{title_input}'.", COLOR_INPUT)
+    match = select_movie("Enter movie to delete: ", "delete", "No movie deleted.")
+    if match is None:
         return
-
-    suggestions = [
-        title for title in movies
-        if title_input.lower() in title.lower()
-    ]
-
-    if not suggestions:
-        print_colored("No matching movie found.", COLOR_ERROR)
-        return
-
-    print_colored("Did you mean one of these?", COLOR_MENU)
-    for index, suggestion in enumerate(suggestions, start=1):
-        print(f"{index}. {suggestion}")
-
-    try:
-        choice = int(input(f"{COLOR_INPUT}Enter number to delete or 0 to cancel: {COLOR_RESET}"))
-        if 1 <= choice <= len(suggestions):
-            selected_title = suggestions[choice - 1]
-            delete_movie_from_storage(selected_title)
-            print_colored(f"Deleted '{selected_title}'.", COLOR_INPUT)
-        else:
-            print_colored("No movie deleted.", COLOR_MENU)
-    except ValueError:
-        print_colored("Invalid input. No movie deleted.", COLOR_ERROR)
+    if delete_movie_from_storage(match.title, match.key):
+        print_colored(f"Deleted '{match.title}'.", COLOR_INPUT)
+    else:
+        print_colored(f"Could not delete '{match.title}'.", COLOR_ERROR)
 
 
+@traced("cli.update_movie")
 def update_movie():
     """Update your personal rating for a movie."""
     clear_screen()
-    movies = get_movies()
-    title_input = input(f"{COLOR_INPUT}Enter movie to rate: {COLOR_RESET}").strip()
-
-    if title_input in movies:
-        selected_title = title_input
-    else:
-        suggestions = [
-            title for title in movies
-            if title_input.lower() in title.lower()
-        ]
-
-        if not suggestions:
-            print_colored("No matching movie found.", COLOR_ERROR)
-            return
-
-        print_colored("Did you mean one of these?", COLOR_MENU)
-        for index, suggestion in enumerate(suggestions, start=1):
-            print(f"{index}. {suggestion}")
-
-        try:
-            prompt = f"{COLOR_INPUT}Enter number to rate or 0 to cancel: {COLOR_RESET}"
-            choice = int(input(prompt))
-            if 1 <= choice <= len(suggestions):
-                selected_title = suggestions[choice - 1]
-            else:
-                print_colored("Rating cancelled.", COLOR_MENU)
-                return
-        except ValueError:
-            print_colored("Invalid input. Rating cancelled.", COLOR_ERROR)
-            return
+    match = select_movie("Enter movie to rate: ", "rate", "Rating cancelled.")
+    if match is None:
+        return
+    movie_data = get_movie_details(match.title, match.key)
+    if movie_data is None:
+        print_colored("No matching movie found.", COLOR_ERROR)
+        return
+    selected_title = match.title
 
     # Show current movie data
-    movie_data = movies[selected_title]
     print_colored(f"\nCurrent data for '{selected_title}':", COLOR_TITLE)
     print(f"Year: {movie_data['year']}")
     print(f"OMDb Rating: {movie_data['omdb_rating']:.1f}/10")
@@ -333,7 +458,7 @@ def update_movie():
                     print_colored("Invalid rating. Enter a number.", COLOR_ERROR)
 
             # Update the rating
-            update_movie_in_storage(selected_title, rating, movie_data['year'])
+            update_movie_in_storage(selected_title, rating, movie_data['year'], movie_data['id'])
 
             # Show rating comparison
             diff = rating - movie_data['omdb_rating']
@@ -352,7 +477,7 @@ def update_movie():
         elif action == "2" and movie_data.get('user_rating') is not None:
             # Remove user rating
             from movie_storage_sql import reset_user_rating
-            reset_user_rating(selected_title)
+            reset_user_rating(selected_title, movie_data['id'])
             print_colored(
                 f"\nYour rating for '{selected_title}' has been removed.",
                 COLOR_INPUT
@@ -369,85 +494,53 @@ def update_movie():
         print_colored(f"Error: {str(e)}", COLOR_ERROR)
 
 
+@traced("cli.show_stats")
 def show_stats():
     """Display statistics about the stored movie ratings."""
     clear_screen()
-    movies = get_movies()
-    if not movies:
+    stats = get_stats_snapshot()
+    if not stats["total"]:
         print_colored("No movies to analyze.", COLOR_ERROR)
         return
 
-    # Separate OMDb and user ratings
-    omdb_ratings = [info["omdb_rating"] for info in movies.values()]
-    user_ratings = [info["user_rating"] for info in movies.values() if info["user_rating"] is not None]
-
     # OMDb Statistics
     print_colored("=== OMDb Ratings Statistics ===", COLOR_TITLE)
-    avg_omdb = sum(omdb_ratings) / len(omdb_ratings)
-    med_omdb = statistics.median(omdb_ratings)
-    max_omdb = max(omdb_ratings)
-    min_omdb = min(omdb_ratings)
-    best_omdb = [title for title, info in movies.items() if info["omdb_rating"] == max_omdb]
-    worst_omdb = [title for title, info in movies.items() if info["omdb_rating"] == min_omdb]
-
-    print(f"Average rating: {avg_omdb:.2f}")
-    print(f"Median rating: {med_omdb:.2f}")
+    max_omdb = stats["max_omdb"]
+    min_omdb = stats["min_omdb"]
+    best_omdb = get_titles_for_bucket("omdb", max_omdb)
+    worst_omdb = get_titles_for_bucket("omdb", min_omdb)
+
+    print(f"Average rating: {stats['avg_omdb']:.2f}")
+    print(f"Median rating: {stats['median_omdb']:.2f}")
     print(f"Best movie(s): {', '.join(best_omdb)} ({max_omdb:.1f})")
     print(f"Worst movie(s): {', '.join(worst_omdb)} ({min_omdb:.1f})")
 
     # User Statistics (if available)
-    if user_ratings:
+    if stats["rated"]:
         print_colored("\n=== Your Personal Ratings Statistics ===", COLOR_TITLE)
-        avg_user = sum(user_ratings) / len(user_ratings)
-        med_user = statistics.median(user_ratings)
-        max_user = max(user_ratings)
-        min_user = min(user_ratings)
-        best_user = [title for title, info in movies.items()
-                     if info["user_rating"] is not None and info["user_rating"] == max_user]
-        worst_user = [title for title, info in movies.items()
-                      if info["user_rating"] is not None and info["user_rating"] == min_user]
-
-        print(f"Movies you've rated: {len(user_ratings)} out of {len(movies)}")
-        print(f"Your average rating: {avg_user:.2f}")
-        print(f"Your median rating: {med_user:.2f}")
+        max_user = stats["max_user"]
+        min_user = stats["min_user"]
+        best_user = get_titles_for_bucket("user", max_user)
+        worst_user = get_titles_for_bucket("user", min_user)
+
+        print(f"Movies you've rated: {stats['rated']} out of {stats['total']}")
+        print(f"Your average rating: {stats['avg_user']:.2f}")
+        print(f"Your median rating: {stats['median_user']:.2f}")
         print(f"Your favorite(s): {', '.join(best_user)} ({max_user:.1f})")
         print(f"Your least favorite(s): {', '.join(worst_user)} ({min_user:.1f})")
 
         # Rating difference analysis
         print_colored("\n=== Rating Differences ===", COLOR_TITLE)
-        total_diff = 0
-        higher_count = 0
-        lower_count = 0
-        same_count = 0
-
-        for title, info in movies.items():
-            if info["user_rating"] is not None:
-                diff = info["user_rating"] - info["omdb_rating"]
-                total_diff += abs(diff)
-                if diff > 0:
-                    higher_count += 1
-                elif diff < 0:
-                    lower_count += 1
-                else:
-                    same_count += 1
-
-        avg_diff = total_diff / len(user_ratings) if user_ratings else 0
-        print(f"Average difference from OMDb: {avg_diff:.2f}")
-        print(f"You rated higher than OMDb: {higher_count} movie(s)")
-        print(f"You rated lower than OMDb: {lower_count} movie(s)")
-        print(f"You agreed with OMDb: {same_count} movie(s)")
+        print(f"Average difference from OMDb: {stats['avg_abs_diff']:.2f}")
+        print(f"You rated higher than OMDb: {stats['higher']} movie(s)")
+        print(f"You rated lower than OMDb: {stats['lower']} movie(s)")
+        print(f"You agreed with OMDb: {stats['same']} movie(s)")
 
         # Biggest differences
-        differences = []
-        for title, info in movies.items():
-            if info["user_rating"] is not None:
-                diff = info["user_rating"] - info["omdb_rating"]
-                differences.append((title, diff))
-
-        differences.sort(key=lambda x: abs(x[1]), reverse=True)
+        differences = get_rating_disagreements(DISAGREEMENTS_SHOWN)
         if differences:
             print_colored("\nBiggest rating differences:", COLOR_MENU)
-            for title, diff in differences[:3]:
+            for title, diff in differences:
                 if diff > 0:
                     print(f"  - {title}: +{diff:.1f} (you liked it more)")
                 else:
@@ -456,61 +549,172 @@ def show_stats():
         print_colored("\n[No personal ratings yet - use 'Update movie' to add your ratings]", COLOR_MENU)
 
 
+@traced("cli.random_movie")
 def random_movie():
     """Display a randomly selected movie."""
     clear_screen()
-    movies = get_movies()
-    if not movies:
+    movie = pick_random_movie()
+    if movie is None:
         print_colored("No movies to choose from.", COLOR_ERROR)
         return
 
-    title = random.choice(list(movies.keys()))
-    info = movies[title]
     print_colored(
-        f"\n\U0001F3B2 Random pick: {title} ({info['year']}), "
-        f"rating {info['rating']:.2f}",
+        f"\n\U0001F3B2 Random pick: {movie['title']} ({movie['year']}), "
+        f"rating {movie['rating']:.2f}",
         COLOR_TITLE
     )
 
 
+@traced("cli.search_movie")
 def search_movie():
     """Search and display movies matching the input substring."""
     clear_screen()
-    query = input(f"{COLOR_INPUT}Enter part of the movie name: {COLOR_RESET}").lower()
-    movies = get_movies()
-    results = {
-        title: info
-        for title, info in movies.items()
-        if query in title.lower()
-    }
+    query = input(f"{COLOR_INPUT}Enter part of the movie name: {COLOR_RESET}")
+    # Matched case-insensitively by SQLite (LIKE), in listing order
+    results = list(iter_movies(search=query))
     if results:
         print_colored(f"\nSearch results for '{query}':", COLOR_TITLE)
-        for title, info in results.items():
+        for movie in results:
             print(
-                f"Movie: \033[1;36m{title}\033[0m, Year: {info['year']}, "
-                f"Rating: \033[1;33m{info['rating']:.2f}\033[0m"
+                f"Movie: \033[1;36m{movie['title']}\033[0m, Year: {movie['year']}, "
+                f"Rating: \033[1;33m{movie['rating']:.2f}\033[0m"
             )
     else:
         print_colored("No matches found.", COLOR_ERROR)
 
 
+@traced("cli.sort_movies_by_rating")
 def sort_movies_by_rating():
-    """Sort and display movies by rating in descending order."""
+    """Display movies by rating in descending order, one page at a time."""
     clear_screen()
-    movies = get_movies()
-    sorted_movies = sorted(movies.items(), key=lambda x: x[1]["rating"], reverse=True)
-    print_colored("Movies sorted by rating:", COLOR_TITLE)
-    for title, info in sorted_movies:
-        print(f"{title} ({info['year']}): {info['rating']:.2f}")
+    page_movies("Movies sorted by rating", "rating", True, format_sorted_row)
 
 
+@traced("cli.sort_movies_by_year")
 def sort_movies_by_year():
-    """Sort and display movies by release year in ascending order."""
+    """Display movies by release year in ascending order, one page at a time."""
+    clear_screen()
+    page_movies("Movies sorted by year", "year", False, format_sorted_row)
+
+
+def find_exact_movie(title_input):
+    """Return the movie named exactly ``title_input`` (or "Title (year)"), else None.
+
+    Only indexed title lookups are made. A title that differs only in case
+    is accepted when no movie matches it exactly and it is unambiguous.
+    """
+    matches = find_movies_by_title(title_input)
+    exact = [movie for movie in matches if movie['title'] == title_input] or matches
+    if len(exact) == 1:
+        return exact[0]
+    title, _, year = title_input.rpartition(" (")
+    if title and year.endswith(")"):
+        for movie in find_movies_by_title(title):
+            if movie['title'] == title and str(movie['year']) == year[:-1]:
+                return movie
+    return None
+
+
+@traced("cli.show_movie_details")
+def show_movie_details():
+    """Show the stored OMDb details (director, cast, plot, ...) for a movie."""
     clear_screen()
-    movies = get_movies()
-    sorted_movies = sorted(movies.items(), key=lambda x: x[1]["year"])
-    print_colored("Movies sorted by year:", COLOR_TITLE)
-    for title, info in sorted_movies:
+    title_input = input(f"{COLOR_INPUT}Enter movie to show: {COLOR_RESET}").strip()
+
+    movie = find_exact_movie(title_input)
+    if movie is not None:
+        selected_title, movie_id = movie['title'], movie['id']
+    else:
+        suggestions = [
+            (f"{movie['title']} ({movie['year']})", movie['title'], movie['id'])
+            for movie in iter_movies(search=title_input)
+        ]
+
+        if not suggestions:
+            print_colored("No matching movie found.", COLOR_ERROR)
+            return
+
+        if len(suggestions) == 1:
+            _, selected_title, movie_id = suggestions[0]
+        else:
+            print_colored("Did you mean one of these?", COLOR_MENU)
+            for index, (label, _, _) in enumerate(suggestions, start=1):
+                print(f"{index}. {label}")
+
+            try:
+                choice = int(input(f"{COLOR_INPUT}Enter number to show or 0 to cancel: {COLOR_RESET}"))
+                if 1 <= choice <= len(suggestions):
+                    _, selected_title, movie_id = suggestions[choice - 1]
+                else:
+                    print_colored("Operation cancelled.", COLOR_MENU)
+                    return
+            except ValueError:
+                print_colored("Invalid input. Operation cancelled.", COLOR_ERROR)
+                return
+
+    details = get_movie_details(selected_title, movie_id)
+    if details is None:
+        print_colored(f"'{selected_title}' no longer exists in your database.", COLOR_ERROR)
+        return
+    print_colored(f"\n{details['title']} ({details['year']})", COLOR_TITLE)
+    print(f"OMDb Rating: {details['omdb_rating']:.1f}/10")
+    if details['user_rating'] is not None:
+        print(f"Your Rating: {details['user_rating']:.1f}/10")
+
+    if details['imdb_id'] is None and not details['genres']:
+        print_colored(
+            "\nNo OMDb details stored for this movie (it was added before details were saved).",
+            COLOR_MENU
+        )
+        return
+
+    if details['genres']:
+        print(f"Genre: {', '.join(details['genres'])}")
+    if details['director']:
+        print(f"Director: {details['director']}")
+    if details['actors']:
+        print(f"Actors: {', '.join(details['actors'])}")
+    if details['runtime']:
+        print(f"Runtime: {details['runtime']}")
+    if details['imdb_id']:
+        print(f"IMDb: https://www.imdb.com/title/{details['imdb_id']}/")
+    if details['plot']:
+        print_colored("\nPlot:", COLOR_MENU)
+        print(details['plot'])
+
+
+@traced("cli.browse_movies")
+def browse_movies():
+    """List stored movies of one genre or by one director."""
+    clear_screen()
+    print_colored("Browse by:", COLOR_MENU)
+    print("1. Genre")
+    print("2. Director")
+    print("0. Cancel")
+    choice = input(f"{COLOR_INPUT}Select: {COLOR_RESET}").strip()
+
+    if choice == "1":
+        genres = list_genres()
+        if not genres:
+            print_colored("No genre information stored yet.", COLOR_ERROR)
+            return
+        print_colored("\nGenres in your collection:", COLOR_MENU)
+        print(", ".join(f"{name} ({count})" for name, count in genres))
+        query = input(f"\n{COLOR_INPUT}Enter genre: {COLOR_RESET}").strip()
+        results = list_movies_by_genre(query)
+    elif choice == "2":
+        query = input(f"{COLOR_INPUT}Enter director: {COLOR_RESET}").strip()
+        results = list_movies_by_director(query)
+    else:
+        print_colored("Operation cancelled.", COLOR_MENU)
+        return
+
+    if not results:
+        print_colored(f"No movies found for '{query}'.", COLOR_ERROR)
+        return
+
+    print_colored(f"\n{len(results)} movie(s) for '{query}':", COLOR_TITLE)
+    for title, info in results.items():
         print(f"{title} ({info['year']}): {info['rating']:.2f}")
 
 
@@ -518,6 +722,9 @@ def sort_movies_by_year():
 def movie_database():
     """Run the interactive movie database application."""
     print_colored("********** \U0001F3AC My Movies Database \U0001F3AC **********", COLOR_TITLE)
+    if movie_storage_sql.current_collection != movie_storage_sql.DEFAULT_COLLECTION:
+        print_colored(f"Collection: {movie_storage_sql.current_collection}", COLOR_MENU)
+        use_collection_output_dir()
     while True:
         print_colored("\nMenu:", COLOR_MENU)
         print("0. Exit")
@@ -530,9 +737,11 @@ def movie_database():
         print("7. Search movie")
         print("8. Movies sorted by rating")
         print("9. Movies sorted by year")
+        print("D. Movie details")
+        print("B. Browse by genre/director")
         print("G. Generate website")  # New option!
 
-        choice = input(f"{COLOR_INPUT}Enter choice (0-9 or G): {COLOR_RESET}").strip().upper()
+        choice = input(f"{COLOR_INPUT}Enter choice (0-9, D, B or G): {COLOR_RESET}").strip().upper()
 
         if choice == "1":
             list_movies()
@@ -552,18 +761,27 @@ def movie_database():
             sort_movies_by_rating()
         elif choice == "9":
             sort_movies_by_year()
+        elif choice == "D":
+            show_movie_details()
+        elif choice == "B":
+            browse_movies()
         elif choice == "G":
             generate_website()
             input(f"\n{COLOR_INPUT}Press Enter to continue...{COLOR_RESET}")
         elif choice == "0":
+            shutdown_prefetch()
             print_colored("Exiting program. Goodbye! \U0001F44B", COLOR_INPUT)
             break
         else:
             print_colored(
-                "Invalid input. Please enter a number between 0-9 or G.",
+                "Invalid input. Please enter a number between 0-9, D, B or G.",
                 COLOR_ERROR
             )
 
 # ---------- Entry Point ----------
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Subcommands (list, search, add, ...) run once without the menu
+        from movie_cli import main
+        sys.exit(main())
     movie_database()
@@ -0,0 +1,636 @@
+"""
+Non-interactive command line for scripts and cron jobs.
+
+Each invocation runs one operation with a targeted query, writes
+machine-readable output to stdout and exits. Progress and status messages
+go to stderr, so stdout stays parseable.
+
+Usage:
+    python movie_app.py list [--sort rating --desc --limit 20] [--format csv]
+    python movie_app.py search godfather
+    python movie_app.py add "The Matrix" [--year 1999 | --imdb-id tt0133093] [--priority bulk]
+    python movie_app.py rate "The Matrix" 9.5      (or --clear to remove it)
+    python movie_app.py rate-batch ratings.csv     (columns: id or title, rating)
+    python movie_app.py random [--weighted] [--unrated] [--decade 1990]
+    python movie_app.py stats [--verify | --rebuild]
+    python movie_app.py disagreements [-k 10] [--direction higher|lower|both]
+    python movie_app.py changes [--since 120 | --consumer NAME] [--compact]
+    python movie_app.py analytics [--section correlation] [--export movies.npz]
+    python movie_app.py diff backup.db             (or another collection's name)
+    python movie_app.py merge alice.db [--ratings keep|theirs|max|min|newest] [--dry-run]
+    python movie_app.py backup backups/ [--keep 7] [--vacuum]
+    python movie_app.py compact [--incremental]
+    python movie_app.py maintenance
+    python movie_app.py snapshot [--path movies.snapshot]
+    python movie_app.py collections
+    python movie_app.py quota [--days 7]
+    python movie_app.py build-site
+
+Every command takes --collection NAME to work on that collection.
+
+Exit status: 0 on success, 1 if the movie was not found or the operation
+failed, 2 for usage errors, 3 if the OMDb quota deferred the request (retry
+after the daily reset).
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+
+import movie_storage_sql as storage
+
+MOVIE_FIELDS = ["id", "imdb_id", "title", "year", "omdb_rating", "user_rating", "rating", "poster"]
+FORMATS = ["json", "jsonl", "csv", "text"]
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_DEFERRED = 3
+
+
+class RecordWriter:
+    """Streams records to a file as a JSON array, JSON lines, CSV or text."""
+
+    def __init__(self, stream, output_format, fields):
+        self.stream = stream
+        self.format = output_format
+        self.fields = fields
+        self.count = 0
+        self._csv = None
+
+    def __enter__(self):
+        if self.format == "json":
+            self.stream.write("[")
+        elif self.format == "csv":
+            self._csv = csv.DictWriter(self.stream, fieldnames=self.fields, extrasaction="ignore")
+            self._csv.writeheader()
+        return self
+
+    def write(self, record):
+        if self.format == "json":
+            self.stream.write(",\n" if self.count else "\n")
+            self.stream.write(json.dumps({field: record.get(field) for field in self.fields}))
+        elif self.format == "jsonl":
+            self.stream.write(json.dumps({field: record.get(field) for field in self.fields}) + "\n")
+        elif self.format == "csv":
+            self._csv.writerow(record)
+        else:
+            self.stream.write("\t".join(_text(record.get(field)) for field in self.fields) + "\n")
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, traceback):
+        if self.format == "json":
+            self.stream.write("\n]\n" if self.count else "]\n")
+        self.stream.flush()
+        return False
+
+
+def _text(value):
+    """Format a value for the tab-separated text output."""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.1f}"
+    return str(value)
+
+
+def write_record(stream, output_format, record):
+    """Write a single record (used by commands that return one object)."""
+    fields = list(record)
+    if output_format == "json":
+        stream.write(json.dumps(record, indent=2) + "\n")
+        return
+    with RecordWriter(stream, output_format, fields) as writer:
+        writer.write(record)
+
+
+# ---------- Commands ----------
+def cmd_list(args, out):
+    movies = storage.iter_movies(order_by=args.sort, descending=args.desc, limit=args.limit)
+    with RecordWriter(out, args.format, MOVIE_FIELDS) as writer:
+        for movie in movies:
+            writer.write(movie)
+    return EXIT_OK
+
+
+def cmd_search(args, out):
+    movies = storage.iter_movies(order_by=args.sort, descending=args.desc,
+                                 search=args.query, limit=args.limit)
+    with RecordWriter(out, args.format, MOVIE_FIELDS) as writer:
+        for movie in movies:
+            writer.write(movie)
+    return EXIT_OK if writer.count else EXIT_FAILED
+
+
+def cmd_add(args, out):
+    import omdb_quota
+    from movie_api import BASE_URL, OMDbConfigError, get_movie_with_rating
+
+    if args.imdb_id and storage.movie_exists(args.imdb_id):
+        write_record(out, args.format, {"status": "exists", "imdb_id": args.imdb_id})
+        return EXIT_OK
+
+    def deferred():
+        write_record(out, args.format, {"status": "deferred", "title": args.title,
+                                        "resets_in": omdb_quota.status(base_url=BASE_URL)["resets_in"]})
+        return EXIT_DEFERRED
+
+    if not omdb_quota.admits(args.priority, BASE_URL):
+        omdb_quota.defer(args.priority, BASE_URL)
+        return deferred()
+    try:
+        api_data = get_movie_with_rating(args.title, args.year, args.imdb_id, args.priority)
+    except omdb_quota.QuotaExceeded as e:
+        # Counted as deferred where it was refused
+        print(e, file=sys.stderr)
+        return deferred()
+    except OMDbConfigError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_FAILED
+    if not api_data:
+        write_record(out, args.format, {"status": "not_found", "title": args.title})
+        return EXIT_FAILED
+
+    if storage.movie_exists(api_data.get("imdb_id"), api_data["title"], api_data["year"]):
+        status = "exists"
+    elif storage.add_movie(api_data["title"], api_data["year"], api_data["rating"],
+                           api_data.get("poster"), details=api_data):
+        status = "added"
+    else:
+        status = "failed"
+
+    write_record(out, args.format, {
+        "status": status,
+        "imdb_id": api_data.get("imdb_id"),
+        "title": api_data["title"],
+        "year": api_data["year"],
+        "omdb_rating": api_data["rating"]
+    })
+    return EXIT_FAILED if status == "failed" else EXIT_OK
+
+
+def cmd_rate(args, out):
+    if args.clear:
+        updated = storage.reset_user_rating(args.title, args.id)
+        rating = None
+    else:
+        if args.rating is None or not 0 <= args.rating <= 10:
+            print("Rating must be between 0 and 10 (or use --clear).", file=sys.stderr)
+            return 2
+        rating = round(args.rating, 1)
+        updated = storage.update_movie(args.title, rating, args.id)
+
+    write_record(out, args.format, {
+        "status": "updated" if updated else "not_found",
+        "title": args.title,
+        "id": args.id,
+        "user_rating": rating
+    })
+    return EXIT_OK if updated else EXIT_FAILED
+
+
+def read_rating_pairs(stream, clear=False):
+    """Parse a CSV of id or title plus rating columns into (key, rating) pairs.
+
+    An empty rating (or --clear) removes the personal rating.
+    """
+    reader = csv.DictReader(stream)
+    columns = set(reader.fieldnames or ())
+    if not columns & {"id", "title"}:
+        raise ValueError("the CSV needs an 'id' or 'title' column")
+    if not clear and "rating" not in columns:
+        raise ValueError("the CSV needs a 'rating' column (or use --clear)")
+
+    pairs = []
+    for line, row in enumerate(reader, start=2):
+        movie_id = (row.get("id") or "").strip()
+        title = (row.get("title") or "").strip()
+        if not movie_id and not title:
+            raise ValueError(f"line {line}: no id or title")
+        rating = "" if clear else (row.get("rating") or "").strip()
+        try:
+            pairs.append((int(movie_id) if movie_id else title, float(rating) if rating else None))
+        except ValueError:
+            raise ValueError(f"line {line}: invalid id or rating")
+    return pairs
+
+
+def cmd_rate_batch(args, out):
+    if args.file == "-":
+        pairs = read_rating_pairs(sys.stdin, args.clear)
+    else:
+        with open(args.file, newline="", encoding="utf-8") as f:
+            pairs = read_rating_pairs(f, args.clear)
+
+    result = storage.update_ratings_batch(pairs)
+    write_record(out, args.format, {
+        "status": "updated" if not result["not_found"] else "partial",
+        **result
+    })
+    for key in result["not_found"]:
+        print(f"Not found: {key}", file=sys.stderr)
+    return EXIT_OK if not result["not_found"] else EXIT_FAILED
+
+
+def cmd_random(args, out):
+    movie = storage.pick_random_movie(weight="rating" if args.weighted else None,
+                                      unrated_only=args.unrated, decade=args.decade)
+    if movie is None:
+        write_record(out, args.format, {"status": "not_found"})
+        return EXIT_FAILED
+    write_record(out, args.format, {field: movie.get(field) for field in MOVIE_FIELDS})
+    return EXIT_OK
+
+
+def cmd_disagreements(args, out):
+    pairs = storage.get_rating_disagreements(args.k, args.direction)
+    with RecordWriter(out, args.format, ["title", "difference"]) as writer:
+        for title, difference in pairs:
+            writer.write({"title": title, "difference": difference})
+    return EXIT_OK
+
+
+def cmd_stats(args, out):
+    if args.verify:
+        differences = storage.verify_stats()
+        write_record(out, args.format, {"status": "ok" if not differences else "mismatch",
+                                        "differences": len(differences)})
+        for difference in differences:
+            print(difference, file=sys.stderr)
+        return EXIT_OK if not differences else EXIT_FAILED
+    if args.rebuild:
+        write_record(out, args.format, storage.rebuild_stats())
+        return EXIT_OK
+    write_record(out, args.format, storage.get_rating_stats())
+    return EXIT_OK
+
+
+def cmd_changes(args, out):
+    if args.compact:
+        deleted = storage.compact_changes(args.max_age_days)
+        write_record(out, args.format, {"status": "compacted", "deleted": deleted})
+        return EXIT_OK
+
+    cursor = args.since
+    if args.consumer:
+        cursor = storage.get_consumer_cursor(args.consumer)
+        if cursor is None:
+            # A new consumer has seen nothing yet: it scans the movies once
+            # and follows the log from the current position
+            cursor = storage.get_latest_change_seq()
+            storage.save_consumer_cursor(args.consumer, cursor)
+            print(f"Registered consumer {args.consumer} at change {cursor}; "
+                  f"scan the movies once, later runs list only new changes", file=sys.stderr)
+    try:
+        changes = storage.get_changes_since(cursor, args.limit)
+    except storage.ChangesCompacted as e:
+        print(f"{e} (latest change: {storage.get_latest_change_seq()})", file=sys.stderr)
+        return EXIT_FAILED
+
+    with RecordWriter(out, args.format, list(storage.CHANGE_FIELDS)) as writer:
+        for change in changes:
+            writer.write(change)
+    if args.consumer and changes:
+        storage.save_consumer_cursor(args.consumer, changes[-1]["seq"])
+    return EXIT_OK
+
+
+def _flatten(record, prefix=""):
+    """Flatten nested dicts to dotted keys for the csv and text formats."""
+    flat = {}
+    for key, value in record.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def cmd_analytics(args, out):
+    try:
+        import movie_analytics as analytics
+
+        columns = analytics.load_export(args.input) if args.input else analytics.load_columns()
+        if args.export:
+            path = analytics.export_columns(args.export, columns)
+            print(f"Exported {len(columns['id'])} movies to {path}", file=sys.stderr)
+        sections = {
+            "percentiles": analytics.rating_percentiles,
+            "decades": analytics.decade_histograms,
+            "differences": analytics.difference_distribution,
+            "correlation": analytics.rating_correlation
+        }
+        if args.section == "all":
+            record = analytics.summarize(columns)
+        else:
+            record = sections[args.section](columns)
+    except ImportError as e:
+        print(e, file=sys.stderr)
+        return EXIT_FAILED
+    if args.input and analytics.is_stale(columns):
+        print(f"Note: {args.input} is older than the database", file=sys.stderr)
+
+    write_record(out, args.format, record if args.format == "json" else _flatten(record))
+    return EXIT_OK
+
+
+def cmd_diff(args, out):
+    try:
+        differences = storage.diff_database(args.other)
+    except (LookupError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return EXIT_FAILED
+    with RecordWriter(out, args.format, list(storage.DIFF_FIELDS)) as writer:
+        for difference in differences:
+            writer.write(difference)
+    print(f"{writer.count} differences", file=sys.stderr)
+    return EXIT_OK
+
+
+def cmd_merge(args, out):
+    try:
+        result = storage.merge_database(args.other, args.ratings, args.dry_run)
+    except (LookupError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return EXIT_FAILED
+    write_record(out, args.format, result)
+    return EXIT_OK
+
+
+def cmd_backup(args, out):
+    import movie_maintenance as maintenance
+
+    if args.vacuum:
+        record = maintenance.vacuum_into(args.destination)
+    else:
+        record = maintenance.backup_database(args.destination, pages=args.pages,
+                                             sleep=args.sleep)
+    if args.keep is not None:
+        directory = os.path.dirname(record["path"]) or "."
+        record["pruned"] = len(maintenance.prune_backups(directory, args.keep))
+    print(f"Backed up to {record['path']} in {record['ms']} ms", file=sys.stderr)
+    write_record(out, args.format, record)
+    return EXIT_OK
+
+
+def cmd_compact(args, out):
+    import movie_maintenance as maintenance
+
+    write_record(out, args.format, maintenance.compact(incremental=args.incremental))
+    return EXIT_OK
+
+
+def cmd_maintenance(args, out):
+    import movie_maintenance as maintenance
+
+    write_record(out, args.format, maintenance.optimize(args.pages))
+    return EXIT_OK
+
+
+def cmd_snapshot(args, out):
+    import movie_snapshot
+
+    path = movie_snapshot.write_snapshot(args.path)
+    with movie_snapshot.MovieSnapshot(path) as snapshot:
+        record = {"path": path, "movies": len(snapshot), "change_seq": snapshot.change_seq}
+    write_record(out, args.format, record)
+    return EXIT_OK
+
+
+def cmd_collections(args, out):
+    with RecordWriter(out, args.format, ["name", "path", "size_bytes", "current"]) as writer:
+        for name in storage.list_collections():
+            path = storage.collection_path(name)
+            writer.write({
+                "name": name,
+                "path": path,
+                "size_bytes": os.path.getsize(path) if path and os.path.exists(path) else None,
+                "current": name == storage.current_collection
+            })
+    return EXIT_OK
+
+
+def cmd_quota(args, out):
+    import omdb_quota
+
+    if args.days:
+        with RecordWriter(out, args.format, ["day", "priority", "requests", "deferred"]) as writer:
+            for day, priority, requests, deferred in omdb_quota.history(args.days):
+                writer.write({"day": day, "priority": priority,
+                              "requests": requests, "deferred": deferred})
+        return EXIT_OK
+
+    status = omdb_quota.status()
+    record = {field: status[field]
+              for field in ("day", "limit", "used", "remaining", "exhausted", "resets_in")}
+    for priority in omdb_quota.PRIORITIES:
+        record[f"{priority}_requests"] = status["by_priority"][priority]["requests"]
+        record[f"{priority}_deferred"] = status["by_priority"][priority]["deferred"]
+        record[f"{priority}_available"] = (status["available"] or {}).get(priority)
+    write_record(out, args.format, record)
+    return EXIT_OK
+
+
+def cmd_build_site(args, out):
+    import website_generator
+
+    if args.output_dir:
+        website_generator.set_output_dir(args.output_dir)
+    else:
+        website_generator.use_collection_output_dir()
+    website_generator.generate_website(open_browser=args.open)
+    write_record(out, args.format, {
+        "status": "built",
+        "output": f"{website_generator.OUTPUT_DIR}/{website_generator.HTML_FILE}"
+    })
+    return EXIT_OK
+
+
+# ---------- Argument parsing ----------
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="movie_app.py",
+        description="Movie database command line (run without arguments for the menu)."
+    )
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--format", "-f", choices=FORMATS, default="json",
+                        help="output format (default: %(default)s)")
+    common.add_argument("--collection", "-c", metavar="NAME",
+                        help="work on this collection (default: MOVIES_COLLECTION or the main one)")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="COMMAND")
+
+    def add_listing_options(command):
+        command.add_argument("--sort", choices=list(storage.MOVIE_ORDERINGS), default="title")
+        command.add_argument("--desc", action="store_true", help="reverse the sort order")
+        command.add_argument("--limit", type=int, help="return at most this many movies")
+
+    list_command = commands.add_parser("list", parents=[common], help="list movies")
+    add_listing_options(list_command)
+    list_command.set_defaults(handler=cmd_list)
+
+    search_command = commands.add_parser("search", parents=[common],
+                                         help="find movies whose title contains QUERY")
+    search_command.add_argument("query")
+    add_listing_options(search_command)
+    search_command.set_defaults(handler=cmd_search)
+
+    add_command = commands.add_parser("add", parents=[common], help="add a movie from OMDb")
+    add_command.add_argument("title")
+    add_command.add_argument("--year", help="release year, to pick one version")
+    add_command.add_argument("--imdb-id", help="exact IMDb ID (e.g. tt0133093)")
+    add_command.add_argument("--priority", choices=["interactive", "bulk"], default="interactive",
+                             help="OMDb quota class; use bulk for batch jobs (default: %(default)s)")
+    add_command.set_defaults(handler=cmd_add)
+
+    rate_command = commands.add_parser("rate", parents=[common], help="set or clear your rating")
+    rate_command.add_argument("title")
+    rate_command.add_argument("rating", type=float, nargs="?")
+    rate_command.add_argument("--clear", action="store_true", help="remove your rating")
+    rate_command.add_argument("--id", type=int, help="movie id (for remakes sharing a title)")
+    rate_command.set_defaults(handler=cmd_rate)
+
+    batch_command = commands.add_parser(
+        "rate-batch", parents=[common],
+        help="set or clear many ratings from a CSV (columns: id or title, rating)"
+    )
+    batch_command.add_argument("file", help="CSV file, or - for stdin")
+    batch_command.add_argument("--clear", action="store_true",
+                               help="remove the rating of every listed movie")
+    batch_command.set_defaults(handler=cmd_rate_batch)
+
+    random_command = commands.add_parser("random", parents=[common], help="pick a random movie")
+    random_command.add_argument("--weighted", action="store_true",
+                                help="favour higher-rated movies")
+    random_command.add_argument("--unrated", action="store_true",
+                                help="only movies you have not rated")
+    random_command.add_argument("--decade", type=int, help="only this decade, e.g. 1990")
+    random_command.set_defaults(handler=cmd_random)
+
+    stats_command = commands.add_parser("stats", parents=[common], help="collection statistics")
+    stats_options = stats_command.add_mutually_exclusive_group()
+    stats_options.add_argument("--verify", action="store_true",
+                               help="recompute the stats from scratch and report differences")
+    stats_options.add_argument("--rebuild", action="store_true",
+                               help="recompute the stats snapshot from scratch")
+    stats_command.set_defaults(handler=cmd_stats)
+
+    gaps_command = commands.add_parser("disagreements", parents=[common],
+                                       help="movies where your rating differs most from OMDb")
+    gaps_command.add_argument("-k", type=int, default=10, help="how many (default: %(default)s)")
+    gaps_command.add_argument("--direction", choices=storage.DISAGREEMENT_DIRECTIONS, default="both",
+                              help="higher: you rated above OMDb, lower: below (default: both)")
+    gaps_command.set_defaults(handler=cmd_disagreements)
+
+    changes_command = commands.add_parser("changes", parents=[common],
+                                          help="movie changes recorded in the change log")
+    changes_command.add_argument("--since", type=int, default=0,
+                                 help="only changes after this sequence number")
+    changes_command.add_argument("--consumer",
+                                 help="resume from this consumer's saved cursor and advance it")
+    changes_command.add_argument("--limit", type=int, default=1000,
+                                 help="at most this many changes (default: %(default)s)")
+    changes_command.add_argument("--compact", action="store_true",
+                                 help="delete changes every consumer has processed")
+    changes_command.add_argument("--max-age-days", type=float,
+                                 help="with --compact, also delete changes older than this")
+    changes_command.set_defaults(handler=cmd_changes)
+
+    analytics_command = commands.add_parser(
+        "analytics", parents=[common],
+        help="rating percentiles, decade histograms, differences and correlation (needs NumPy)"
+    )
+    analytics_command.add_argument(
+        "--section", default="all",
+        choices=["all", "percentiles", "decades", "differences", "correlation"]
+    )
+    analytics_command.add_argument("--export", metavar="PATH",
+                                   help="also save the columns to PATH (.npz, or .parquet with pyarrow)")
+    analytics_command.add_argument("--input", metavar="PATH",
+                                   help="analyze a previous export instead of the database")
+    analytics_command.set_defaults(handler=cmd_analytics)
+
+    diff_command = commands.add_parser("diff", parents=[common],
+                                       help="list differences from another database or collection")
+    diff_command.add_argument("other", help="database file (e.g. a backup) or collection name")
+    diff_command.set_defaults(handler=cmd_diff)
+
+    merge_command = commands.add_parser("merge", parents=[common],
+                                        help="copy another database's movies and ratings into this one")
+    merge_command.add_argument("other", help="database file or collection name")
+    merge_command.add_argument("--ratings", choices=list(storage.MERGE_POLICIES), default="keep",
+                               help="for movies rated on both sides: keep ours, take theirs, "
+                                    "the higher/lower or the newest (default: %(default)s)")
+    merge_command.add_argument("--dry-run", action="store_true",
+                               help="report what would change without changing anything")
+    merge_command.set_defaults(handler=cmd_merge)
+
+    backup_command = commands.add_parser("backup", parents=[common],
+                                         help="back up the live database without blocking the app")
+    backup_command.add_argument("destination", help="backup file, or a directory for a timestamped one")
+    backup_command.add_argument("--pages", type=int, default=256,
+                                help="pages copied per step (default: %(default)s, -1 for all at once)")
+    backup_command.add_argument("--sleep", type=float, default=0.005,
+                                help="seconds between steps (default: %(default)s)")
+    backup_command.add_argument("--vacuum", action="store_true",
+                                help="write a compacted copy with VACUUM INTO instead")
+    backup_command.add_argument("--keep", type=int, metavar="N",
+                                help="then delete all but the N newest backups in that directory")
+    backup_command.set_defaults(handler=cmd_backup)
+
+    compact_command = commands.add_parser("compact", parents=[common],
+                                          help="VACUUM the database (blocks writers while it runs)")
+    compact_command.add_argument("--incremental", action="store_true",
+                                 help="switch to incremental vacuum, so `maintenance` can reclaim space")
+    compact_command.set_defaults(handler=cmd_compact)
+
+    maintenance_command = commands.add_parser(
+        "maintenance", parents=[common],
+        help="PRAGMA optimize and incremental vacuum (for cron)"
+    )
+    maintenance_command.add_argument("--pages", type=int, default=0,
+                                     help="free pages to reclaim at most (default: all)")
+    maintenance_command.set_defaults(handler=cmd_maintenance)
+
+    snapshot_command = commands.add_parser("snapshot", parents=[common],
+                                           help="write the memory-mapped read-only snapshot")
+    snapshot_command.add_argument("--path", help="snapshot file (default: MOVIES_SNAPSHOT)")
+    snapshot_command.set_defaults(handler=cmd_snapshot)
+
+    collections_command = commands.add_parser("collections", parents=[common],
+                                              help="list the collections")
+    collections_command.set_defaults(handler=cmd_collections)
+
+    quota_command = commands.add_parser("quota", parents=[common],
+                                        help="OMDb requests used and left today")
+    quota_command.add_argument("--days", type=int, help="per-day history for this many days instead")
+    quota_command.set_defaults(handler=cmd_quota)
+
+    site_command = commands.add_parser("build-site", parents=[common],
+                                       help="generate the static website")
+    site_command.add_argument("--output-dir", help="directory to write the site to")
+    site_command.add_argument("--open", action="store_true", help="open it in a browser")
+    site_command.set_defaults(handler=cmd_build_site)
+
+    return parser
+
+
+def main(argv=None):
+    """Run one command; returns the process exit status."""
+    args = build_parser().parse_args(argv)
+    out = sys.stdout
+    # Status messages printed by the storage/API layers go to stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            if args.collection:
+                storage.use_collection(args.collection)
+            return args.handler(args, out)
+        except BrokenPipeError:
+            return EXIT_OK
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+"""
+Online backups and compaction of the movie database.
+
+    backup_database()   copies the live database with SQLite's online backup
+                        API, a few pages per step, so the app keeps reading
+                        and writing while a backup runs
+    vacuum_into()       writes a compacted copy (VACUUM INTO), which also
+                        shows how much space a VACUUM would reclaim
+    optimize()          PRAGMA optimize plus, where enabled, an incremental
+                        vacuum; cheap enough to run from cron every night
+    compact()           full VACUUM of the live file (blocks writers while
+                        it runs), optionally switching to incremental vacuum
+
+Every function works on the current collection (see use_collection) and
+returns a report with timings and sizes.
+
+Example (crontab):
+    15 3 * * *  cd /srv/movies && python movie_app.py backup backups/ --keep 7
+    30 3 * * *  cd /srv/movies && python movie_app.py maintenance
+"""
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+import movie_storage_sql as storage
+
+# Pages copied per backup step, and the pause between steps that lets other
+# connections take their locks
+BACKUP_PAGES = 256
+BACKUP_SLEEP = 0.005
+# Writes by other connections restart a stepped backup; after this many
+# restarts the rest is copied in one step (holding a read lock meanwhile)
+BACKUP_MAX_RESTARTS = 3
+
+# Pages returned to the file system per optimize() run (0 = all free pages)
+INCREMENTAL_VACUUM_PAGES = 0
+
+AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+
+def database_path():
+    """Return the file of the current collection's database."""
+    path = storage.engine.url.database
+    if storage.engine.url.get_backend_name() != "sqlite" or path in (None, "", ":memory:"):
+        raise ValueError("Backups need a file-based SQLite database")
+    return path
+
+
+def _file_size(path):
+    """Size of a database file including its -wal file, in bytes."""
+    size = 0
+    for name in (path, path + "-wal"):
+        try:
+            size += os.path.getsize(name)
+        except OSError:
+            pass
+    return size
+
+
+def database_stats():
+    """Return page size, page and free-page counts, auto_vacuum mode and file size."""
+    path = database_path()
+    with storage.engine.connect() as connection:
+        page_size, page_count, freelist, auto_vacuum = (
+            connection.exec_driver_sql(f"PRAGMA {name}").scalar_one()
+            for name in ("page_size", "page_count", "freelist_count", "auto_vacuum")
+        )
+    return {
+        "path": path,
+        "page_size": page_size,
+        "pages": page_count,
+        "free_pages": freelist,
+        "free_bytes": freelist * page_size,
+        "auto_vacuum": AUTO_VACUUM_MODES.get(auto_vacuum, auto_vacuum),
+        "file_bytes": _file_size(path)
+    }
+
+
+def _backup_target(destination):
+    """Resolve a directory destination to a timestamped file inside it."""
+    if os.path.isdir(destination) or destination.endswith(os.sep):
+        os.makedirs(destination, exist_ok=True)
+        name = os.path.splitext(os.path.basename(database_path()))[0]
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        return os.path.join(destination, f"{name}-{stamp}.db")
+    return destination
+
+
+def prune_backups(directory, keep):
+    """Delete all but the ``keep`` newest backups of this database in ``directory``.
+
+    Only files named like backup_database() names them are considered.
+    Returns the deleted paths.
+    """
+    name = os.path.splitext(os.path.basename(database_path()))[0]
+    backups = sorted(
+        entry for entry in os.listdir(directory)
+        if entry.startswith(f"{name}-") and entry.endswith(".db")
+        and entry[len(name) + 1:-3].replace("-", "").isdigit()
+    )
+    deleted = []
+    for entry in backups[:max(0, len(backups) - keep)]:
+        os.remove(os.path.join(directory, entry))
+        deleted.append(os.path.join(directory, entry))
+    return deleted
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def backup_database(destination, pages=BACKUP_PAGES, sleep=BACKUP_SLEEP,
+                    max_restarts=BACKUP_MAX_RESTARTS, progress=None):
+    """Copy the live database to ``destination`` without blocking the app.
+
+    Each step copies ``pages`` pages and then sleeps ``sleep`` seconds, so
+    locks are only held briefly. If another connection writes in between,
+    SQLite restarts the copy to keep it consistent. A database that keeps
+    changing would never finish, so after ``max_restarts`` restarts the copy
+    is redone in a single step, which holds a read lock until it is done.
+    The copy is written next to its final name and moved into place.
+
+    Args:
+        destination: backup file, or a directory for a timestamped file
+        pages: pages per step (-1 copies everything in one step)
+        sleep: seconds to pause between steps
+        max_restarts: restarts tolerated before copying in one step
+        progress: optional callback(copied_pages, total_pages)
+
+    Returns:
+        {"path", "bytes", "pages", "steps", "restarts", "single_step", "ms"}
+    """
+    target_path = _backup_target(destination)
+    temp_path = target_path + ".tmp"
+    steps = 0
+    restarts = 0
+    remaining_before = None
+
+    def on_step(status, remaining, total):
+        nonlocal steps, restarts, remaining_before
+        steps += 1
+        if remaining_before is not None and remaining > remaining_before:
+            restarts += 1
+            if restarts > max_restarts:
+                raise _TooManyRestarts()
+        remaining_before = remaining
+        if progress is not None:
+            progress(total - remaining, total)
+
+    started = time.perf_counter()
+    single_step = pages < 1
+    source = storage.engine.raw_connection()
+    try:
+        target = sqlite3.connect(temp_path)
+        try:
+            try:
+                source.dbapi_connection.backup(target, pages=pages, progress=on_step, sleep=sleep)
+            except _TooManyRestarts:
+                single_step = True
+                restarts -= 1
+                source.dbapi_connection.backup(target, pages=-1, progress=on_step)
+            page_count = target.execute("PRAGMA page_count").fetchone()[0]
+        finally:
+            target.close()
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    finally:
+        source.close()
+    os.replace(temp_path, target_path)
+    return {
+        "path": target_path,
+        "bytes": os.path.getsize(target_path),
+        "pages": page_count,
+        "steps": steps,
+        "restarts": restarts,
+        "single_step": single_step,
+        "ms": round((time.perf_counter() - started) * 1000)
+    }
+
+
+def vacuum_into(destination):
+    """Write a compacted copy of the database with VACUUM INTO.
+
+    Unlike backup_database() this rebuilds every table and index (one read
+    transaction, so writers wait only if the file is in rollback mode and
+    they need an exclusive lock). The report's "reclaimable_bytes" is what
+    a full compact() would save.
+    """
+    target_path = _backup_target(destination)
+    if os.path.exists(target_path):
+        raise ValueError(f"{target_path} already exists")
+    source_bytes = _file_size(database_path())
+    started = time.perf_counter()
+    with storage.engine.connect() as connection:
+        connection.exec_driver_sql("VACUUM INTO ?", (target_path,))
+    copy_bytes = os.path.getsize(target_path)
+    return {
+        "path": target_path,
+        "bytes": copy_bytes,
+        "source_bytes": source_bytes,
+        "reclaimable_bytes": max(0, source_bytes - copy_bytes),
+        "ms": round((time.perf_counter() - started) * 1000)
+    }
+
+
+def optimize(incremental_pages=INCREMENTAL_VACUUM_PAGES):
+    """Refresh query planner statistics and return free pages where possible.
+
+    Runs PRAGMA optimize, which only analyzes what needs it. When the
+    database uses incremental auto_vacuum (see compact), up to
+    ``incremental_pages`` free pages (0 = all) are also handed back to the
+    file system. Neither blocks readers for long.
+    """
+    before = database_stats()
+    started = time.perf_counter()
+    with storage.engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA optimize")
+        if before["auto_vacuum"] == "incremental" and before["free_pages"]:
+            # Each step of the statement frees one page; execute() would stop
+            # after the first, executescript() runs it to completion
+            connection.connection.dbapi_connection.executescript(
+                f"PRAGMA incremental_vacuum({int(incremental_pages)});"
+            )
+        connection.commit()
+    after = database_stats()
+    return {
+        "auto_vacuum": after["auto_vacuum"],
+        "free_pages_before": before["free_pages"],
+        "free_pages_after": after["free_pages"],
+        "bytes_before": before["file_bytes"],
+        "bytes_after": after["file_bytes"],
+        "bytes_reclaimed": max(0, before["file_bytes"] - after["file_bytes"]),
+        "ms": round((time.perf_counter() - started) * 1000)
+    }
+
+
+def compact(incremental=False):
+    """Rebuild the database file with VACUUM, reclaiming every free page.
+
+    VACUUM needs an exclusive lock for its whole run, so prefer optimize()
+    for routine upkeep. With ``incremental``, the file switches to
+    incremental auto_vacuum first (this only takes effect through a VACUUM,
+    so it is done here once), after which optimize() can reclaim space
+    without rebuilding the file.
+    """
+    before = database_stats()
+    started = time.perf_counter()
+    with storage.engine.connect() as connection:
+        if incremental:
+            connection.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        connection.exec_driver_sql("VACUUM")
+    after = database_stats()
+    return {
+        "auto_vacuum": after["auto_vacuum"],
+        "bytes_before": before["file_bytes"],
+        "bytes_after": after["file_bytes"],
+        "bytes_reclaimed": max(0, before["file_bytes"] - after["file_bytes"]),
+        "ms": round((time.perf_counter() - started) * 1000)
+    }
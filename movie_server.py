@@ -0,0 +1,332 @@
+"""
+Read-only local HTTP JSON API over the movie database.
+
+Endpoints:
+    GET /movies?page=1&per_page=50&sort=title&desc=0    paginated list
+    GET /movies/search?q=matrix&page=1&per_page=50       title search
+    GET /movies/<id>                                     full movie record
+    GET /stats                                           rating statistics
+
+Every response carries an ETag and Last-Modified derived from the newest
+date_updated/date_added in the movies table. The validator is cached and only
+recomputed when the database file changes on disk, so conditional requests
+(If-None-Match / If-Modified-Since) are answered with 304 without touching
+the database, and repeated requests are served from a small response cache.
+Queries use the storage engine's connection pool; size it for the expected
+concurrency with MOVIES_DB_POOL_SIZE.
+
+Usage:
+    python movie_server.py [--host 127.0.0.1] [--port 8000] [--verbose]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from sqlalchemy.exc import SQLAlchemyError
+
+import movie_storage_sql as storage
+from instrumentation import count, span
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 500
+RESPONSE_CACHE_SIZE = 256
+
+MOVIE_PATH = re.compile(r"^/movies/(\d+)$")
+
+
+def _database_path():
+    """Return the SQLite file behind the storage engine (None for in-memory)."""
+    database = storage.engine.url.database
+    if not database or database == ":memory:":
+        return None
+    return os.path.abspath(database)
+
+
+class Validators:
+    """Caches the ETag/Last-Modified pair until the database file changes.
+
+    Checking for changes costs one stat() of the database file (and its WAL);
+    the marker query only runs after a write.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._signature = None
+        self._current = None
+
+    def _file_signature(self):
+        if self.db_path is None:
+            return None
+        signature = []
+        for path in (self.db_path, self.db_path + "-wal"):
+            try:
+                info = os.stat(path)
+            except FileNotFoundError:
+                continue
+            signature.append((info.st_mtime_ns, info.st_size))
+        return tuple(signature)
+
+    def current(self):
+        """Return (etag, last_modified datetime, generation)."""
+        signature = self._file_signature()
+        with self._lock:
+            if self._current is not None and signature is not None and signature == self._signature:
+                return self._current
+
+        with span("server.validate"):
+            marker, max_id = storage.get_change_marker()
+        count("server.validator_queries")
+        if marker:
+            last_modified = datetime.strptime(marker, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+        else:
+            last_modified = datetime.fromtimestamp(0, timezone.utc)
+        if signature:
+            # Deletes leave no timestamp behind, so never report a
+            # Last-Modified older than the file itself
+            file_mtime = datetime.fromtimestamp(signature[0][0] // 10 ** 9, timezone.utc)
+            last_modified = max(last_modified, file_mtime)
+        digest = hashlib.sha1(repr((marker, max_id, signature)).encode("utf-8")).hexdigest()[:16]
+
+        with self._lock:
+            generation = (self._current[2] + 1) if self._current else 1
+            self._signature = signature
+            self._current = (f'"{digest}"', last_modified, generation)
+            return self._current
+
+
+class ResponseCache:
+    """Small LRU of encoded JSON bodies, emptied whenever the data changes."""
+
+    def __init__(self, size=RESPONSE_CACHE_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generation = None
+
+    def get(self, key, generation):
+        with self._lock:
+            if generation != self._generation:
+                self._entries.clear()
+                self._generation = generation
+                return None
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, generation, body):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = body
+            if len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
+class BadRequest(ValueError):
+    """Raised for invalid query parameters (answered with 400)."""
+
+
+def _int_param(query, name, default, minimum, maximum=None):
+    raw = query.get(name, [None])[0]
+    if raw is None or raw == "":
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer")
+    if value < minimum or (maximum is not None and value > maximum):
+        limit = f"between {minimum} and {maximum}" if maximum is not None else f"at least {minimum}"
+        raise BadRequest(f"{name} must be {limit}")
+    return value
+
+
+def _page_of_movies(query, search=None):
+    page = _int_param(query, "page", 1, 1)
+    per_page = _int_param(query, "per_page", DEFAULT_PER_PAGE, 1, MAX_PER_PAGE)
+    order_by = query.get("sort", ["title"])[0]
+    if order_by not in storage.MOVIE_ORDERINGS:
+        raise BadRequest(f"sort must be one of: {', '.join(storage.MOVIE_ORDERINGS)}")
+    descending = query.get("desc", ["0"])[0].lower() in ("1", "true", "yes")
+
+    total = storage.count_movies(search)
+    movies = list(storage.iter_movies(order_by=order_by, descending=descending, search=search,
+                                      limit=per_page, offset=(page - 1) * per_page))
+    return {
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "pages": (total + per_page - 1) // per_page,
+        "movies": movies
+    }
+
+
+def list_endpoint(query):
+    return _page_of_movies(query)
+
+
+def search_endpoint(query):
+    search = query.get("q", [""])[0].strip()
+    if not search:
+        raise BadRequest("q is required")
+    result = _page_of_movies(query, search)
+    result["query"] = search
+    return result
+
+
+def stats_endpoint(query):
+    return storage.get_rating_stats()
+
+
+ROUTES = {
+    "/movies": list_endpoint,
+    "/movies/search": search_endpoint,
+    "/stats": stats_endpoint
+}
+
+
+class MovieAPIHandler(BaseHTTPRequestHandler):
+    """Serves the JSON endpoints with conditional-request support."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "MovieServer/1.0"
+    # Buffer headers with the body and disable Nagle, so keep-alive clients
+    # don't stall ~40 ms on delayed ACKs for bodies larger than the buffer
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = url.path.rstrip("/") or "/"
+        count("server.requests")
+
+        match = MOVIE_PATH.match(path)
+        if match is None and path not in ROUTES:
+            self._send_json(404, {"error": f"Unknown endpoint: {path}",
+                                  "endpoints": sorted(ROUTES) + ["/movies/<id>"]})
+            return
+
+        etag, last_modified, generation = self.server.validators.current()
+        if self._not_modified(etag, last_modified):
+            count("server.not_modified")
+            self.send_response(304)
+            self._send_cache_headers(etag, last_modified)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        cache_key = f"{path}?{url.query}"
+        body = self.server.responses.get(cache_key, generation)
+        if body is not None:
+            count("server.cache_hits")
+            self._send_body(200, body, etag, last_modified)
+            return
+
+        try:
+            with span("server.query", path=path):
+                if match is not None:
+                    payload = storage.get_movie_details(None, int(match.group(1)))
+                    if payload is None:
+                        self._send_json(404, {"error": f"Movie {match.group(1)} not found"})
+                        return
+                else:
+                    payload = ROUTES[path](parse_qs(url.query))
+        except BadRequest as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        except SQLAlchemyError as e:
+            self.log_error("Database error: %s", e)
+            self._send_json(500, {"error": "Database error"})
+            return
+
+        body = json.dumps(payload).encode("utf-8")
+        self.server.responses.put(cache_key, generation, body)
+        self._send_body(200, body, etag, last_modified)
+
+    def _not_modified(self, etag, last_modified):
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            # If-None-Match takes precedence over If-Modified-Since
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags or f"W/{etag}" in tags
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+            return last_modified <= since
+        return False
+
+    def _send_cache_headers(self, etag, last_modified):
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", format_datetime(last_modified, usegmt=True))
+        self.send_header("Cache-Control", "no-cache")
+
+    def _send_body(self, status, body, etag=None, last_modified=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if etag is not None:
+            self._send_cache_headers(etag, last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, payload):
+        self._send_body(status, json.dumps(payload).encode("utf-8"))
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def start_server(host="127.0.0.1", port=0, verbose=False):
+    """Start the API in a background thread; returns (server, base_url).
+
+    Call server.shutdown() to stop it.
+    """
+    server = ThreadingHTTPServer((host, port), MovieAPIHandler)
+    server.daemon_threads = True
+    server.validators = Validators(_database_path())
+    server.responses = ResponseCache()
+    server.verbose = verbose
+    thread = threading.Thread(target=server.serve_forever, name="movie-server", daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local read-only JSON API for the movie database")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    parser.add_argument("--collection", metavar="NAME", help="serve this collection")
+    args = parser.parse_args()
+
+    if args.collection:
+        storage.use_collection(args.collection)
+    server, base_url = start_server(args.host, args.port, args.verbose)
+    print(f"Serving {storage.engine.url} at {base_url} "
+          f"(pool size {storage.POOL_SIZE}); press Ctrl+C to stop")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        print("\nStopping server")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
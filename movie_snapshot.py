@@ -0,0 +1,499 @@
+"""
+Memory-mapped, read-only snapshot of the movie collection.
+
+Reading every row into dicts (get_movies()) costs time in proportion to the
+library on every start. A snapshot packs the same data into one file:
+
+    header            magic, byte order, movie count, change-log position
+    fixed columns     id (int64), year (int32), omdb/user rating (float64,
+                      NaN when you have not rated), flags (uint8)
+    string tables     title, poster and imdb_id: offsets (uint64) + UTF-8 blob
+    title index       row numbers (uint32) sorted like the website's listing
+
+The file is mapped with mmap and the columns are memoryviews over it, so
+opening costs the same for ten movies or a million: nothing is decoded until
+a row is asked for.
+
+Snapshots are optional. Set MOVIES_SNAPSHOT=1 to keep one next to the
+database ("movies.db.snapshot") or to a path of your choice. A snapshot is
+used only while it matches the change log; after writes it is regenerated
+on the next read, or when the writing process exits.
+
+Loading a current snapshot does not import movie_storage_sql (whose import
+sets up the schema): the change-log position is read over a plain read-only
+SQLite connection, and only again once PRAGMA data_version shows that the
+database was written since.
+
+Example:
+    snapshot = load_snapshot()
+    len(snapshot)                      # -> 20000, without reading any row
+    snapshot.get_by_id(42)["title"]    # -> 'Alien'
+"""
+import atexit
+import bisect
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+from array import array
+from collections.abc import ItemsView, Mapping, ValuesView
+from pathlib import Path
+
+from sqlalchemy.engine import make_url
+
+import instrumentation
+from title_matcher import fold_title, title_sort_key
+
+# MOVIES_SNAPSHOT: unset/0 disables snapshots, 1 uses "<database>.snapshot",
+# anything else is the snapshot path
+SNAPSHOT_SETTING = os.environ.get("MOVIES_SNAPSHOT", "0")
+
+# Version 2: title_order follows title_sort_key (title ignoring case, year, id)
+MAGIC = b"MOVSNAP2"
+BYTE_ORDER = b"L" if sys.byteorder == "little" else b"B"
+
+# Flag bits stored per movie
+SHARED_TITLE = 1    # Another movie has the same title, so it is listed as "Title (year)"
+NO_POSTER = 2
+NO_IMDB_ID = 4
+
+# (name, array typecode) in file order; strings are an offsets and a blob section
+SECTIONS = (
+    ("id", "q"), ("year", "i"), ("omdb_rating", "d"), ("user_rating", "d"),
+    ("flags", "B"),
+    ("title_offsets", "Q"), ("title", "B"),
+    ("poster_offsets", "Q"), ("poster", "B"),
+    ("imdb_id_offsets", "Q"), ("imdb_id", "B"),
+    ("title_order", "I")
+)
+
+# magic, byte order, padding, movie count, change seq; then offset/length per section
+HEADER = struct.Struct("<8sc7xqq")
+SECTION_ENTRY = struct.Struct("<qq")
+HEADER_SIZE = HEADER.size + SECTION_ENTRY.size * len(SECTIONS)
+
+
+class SnapshotError(ValueError):
+    """The file is not a usable snapshot (wrong format, other byte order, truncated)."""
+
+
+def _database():
+    """Return (collection, database URL) of the movies database in use.
+
+    Without movie_storage_sql loaded, that is the default collection at
+    MOVIES_DB_URL.
+    """
+    storage = sys.modules.get("movie_storage_sql")
+    if storage is None:
+        return None, make_url(os.environ.get("MOVIES_DB_URL", "sqlite:///movies.db"))
+    if storage.current_collection == storage.DEFAULT_COLLECTION:
+        return None, storage.engine.url
+    return storage.current_collection, storage.engine.url
+
+
+def _database_file():
+    """Return the SQLite file of the database in use, or None."""
+    _, url = _database()
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        return None
+    return url.database
+
+
+def snapshot_path():
+    """Return the configured snapshot path, or None when snapshots are off."""
+    setting = SNAPSHOT_SETTING.strip()
+    if setting.lower() in ("", "0", "false", "no"):
+        return None
+    # An explicit path belongs to the default collection; others keep theirs
+    # next to their database
+    if setting.lower() not in ("1", "true", "yes") and _database()[0] is None:
+        return setting
+    database = _database_file()
+    return database + ".snapshot" if database is not None else None
+
+
+def _display_key(title, year, shared):
+    return f"{title} ({year})" if shared else title
+
+
+def write_snapshot(path=None):
+    """Write a snapshot of the movies table to ``path``; returns the path.
+
+    The file is written next to its final name and moved into place, so
+    readers never see a partial snapshot (an open mapping keeps the old one).
+    """
+    import movie_storage_sql as storage
+
+    path = path or snapshot_path()
+    if path is None:
+        raise ValueError("Snapshots are disabled; set MOVIES_SNAPSHOT=1 or pass a path")
+
+    with instrumentation.span("snapshot.write"):
+        with storage.engine.connect() as connection:
+            # Change position and rows come from one read transaction
+            cursor = connection.connection.dbapi_connection.cursor()
+            cursor.execute("BEGIN")
+            try:
+                change_seq = cursor.execute(
+                    "SELECT COALESCE((SELECT seq FROM sqlite_sequence "
+                    "WHERE name = 'movie_changes'), 0)"
+                ).fetchone()[0]
+                rows = cursor.execute(
+                    "SELECT id, title, year, omdb_rating, user_rating, poster, imdb_id "
+                    "FROM movies ORDER BY id"
+                ).fetchall()
+            finally:
+                cursor.execute("COMMIT")
+                cursor.close()
+        instrumentation.count("db.rows_read", len(rows))
+
+        columns = {name: array(code) for name, code in SECTIONS}
+        columns["id"].extend(row[0] for row in rows)
+        columns["year"].extend(row[2] for row in rows)
+        columns["omdb_rating"].extend(row[3] for row in rows)
+        nan = float("nan")
+        columns["user_rating"].extend(nan if row[4] is None else row[4] for row in rows)
+
+        title_counts = {}
+        for row in rows:
+            title_counts[row[1]] = title_counts.get(row[1], 0) + 1
+        flags = columns["flags"]
+        for row in rows:
+            flags.append((SHARED_TITLE if title_counts[row[1]] > 1 else 0)
+                         | (NO_POSTER if row[5] is None else 0)
+                         | (NO_IMDB_ID if row[6] is None else 0))
+
+        for name, index in (("title", 1), ("poster", 5), ("imdb_id", 6)):
+            encoded = [(row[index] or "").encode("utf-8") for row in rows]
+            offsets = columns[f"{name}_offsets"]
+            offsets.append(0)
+            total = 0
+            for value in encoded:
+                total += len(value)
+                offsets.append(total)
+            columns[name] = b"".join(encoded)
+
+        # Same order as list_movies() and the website listing
+        columns["title_order"].extend(sorted(
+            range(len(rows)),
+            key=lambda position: title_sort_key(*rows[position][1:3], rows[position][0])
+        ))
+
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(b"\0" * HEADER_SIZE)
+            entries = []
+            for name, _ in SECTIONS:
+                # 8-byte alignment keeps every typed view naturally aligned
+                f.write(b"\0" * (-f.tell() % 8))
+                data = columns[name]
+                data = data.tobytes() if isinstance(data, array) else data
+                entries.append((f.tell(), len(data)))
+                f.write(data)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, BYTE_ORDER, len(rows), change_seq))
+            for entry in entries:
+                f.write(SECTION_ENTRY.pack(*entry))
+        os.replace(temp_path, path)
+    return path
+
+
+class MovieSnapshot:
+    """A mapped snapshot file; rows are decoded only when accessed.
+
+    Row positions follow the movie id; ``title_order`` lists positions in
+    title order. Use as a context manager, or call close(), to unmap it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._views = []
+        with open(path, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise SnapshotError(f"{path} is empty")
+        try:
+            self._open_views()
+        except Exception:
+            self.close()
+            raise
+
+    def _open_views(self):
+        if len(self._map) < HEADER_SIZE:
+            raise SnapshotError(f"{self.path} is truncated")
+        magic, byte_order, self.count, self.change_seq = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise SnapshotError(f"{self.path} is not a movie snapshot")
+        if byte_order != BYTE_ORDER:
+            raise SnapshotError(f"{self.path} was written on a machine with another byte order")
+        view = memoryview(self._map)
+        self._views.append(view)
+        for index, (name, code) in enumerate(SECTIONS):
+            offset, length = SECTION_ENTRY.unpack_from(
+                self._map, HEADER.size + index * SECTION_ENTRY.size)
+            if offset + length > len(self._map):
+                raise SnapshotError(f"{self.path} is truncated")
+            section = view[offset:offset + length]
+            section = section if code == "B" else section.cast(code)
+            self._views.append(section)
+            setattr(self, "_" + name, section)
+
+    def close(self):
+        """Release the views and unmap the file."""
+        if self._map.closed:
+            return
+        for section in reversed(self._views):
+            section.release()
+        self._views = []
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def _string(self, name, position):
+        offsets = getattr(self, f"_{name}_offsets")
+        return str(getattr(self, "_" + name)[offsets[position]:offsets[position + 1]], "utf-8")
+
+    def title(self, position):
+        return self._string("title", position)
+
+    def display_key(self, position):
+        """The title as get_movies() keys it ("Title (year)" for remakes)."""
+        return _display_key(self.title(position), self._year[position],
+                            self._flags[position] & SHARED_TITLE)
+
+    def info(self, position):
+        """The movie at ``position`` as a get_movies() value."""
+        flags = self._flags[position]
+        user_rating = self._user_rating[position]
+        user_rating = None if user_rating != user_rating else user_rating
+        omdb_rating = self._omdb_rating[position]
+        return {
+            "year": self._year[position],
+            "rating": user_rating if user_rating is not None else omdb_rating,
+            "omdb_rating": omdb_rating,
+            "user_rating": user_rating,
+            "poster": None if flags & NO_POSTER else self._string("poster", position),
+            "id": self._id[position],
+            "imdb_id": None if flags & NO_IMDB_ID else self._string("imdb_id", position)
+        }
+
+    def row(self, position):
+        """The movie at ``position`` as an iter_movies() dict (info plus title)."""
+        movie = self.info(position)
+        movie["title"] = self.title(position)
+        return movie
+
+    def get_by_id(self, movie_id):
+        """Return the movie with this id as a row() dict, or None."""
+        position = bisect.bisect_left(self._id, movie_id)
+        if position < self.count and self._id[position] == movie_id:
+            return self.row(position)
+        return None
+
+    def positions_by_title(self):
+        """Row positions in title order."""
+        return iter(self._title_order)
+
+    def iter_movies(self):
+        """Yield row() dicts in title order."""
+        for position in self._title_order:
+            yield self.row(position)
+
+    def iter_ids_titles(self):
+        """Yield (id, title, year) in id order, decoding nothing else."""
+        for position in range(self.count):
+            yield self._id[position], self.title(position), self._year[position]
+
+    def _positions_titled(self, title):
+        """Yield the positions of movies whose title equals ``title`` ignoring case."""
+        order = self._title_order
+        folded = fold_title(title)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if fold_title(self.title(order[middle])) < folded:
+                low = middle + 1
+            else:
+                high = middle
+        while low < self.count and fold_title(self.title(order[low])) == folded:
+            yield order[low]
+            low += 1
+
+    def find_key(self, key):
+        """Return the position of the movie get_movies() keys as ``key``, or None."""
+        # A remake's key is "Title (year)"; other titles may end like that too
+        titles = [key]
+        if key.endswith(")") and " (" in key:
+            titles.append(key[:key.rindex(" (")])
+        for title in titles:
+            for position in self._positions_titled(title):
+                if self.display_key(position) == key:
+                    return position
+        return None
+
+    def as_mapping(self):
+        """A read-only {display key: info} mapping with get_movies()'s contents."""
+        return SnapshotMovies(self)
+
+
+class SnapshotMovies(Mapping):
+    """get_movies() over a snapshot: iterates in title order, decodes on access."""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def __len__(self):
+        return len(self.snapshot)
+
+    def __iter__(self):
+        snapshot = self.snapshot
+        for position in snapshot.positions_by_title():
+            yield snapshot.display_key(position)
+
+    def __getitem__(self, key):
+        position = self.snapshot.find_key(key) if isinstance(key, str) else None
+        if position is None:
+            raise KeyError(key)
+        return self.snapshot.info(position)
+
+    def items(self):
+        return _SnapshotItems(self)
+
+    def values(self):
+        return _SnapshotValues(self)
+
+
+class _SnapshotItems(ItemsView):
+    def __iter__(self):
+        snapshot = self._mapping.snapshot
+        for position in snapshot.positions_by_title():
+            yield snapshot.display_key(position), snapshot.info(position)
+
+
+class _SnapshotValues(ValuesView):
+    def __iter__(self):
+        snapshot = self._mapping.snapshot
+        for position in snapshot.positions_by_title():
+            yield snapshot.info(position)
+
+
+# The snapshot this process has open, and whether it wrote movies since
+_current = None
+_dirty = False
+# Read-only connection checking the change log: (file, connection,
+# data_version at the last check, change seq read then)
+_probe = None
+
+
+def _mark_dirty(operation, movie):
+    global _dirty
+    _dirty = True
+
+
+def _listen_for_writes():
+    # Writes only go through movie_storage_sql, so until this process has
+    # loaded it there is nothing to listen to (registering twice is a no-op)
+    storage = sys.modules.get("movie_storage_sql")
+    if storage is not None:
+        storage.register_write_listener(_mark_dirty)
+
+
+def _latest_change_seq():
+    """Return the newest change-log position, or None if it cannot be read.
+
+    The lookup is repeated only when PRAGMA data_version reports a write
+    by another connection (any process, including this one's engine).
+    """
+    global _probe
+    database = _database_file()
+    if database is None:
+        return None
+    if _probe is not None and _probe[0] != database:
+        _probe[1].close()
+        _probe = None
+    try:
+        if _probe is None:
+            connection = sqlite3.connect(f"{Path(database).resolve().as_uri()}?mode=ro",
+                                         uri=True, check_same_thread=False)
+            _probe = (database, connection, None, None)
+        _, connection, checked_version, seq = _probe
+        version = connection.execute("PRAGMA data_version").fetchone()[0]
+        if version != checked_version:
+            seq = connection.execute(
+                "SELECT COALESCE((SELECT seq FROM sqlite_sequence "
+                "WHERE name = 'movie_changes'), 0)"
+            ).fetchone()[0]
+            _probe = (database, connection, version, seq)
+        return seq
+    except sqlite3.Error:
+        # No database or change log yet: let write_snapshot() set it up
+        return None
+
+
+def load_snapshot(rebuild=True):
+    """Return an up-to-date MovieSnapshot, or None when snapshots are off.
+
+    A snapshot that no longer matches the change log is regenerated (or,
+    with ``rebuild=False``, None is returned). The open snapshot is reused
+    while it stays current and must not be closed by the caller. A replaced
+    one is closed, so mappings and row views taken from it must not be used
+    after the next call.
+    """
+    global _current, _dirty
+    path = snapshot_path()
+    if path is None:
+        return None
+    _listen_for_writes()
+    with instrumentation.span("snapshot.load"):
+        latest = _latest_change_seq()
+        if _current is not None and (_current.path != path or latest is None
+                                     or _current.change_seq != latest):
+            _current.close()
+            _current = None
+        if _current is None:
+            try:
+                snapshot = MovieSnapshot(path)
+            except (OSError, SnapshotError):
+                snapshot = None
+            if snapshot is not None and (latest is None or snapshot.change_seq != latest):
+                snapshot.close()
+                snapshot = None
+            if snapshot is None:
+                if not rebuild:
+                    return None
+                _dirty = False
+                snapshot = MovieSnapshot(write_snapshot(path))
+            _current = snapshot
+    return _current
+
+
+def get_movies():
+    """get_movies() served from the snapshot when enabled, else from the database."""
+    snapshot = load_snapshot()
+    if snapshot is None:
+        import movie_storage_sql as storage
+        return storage.get_movies()
+    return snapshot.as_mapping()
+
+
+def _refresh_at_exit():
+    # Leaves a current snapshot behind for the next process's startup
+    if _dirty:
+        try:
+            load_snapshot()
+        except Exception as e:
+            print(f"Warning: could not refresh the movie snapshot: {e}")
+
+
+if snapshot_path() is not None:
+    atexit.register(_refresh_at_exit)
+    _listen_for_writes()
@@ -1,47 +1,725 @@
-from sqlalchemy import create_engine, text
+import heapq
+import os
+import random
+import re
+from collections import Counter, OrderedDict
 
-# Define the database URL
-DB_URL = "sqlite:///movies.db"
+from sqlalchemy import create_engine, event, text
 
-# Create the engine (set echo=True for debugging)
-engine = create_engine(DB_URL, echo=False)
+import instrumentation
+# Listing order helpers, kept importable from here
+from title_matcher import fold_title, title_sort_key  # noqa: F401
 
-# Create the movies table if it does not exist
-with engine.connect() as connection:
+# Define the database URL (MOVIES_DB_URL overrides it, e.g. for benchmarks)
+DB_URL = os.environ.get("MOVIES_DB_URL", "sqlite:///movies.db")
+
+# Connections kept open for reuse; raise it for concurrent readers
+# such as movie_server.py (MOVIES_DB_POOL_SIZE)
+POOL_SIZE = int(os.environ.get("MOVIES_DB_POOL_SIZE", "5"))
+
+
+def _enable_foreign_keys(dbapi_connection, connection_record):
+    """Turn on SQLite foreign keys so detail rows follow their movie."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys = ON")
+    cursor.close()
+
+
+def _start_query_span(conn, cursor, statement, parameters, context, executemany):
+    """Open a 'db.<verb>' timing span for every SQL statement."""
+    verb = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "sql"
+    query_span = instrumentation.span(f"db.{verb}")
+    query_span.__enter__()
+    conn.info.setdefault("query_spans", []).append(query_span)
+
+
+def _end_query_span(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_spans"].pop().__exit__(None, None, None)
+    instrumentation.count("db.queries")
+
+
+def _fail_query_span(context):
+    spans = context.connection.info.get("query_spans") if context.connection else None
+    if spans:
+        spans.pop().__exit__(type(context.original_exception), context.original_exception, None)
+
+
+def _create_engine(url):
+    """Create an engine for one movies database (set echo=True for debugging)."""
+    new_engine = create_engine(url, echo=False, pool_size=POOL_SIZE, max_overflow=POOL_SIZE * 2)
+    event.listen(new_engine, "connect", _enable_foreign_keys)
+    # Every engine is timed, including those use_collection() opens later
+    if instrumentation.ENABLED:
+        event.listen(new_engine, "before_cursor_execute", _start_query_span)
+        event.listen(new_engine, "after_cursor_execute", _end_query_span)
+        event.listen(new_engine, "handle_error", _fail_query_span)
+    return new_engine
+
+
+# Every query goes through this engine; use_collection() switches it
+engine = _create_engine(DB_URL)
+
+MOVIE_COLUMNS = (
+    "id, title, year, omdb_rating, user_rating, poster, "
+    "date_added, date_updated, imdb_id"
+)
+
+MOVIES_TABLE_SQL = """
+                   CREATE TABLE IF NOT EXISTS {name}
+                   (
+                       id INTEGER PRIMARY KEY AUTOINCREMENT,
+                       title TEXT NOT NULL,
+                       year INTEGER NOT NULL,
+                       omdb_rating REAL NOT NULL,
+                       user_rating REAL,
+                       poster TEXT,
+                       date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                       date_updated TIMESTAMP,
+                       imdb_id TEXT
+                   )
+                   """
+
+
+def _migrate_movies_table(connection):
+    """Bring a movies table from an older schema up to date.
+
+    Older databases declared ``title`` UNIQUE and had no ``imdb_id``. SQLite
+    cannot drop a constraint in place, so the table is rebuilt (keeping ids)
+    and imdb_id is later backfilled from movie_details where it is known.
+    Returns True if the table was rebuilt.
+    """
+    columns = [row[1] for row in connection.execute(text("PRAGMA table_info(movies)"))]
+    unique_constraints = [
+        row for row in connection.execute(text("PRAGMA index_list(movies)"))
+        if row[3] == "u"
+    ]
+    if "imdb_id" in columns and not unique_constraints:
+        return False
+
+    old_columns = ", ".join(
+        column for column in MOVIE_COLUMNS.split(", ") if column in columns
+    )
+    connection.execute(text("PRAGMA foreign_keys = OFF"))
+    connection.execute(text(MOVIES_TABLE_SQL.format(name="movies_migrated")))
+    connection.execute(text(
+        f"INSERT INTO movies_migrated ({old_columns}) SELECT {old_columns} FROM movies"
+    ))
+    connection.execute(text("DROP TABLE movies"))
+    connection.execute(text("ALTER TABLE movies_migrated RENAME TO movies"))
+    connection.commit()
+    connection.execute(text("PRAGMA foreign_keys = ON"))
+    return True
+
+
+# Running totals and bucket counts kept current by triggers on movies, so
+# statistics are read without scanning the table. Rating buckets have 0.1
+# resolution (bucket = rating * 10); year buckets are the year itself.
+STATS_TABLES_SQL = (
+    """
+    CREATE TABLE IF NOT EXISTS movie_stats
+    (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total INTEGER NOT NULL,
+        omdb_sum REAL NOT NULL,
+        rated INTEGER NOT NULL,
+        user_sum REAL NOT NULL,
+        higher INTEGER NOT NULL,
+        lower INTEGER NOT NULL,
+        same INTEGER NOT NULL,
+        abs_diff_sum REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS movie_stats_buckets
+    (
+        kind TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (kind, bucket)
+    ) WITHOUT ROWID
+    """
+)
+
+# Each movie's contribution to the movie_stats columns
+STATS_TERMS = {
+    "total": "1",
+    "omdb_sum": "{row}.omdb_rating",
+    "rated": "({row}.user_rating IS NOT NULL)",
+    "user_sum": "COALESCE({row}.user_rating, 0)",
+    "higher": "COALESCE({row}.user_rating > {row}.omdb_rating, 0)",
+    "lower": "COALESCE({row}.user_rating < {row}.omdb_rating, 0)",
+    "same": "COALESCE({row}.user_rating = {row}.omdb_rating, 0)",
+    "abs_diff_sum": "COALESCE(ABS({row}.user_rating - {row}.omdb_rating), 0)"
+}
+
+# kind -> (bucket expression, condition for a movie to be counted)
+STATS_BUCKETS = {
+    "omdb": ("CAST(ROUND({row}.omdb_rating * 10) AS INTEGER)", "1"),
+    "user": ("CAST(ROUND({row}.user_rating * 10) AS INTEGER)", "{row}.user_rating IS NOT NULL"),
+    "year": ("{row}.year", "1")
+}
+
+
+def _stats_delta_sql(row, sign):
+    """Trigger statements adding (sign 1) or removing (sign -1) one movie row."""
+    operator = "+" if sign > 0 else "-"
+    assignments = ", ".join(f"{column} = {column} {operator} {term.format(row=row)}"
+                            for column, term in STATS_TERMS.items())
+    statements = [f"UPDATE movie_stats SET {assignments} WHERE id = 1;"]
+    for kind, (bucket, condition) in STATS_BUCKETS.items():
+        bucket = bucket.format(row=row)
+        condition = condition.format(row=row)
+        if sign > 0:
+            statements.append(
+                f"INSERT INTO movie_stats_buckets (kind, bucket, count) "
+                f"SELECT '{kind}', {bucket}, 1 WHERE {condition} "
+                f"ON CONFLICT (kind, bucket) DO UPDATE SET count = count + 1;"
+            )
+        else:
+            statements.append(
+                f"UPDATE movie_stats_buckets SET count = count - 1 "
+                f"WHERE kind = '{kind}' AND bucket = {bucket} AND {condition};"
+            )
+            statements.append(
+                f"DELETE FROM movie_stats_buckets "
+                f"WHERE kind = '{kind}' AND bucket = {bucket} AND count <= 0;"
+            )
+    return "\n".join(statements)
+
+
+STATS_TRIGGERS = {
+    "movie_stats_insert": ("AFTER INSERT ON movies", [("NEW", 1)]),
+    "movie_stats_delete": ("AFTER DELETE ON movies", [("OLD", -1)]),
+    "movie_stats_update": ("AFTER UPDATE OF year, omdb_rating, user_rating ON movies",
+                           [("OLD", -1), ("NEW", 1)])
+}
+
+
+def _compute_stats(connection):
+    """Aggregate the snapshot values directly from the movies table."""
+    row = connection.execute(text(
+        "SELECT " + ", ".join(f"COALESCE(SUM({term.format(row='m')}), 0)"
+                              for term in STATS_TERMS.values()) + " FROM movies m"
+    )).fetchone()
+    buckets = {}
+    for kind, (bucket, condition) in STATS_BUCKETS.items():
+        rows = connection.execute(text(
+            f"SELECT {bucket.format(row='m')}, COUNT(*) FROM movies m "
+            f"WHERE {condition.format(row='m')} GROUP BY 1"
+        ))
+        for value, count in rows:
+            buckets[(kind, value)] = count
+    return dict(zip(STATS_TERMS, row)), buckets
+
+
+def _stored_stats(connection):
+    """Read the snapshot tables as (summary dict, {(kind, bucket): count})."""
+    row = connection.execute(
+        text(f"SELECT {', '.join(STATS_TERMS)} FROM movie_stats WHERE id = 1")
+    ).fetchone()
+    buckets = {
+        (kind, bucket): count
+        for kind, bucket, count in connection.execute(
+            text("SELECT kind, bucket, count FROM movie_stats_buckets")
+        )
+    }
+    return (dict(zip(STATS_TERMS, row)) if row else None), buckets
+
+
+def _rebuild_stats(connection):
+    summary, buckets = _compute_stats(connection)
+    connection.execute(text("DELETE FROM movie_stats"))
+    connection.execute(text("DELETE FROM movie_stats_buckets"))
+    connection.execute(
+        text(f"INSERT INTO movie_stats (id, {', '.join(STATS_TERMS)}) "
+             f"VALUES (1, {', '.join(':' + column for column in STATS_TERMS)})"),
+        summary
+    )
+    if buckets:
+        connection.execute(
+            text("INSERT INTO movie_stats_buckets (kind, bucket, count) "
+                 "VALUES (:kind, :bucket, :count)"),
+            [{"kind": kind, "bucket": bucket, "count": count}
+             for (kind, bucket), count in buckets.items()]
+        )
+
+
+def _create_stats_snapshot(connection):
+    for statement in STATS_TABLES_SQL:
+        connection.execute(text(statement))
+    for name, (timing, deltas) in STATS_TRIGGERS.items():
+        body = "\n".join(_stats_delta_sql(row, sign) for row, sign in deltas)
+        connection.execute(text(f"CREATE TRIGGER IF NOT EXISTS {name} {timing}\nBEGIN\n{body}\nEND"))
+    if connection.execute(text("SELECT 1 FROM movie_stats WHERE id = 1")).fetchone() is None:
+        _rebuild_stats(connection)
+
+
+# Append-only log of movie writes for incremental consumers (see
+# get_changes_since). AUTOINCREMENT keeps sequence numbers increasing even
+# after compaction deletes the newest entries.
+CHANGE_LOG_TABLES_SQL = (
+    """
+    CREATE TABLE IF NOT EXISTS movie_changes
+    (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        op TEXT NOT NULL,
+        movie_id INTEGER NOT NULL,
+        imdb_id TEXT,
+        title TEXT,
+        changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS movie_change_consumers
+    (
+        name TEXT PRIMARY KEY,
+        seq INTEGER NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """
+)
+
+# Columns whose change is logged; touching only the timestamps is not a change
+CHANGE_LOG_COLUMNS = ("title", "year", "omdb_rating", "user_rating", "poster", "imdb_id")
+
+CHANGE_LOG_TRIGGERS = {
+    "movie_changes_insert": ("AFTER INSERT ON movies", "insert", "NEW"),
+    "movie_changes_delete": ("AFTER DELETE ON movies", "delete", "OLD"),
+    "movie_changes_update": (
+        "AFTER UPDATE ON movies FOR EACH ROW WHEN "
+        + " OR ".join(f"OLD.{column} IS NOT NEW.{column}" for column in CHANGE_LOG_COLUMNS),
+        "update", "NEW"
+    )
+}
+
+
+def _create_change_log(connection):
+    for statement in CHANGE_LOG_TABLES_SQL:
+        connection.execute(text(statement))
+    for name, (timing, op, row) in CHANGE_LOG_TRIGGERS.items():
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {name} {timing}\nBEGIN\n"
+            f"INSERT INTO movie_changes (op, movie_id, imdb_id, title) "
+            f"VALUES ('{op}', {row}.id, {row}.imdb_id, {row}.title);\nEND"
+        ))
+
+
+def _create_schema(connection):
+    """Create (or migrate) the tables, indexes and triggers of a movies database."""
+    # Create the movies table if it does not exist
+    connection.execute(text(MOVIES_TABLE_SQL.format(name="movies")))
+    migrated = _migrate_movies_table(connection)
+
+    # Full OMDb metadata lives in side tables so detail views, genre and
+    # director queries never need another API request.
     connection.execute(text("""
-                            CREATE TABLE IF NOT EXISTS movies
+                            CREATE TABLE IF NOT EXISTS movie_details
                             (
-                                id
-                                INTEGER
-                                PRIMARY
-                                KEY
-                                AUTOINCREMENT,
-                                title
-                                TEXT
-                                UNIQUE
-                                NOT
-                                NULL,
-                                year
-                                INTEGER
-                                NOT
-                                NULL,
-                                omdb_rating
-                                REAL
-                                NOT
-                                NULL,
-                                user_rating
-                                REAL,
-                                poster
-                                TEXT,
-                                date_added
-                                TIMESTAMP
-                                DEFAULT
-                                CURRENT_TIMESTAMP,
-                                date_updated
-                                TIMESTAMP
+                                movie_id INTEGER PRIMARY KEY
+                                    REFERENCES movies (id) ON DELETE CASCADE,
+                                imdb_id TEXT,
+                                director TEXT,
+                                plot TEXT,
+                                runtime TEXT,
+                                runtime_minutes INTEGER
                             )
                             """))
-    connection.commit()
+    connection.execute(text("""
+                            CREATE TABLE IF NOT EXISTS genres
+                            (
+                                id INTEGER PRIMARY KEY,
+                                name TEXT UNIQUE NOT NULL COLLATE NOCASE
+                            )
+                            """))
+    connection.execute(text("""
+                            CREATE TABLE IF NOT EXISTS movie_genres
+                            (
+                                movie_id INTEGER NOT NULL
+                                    REFERENCES movies (id) ON DELETE CASCADE,
+                                genre_id INTEGER NOT NULL
+                                    REFERENCES genres (id),
+                                PRIMARY KEY (movie_id, genre_id)
+                            ) WITHOUT ROWID
+                            """))
+    connection.execute(text("""
+                            CREATE TABLE IF NOT EXISTS actors
+                            (
+                                id INTEGER PRIMARY KEY,
+                                name TEXT UNIQUE NOT NULL COLLATE NOCASE
+                            )
+                            """))
+    connection.execute(text("""
+                            CREATE TABLE IF NOT EXISTS movie_actors
+                            (
+                                movie_id INTEGER NOT NULL
+                                    REFERENCES movies (id) ON DELETE CASCADE,
+                                actor_id INTEGER NOT NULL
+                                    REFERENCES actors (id),
+                                billing INTEGER NOT NULL,
+                                PRIMARY KEY (movie_id, actor_id)
+                            ) WITHOUT ROWID
+                            """))
+    # imdbID is the movie's identity; titles may repeat (remakes).
+    connection.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_movies_imdb_id "
+        "ON movies (imdb_id)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_movies_title "
+        "ON movies (title)"
+    ))
+    # Listing order (see title_sort_key): title ignoring case, then year;
+    # the website shows movies in this order without re-sorting them
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_movies_title_nocase "
+        "ON movies (title COLLATE NOCASE, year)"
+    ))
+    # Backfill imdbIDs once, right after an older table was rebuilt
+    if migrated:
+        connection.execute(text("""
+                                UPDATE movies
+                                SET imdb_id = (SELECT d.imdb_id
+                                               FROM movie_details d
+                                               WHERE d.movie_id = movies.id)
+                                WHERE imdb_id IS NULL
+                                  AND EXISTS (SELECT 1
+                                              FROM movie_details d
+                                              WHERE d.movie_id = movies.id
+                                                AND d.imdb_id IS NOT NULL)
+                                """))
+    # Keyset pagination (iter_movie_pages) walks these in (key, id) order
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_movies_year "
+        "ON movies (year)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_movies_rating "
+        "ON movies (COALESCE(user_rating, omdb_rating))"
+    ))
+    # Lets pick_random_movie(unrated_only=True) count and step through
+    # unrated movies without reading the rated ones
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_movies_unrated "
+        "ON movies (id) WHERE user_rating IS NULL"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_movies_date_updated "
+        "ON movies (date_updated)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_movies_date_added "
+        "ON movies (date_added)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_movie_details_director "
+        "ON movie_details (director COLLATE NOCASE)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_movie_details_imdb_id "
+        "ON movie_details (imdb_id)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_movie_genres_genre "
+        "ON movie_genres (genre_id, movie_id)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_movie_actors_actor "
+        "ON movie_actors (actor_id, movie_id)"
+    ))
+    # Best/worst and newest/oldest titles for the stats views
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_movies_omdb_rating "
+        "ON movies (omdb_rating)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_movies_user_rating "
+        "ON movies (user_rating) WHERE user_rating IS NOT NULL"
+    ))
+    # Signed rating gap of rated movies, read from either end by
+    # get_rating_disagreements() instead of sorting every rated movie
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_movies_rating_gap "
+        "ON movies (user_rating - omdb_rating) WHERE user_rating IS NOT NULL"
+    ))
+    _create_stats_snapshot(connection)
+    _create_change_log(connection)
+
+
+def init_database(target_engine):
+    """Bring the database behind ``target_engine`` up to the current schema."""
+    with target_engine.connect() as connection:
+        _create_schema(connection)
+        connection.commit()
+
+
+init_database(engine)
+
+# Collections: each one is a separate database file in COLLECTIONS_DIR, so a
+# collection's queries and indexes only ever see its own movies. The default
+# collection is the database at DB_URL.
+COLLECTIONS_DIR = os.environ.get("MOVIES_COLLECTIONS_DIR", "collections")
+DEFAULT_COLLECTION = "default"
+COLLECTION_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,63}")
+
+# Engines of recently used collections stay open (MOVIES_MAX_OPEN_COLLECTIONS)
+MAX_OPEN_COLLECTIONS = int(os.environ.get("MOVIES_MAX_OPEN_COLLECTIONS", "8"))
+
+current_collection = DEFAULT_COLLECTION
+_default_engine = engine
+_collection_engines = OrderedDict()
+
+
+def _check_collection_name(name):
+    if not COLLECTION_NAME.fullmatch(name):
+        raise ValueError(f"Invalid collection name '{name}' "
+                         f"(use letters, digits, '_', '-' and '.', at most 64 characters)")
+
+
+def collection_path(name):
+    """Return the database file of a collection (None for an in-memory default)."""
+    if name == DEFAULT_COLLECTION:
+        database = _default_engine.url.database
+        return database if database not in (None, "", ":memory:") else None
+    _check_collection_name(name)
+    return os.path.join(COLLECTIONS_DIR, f"{name}.db")
+
+
+def use_collection(name):
+    """Scope every following query to collection ``name``; returns the previous one.
+
+    A new collection's database is created on first use. Engines of the
+    most recently used collections are kept open, so switching back is cheap.
+    """
+    global engine, current_collection
+    name = name or DEFAULT_COLLECTION
+    previous = current_collection
+    if name == DEFAULT_COLLECTION:
+        engine = _default_engine
+    elif name in _collection_engines:
+        _collection_engines.move_to_end(name)
+        engine = _collection_engines[name]
+    else:
+        path = collection_path(name)
+        os.makedirs(COLLECTIONS_DIR, exist_ok=True)
+        new_engine = _create_engine(f"sqlite:///{path}")
+        init_database(new_engine)
+        _collection_engines[name] = engine = new_engine
+        while len(_collection_engines) > MAX_OPEN_COLLECTIONS:
+            _, closed_engine = _collection_engines.popitem(last=False)
+            closed_engine.dispose()
+    current_collection = name
+    return previous
+
+
+def list_collections():
+    """Return the names of all collections, the default one first."""
+    names = [DEFAULT_COLLECTION]
+    try:
+        files = sorted(os.listdir(COLLECTIONS_DIR))
+    except FileNotFoundError:
+        return names
+    for file_name in files:
+        name, extension = os.path.splitext(file_name)
+        if extension == ".db" and COLLECTION_NAME.fullmatch(name) and name != DEFAULT_COLLECTION:
+            names.append(name)
+    return names
+
+
+def attach_collection(connection, name, alias):
+    """ATTACH another collection's database to ``connection`` as schema ``alias``.
+
+    Cross-collection queries then address its tables as ``alias.movies``.
+    Detach it with ``DETACH DATABASE alias`` before returning the connection.
+    """
+    if not alias.isidentifier():
+        raise ValueError(f"Invalid schema alias '{alias}'")
+    path = collection_path(name)
+    if path is None or not os.path.exists(path):
+        raise LookupError(f"Collection '{name}' does not exist")
+    connection.exec_driver_sql(f"ATTACH DATABASE ? AS {alias}", (path,))
+
+
+if os.environ.get("MOVIES_COLLECTION"):
+    use_collection(os.environ["MOVIES_COLLECTION"])
+
+# Callbacks notified after committed writes (see register_write_listener)
+_write_listeners = []
+
+
+def register_write_listener(callback):
+    """Call ``callback(operation, movie)`` after every committed movie write.
+
+    ``operation`` is "insert", "update" or "delete" and ``movie`` a dict with
+    the movie's id, title and year. In-memory indexes such as the title
+    matcher use this to stay current without re-reading the table.
+    """
+    if callback not in _write_listeners:
+        _write_listeners.append(callback)
+
+
+def unregister_write_listener(callback):
+    """Stop notifying ``callback``; unknown callbacks are ignored."""
+    if callback in _write_listeners:
+        _write_listeners.remove(callback)
+
+
+def _affected_movies(connection, condition, params):
+    """Return (id, title, year) rows matching a condition, if anyone listens."""
+    if not _write_listeners:
+        return []
+    return connection.execute(
+        text(f"SELECT id, title, year FROM movies WHERE {condition}"),
+        params
+    ).fetchall()
+
+
+def _notify_write(operation, rows):
+    for movie_id, title, year in rows:
+        movie = {"id": movie_id, "title": title, "year": year}
+        for listener in list(_write_listeners):
+            try:
+                listener(operation, movie)
+            except Exception as e:
+                print(f"Warning: write listener failed: {e}")
+
+
+def _clean(value):
+    """Turn OMDb's 'N/A' placeholders into None."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    return None if value in ("", "N/A") else value
+
+
+def _split_names(value):
+    """Split an OMDb comma-separated list ("Drama, Sci-Fi") into names."""
+    value = _clean(value)
+    if not value:
+        return []
+    names = []
+    for name in value.split(","):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def _parse_runtime(value):
+    """Convert an OMDb runtime string like '148 min' to minutes."""
+    value = _clean(value)
+    if not value:
+        return None
+    try:
+        return int(value.split()[0])
+    except (ValueError, IndexError):
+        return None
+
+
+# Column list used by every query that feeds _row_to_info
+INFO_COLUMNS = "title, year, omdb_rating, user_rating, poster, id, imdb_id"
+
+
+def _row_to_info(row):
+    """Convert a row selected with INFO_COLUMNS to a movie dict."""
+    return {
+        "year": row[1],
+        "rating": row[3] if row[3] is not None else row[2],  # User rating takes precedence
+        "omdb_rating": row[2],
+        "user_rating": row[3],
+        "poster": row[4],
+        "id": row[5],
+        "imdb_id": row[6]
+    }
+
+
+def _movies_dict(rows):
+    """Build the {title: info} mapping; remakes sharing a title are keyed 'Title (year)'."""
+    rows = list(rows)
+    instrumentation.count("db.rows_read", len(rows))
+    title_counts = Counter(row[0] for row in rows)
+    return {
+        (row[0] if title_counts[row[0]] == 1 else f"{row[0]} ({row[1]})"): _row_to_info(row)
+        for row in rows
+    }
+
+
+class AmbiguousTitle(ValueError):
+    """Raised when a title alone names several movies (remakes); pass the id."""
+
+
+def _movie_filter(connection, title, movie_id):
+    """Return the WHERE condition and parameters that identify one movie.
+
+    ``movie_id`` (the primary key) is preferred; the title is only used when
+    no id is given.
+
+    Raises:
+        AmbiguousTitle: if no id is given and several movies have the title.
+    """
+    if movie_id is not None:
+        return "id = :movie_id", {"movie_id": movie_id}
+    ids = connection.execute(
+        text("SELECT id FROM movies WHERE title = :title LIMIT 2"), {"title": title}
+    ).scalars().all()
+    if len(ids) > 1:
+        raise AmbiguousTitle(f"Several movies are titled '{title}'; give the movie id.")
+    return "title = :title", {"title": title}
+
+
+def _get_or_create_name(connection, table, name):
+    """Return the id of a genre/actor name, inserting it if needed."""
+    connection.execute(
+        text(f"INSERT OR IGNORE INTO {table} (name) VALUES (:name)"),
+        {"name": name}
+    )
+    return connection.execute(
+        text(f"SELECT id FROM {table} WHERE name = :name"),
+        {"name": name}
+    ).scalar_one()
+
+
+def _save_movie_details(connection, movie_id, details):
+    """Store the extended OMDb record for a movie (runs inside the caller's transaction)."""
+    connection.execute(
+        text("""
+             INSERT OR REPLACE INTO movie_details
+                 (movie_id, imdb_id, director, plot, runtime, runtime_minutes)
+             VALUES (:movie_id, :imdb_id, :director, :plot, :runtime, :runtime_minutes)
+             """),
+        {
+            "movie_id": movie_id,
+            "imdb_id": _clean(details.get("imdb_id")),
+            "director": _clean(details.get("director")),
+            "plot": _clean(details.get("plot")),
+            "runtime": _clean(details.get("runtime")),
+            "runtime_minutes": _parse_runtime(details.get("runtime"))
+        }
+    )
+
+    connection.execute(
+        text("DELETE FROM movie_genres WHERE movie_id = :movie_id"),
+        {"movie_id": movie_id}
+    )
+    for genre in _split_names(details.get("genre")):
+        connection.execute(
+            text("INSERT OR IGNORE INTO movie_genres (movie_id, genre_id) "
+                 "VALUES (:movie_id, :genre_id)"),
+            {"movie_id": movie_id,
+             "genre_id": _get_or_create_name(connection, "genres", genre)}
+        )
+
+    connection.execute(
+        text("DELETE FROM movie_actors WHERE movie_id = :movie_id"),
+        {"movie_id": movie_id}
+    )
+    for billing, actor in enumerate(_split_names(details.get("actors")), start=1):
+        connection.execute(
+            text("INSERT OR IGNORE INTO movie_actors (movie_id, actor_id, billing) "
+                 "VALUES (:movie_id, :actor_id, :billing)"),
+            {"movie_id": movie_id,
+             "actor_id": _get_or_create_name(connection, "actors", actor),
+             "billing": billing}
+        )
 
 
 def list_movies():
@@ -49,113 +727,1267 @@ def list_movies():
     with engine.connect() as connection:
         result = connection.execute(
             text("""
-                 SELECT title, year, omdb_rating, user_rating, poster
+                 SELECT title, year, omdb_rating, user_rating, poster, id, imdb_id
                  FROM movies
-                 ORDER BY title
+                 ORDER BY title COLLATE NOCASE, year, id
                  """)
         )
         movies = result.fetchall()
 
-    return {
-        row[0]: {
-            "year": row[1],
-            "rating": row[3] if row[3] is not None else row[2],  # User rating takes precedence
-            "omdb_rating": row[2],
-            "user_rating": row[3],
-            "poster": row[4]
-        }
-        for row in movies
-    }
+    return _movies_dict(movies)
 
 
-def add_movie(title, year, omdb_rating, poster=None):
-    """Add a new movie to the database."""
+def add_movie(title, year, omdb_rating, poster=None, details=None):
+    """Add a new movie to the database; returns True on success.
+
+    ``details`` is the extracted OMDb record (director, actors, plot, genre,
+    runtime, imdb_id); when given it is stored alongside the movie.
+    """
     with engine.connect() as connection:
         try:
-            connection.execute(
+            result = connection.execute(
                 text(
-                    "INSERT INTO movies (title, year, omdb_rating, poster) "
-                    "VALUES (:title, :year, :omdb_rating, :poster)"
+                    "INSERT INTO movies (title, year, omdb_rating, poster, imdb_id) "
+                    "VALUES (:title, :year, :omdb_rating, :poster, :imdb_id)"
                 ),
                 {
                     "title": title,
                     "year": year,
                     "omdb_rating": omdb_rating,
-                    "poster": poster
+                    "poster": poster,
+                    "imdb_id": _clean((details or {}).get("imdb_id"))
                 }
             )
+            if details:
+                _save_movie_details(connection, result.lastrowid, details)
             connection.commit()
+            _notify_write("insert", [(result.lastrowid, title, year)])
             print(f"Movie '{title}' added successfully.")
+            return True
         except Exception as e:
             print(f"Error: {e}")
+            return False
+
 
+def delete_movie(title, movie_id=None):
+    """Delete a movie from the database (by id when given, else by title).
 
-def delete_movie(title):
-    """Delete a movie from the database."""
+    Returns True if a movie was deleted; raises AmbiguousTitle if the title
+    alone names several movies.
+    """
     with engine.connect() as connection:
+        condition, params = _movie_filter(connection, title, movie_id)
         try:
+            deleted = _affected_movies(connection, condition, params)
             # Execute DELETE query with parameter binding
             result = connection.execute(
-                text("DELETE FROM movies WHERE title = :title"),
-                {"title": title}
+                text(f"DELETE FROM movies WHERE {condition}"),
+                params
             )
             connection.commit()
 
             # Check if any row was deleted
             if result.rowcount > 0:
+                _notify_write("delete", deleted)
                 print(f"Movie '{title}' deleted successfully.")
-            else:
-                print(f"Movie '{title}' not found.")
+                return True
+            print(f"Movie '{title}' not found.")
+            return False
         except Exception as e:
             print(f"Error: {e}")
+            return False
 
 
-def update_movie(title, user_rating):
-    """Update a movie's user rating in the database."""
+def update_movie(title, user_rating, movie_id=None):
+    """Update a movie's user rating in the database (by id when given, else by title).
+
+    Returns True if a movie was updated; raises AmbiguousTitle if the title
+    alone names several movies.
+    """
     with engine.connect() as connection:
+        condition, params = _movie_filter(connection, title, movie_id)
         try:
             # Execute UPDATE query with parameter binding
             result = connection.execute(
-                text("""
+                text(f"""
                      UPDATE movies
                      SET user_rating  = :user_rating,
                          date_updated = CURRENT_TIMESTAMP
-                     WHERE title = :title
+                     WHERE {condition}
                      """),
-                {"title": title, "user_rating": user_rating}
+                {**params, "user_rating": user_rating}
             )
             connection.commit()
 
             # Check if any row was updated
             if result.rowcount > 0:
+                _notify_write("update", _affected_movies(connection, condition, params))
                 print(f"Your personal rating for '{title}' updated successfully.")
-            else:
-                print(f"Movie '{title}' not found.")
+                return True
+            print(f"Movie '{title}' not found.")
+            return False
         except Exception as e:
             print(f"Error: {e}")
+            return False
+
 
+def reset_user_rating(title, movie_id=None):
+    """Remove user rating, reverting to OMDb rating; returns True if a movie was updated.
 
-def reset_user_rating(title):
-    """Remove user rating, reverting to OMDb rating."""
+    Raises AmbiguousTitle if the title alone names several movies.
+    """
     with engine.connect() as connection:
+        condition, params = _movie_filter(connection, title, movie_id)
         try:
             result = connection.execute(
-                text("""
+                text(f"""
                      UPDATE movies
                      SET user_rating  = NULL,
                          date_updated = CURRENT_TIMESTAMP
-                     WHERE title = :title
+                     WHERE {condition}
                      """),
-                {"title": title}
+                params
             )
             connection.commit()
 
             if result.rowcount > 0:
+                _notify_write("update", _affected_movies(connection, condition, params))
                 print(f"User rating for '{title}' removed.")
-            else:
-                print(f"Movie '{title}' not found.")
+                return True
+            print(f"Movie '{title}' not found.")
+            return False
         except Exception as e:
             print(f"Error: {e}")
+            return False
+
+
+def _rating_runs(pairs):
+    """Split (key, rating) pairs into consecutive runs keyed by id or by title."""
+    runs = []
+    for key, rating in pairs:
+        column = "id" if isinstance(key, int) else "title"
+        if not runs or runs[-1][0] != column:
+            runs.append((column, []))
+        runs[-1][1].append({"key": key, "rating": rating})
+    return runs
+
+
+def update_ratings_batch(pairs):
+    """Set (or clear) many personal ratings in a single transaction.
+
+    Args:
+        pairs: iterable of (key, rating); the key is a movie id (int) or a
+            title (str) naming a single movie, and the rating
+            a number from 0 to 10, or None to remove the rating. Later pairs
+            for the same movie win.
+
+    Returns:
+        {"requested": number of pairs, "updated": movies changed,
+         "not_found": keys that matched no movie, in input order}
+
+    Raises:
+        ValueError: if any rating is out of range (nothing is changed).
+        AmbiguousTitle: if a title key names several movies (nothing is
+            changed).
+    """
+    pairs = [(key, None if rating is None else round(float(rating), 1)) for key, rating in pairs]
+    for key, rating in pairs:
+        if rating is not None and not 0 <= rating <= 10:
+            raise ValueError(f"Rating for {key!r} must be between 0 and 10")
+
+    with engine.connect() as connection:
+        # Stage the keys so missing ones are found with one indexed query
+        connection.execute(text("CREATE TEMP TABLE IF NOT EXISTS rating_batch "
+                                "(seq INTEGER PRIMARY KEY, movie_id INTEGER, title TEXT)"))
+        connection.execute(text("DELETE FROM rating_batch"))
+        if pairs:
+            connection.execute(
+                text("INSERT INTO rating_batch (seq, movie_id, title) VALUES (:seq, :movie_id, :title)"),
+                [{"seq": seq,
+                  "movie_id": key if isinstance(key, int) else None,
+                  "title": None if isinstance(key, int) else key}
+                 for seq, (key, _) in enumerate(pairs)]
+            )
+        missing = connection.execute(text("""
+                                          SELECT b.seq
+                                          FROM rating_batch b
+                                          WHERE NOT EXISTS (SELECT 1
+                                                            FROM movies m
+                                                            WHERE m.id = b.movie_id
+                                                               OR (b.movie_id IS NULL AND m.title = b.title))
+                                          ORDER BY b.seq
+                                          """)).scalars().all()
+        ambiguous = connection.execute(text("""
+                                            SELECT b.title
+                                            FROM rating_batch b
+                                                     JOIN movies m ON m.title = b.title
+                                            WHERE b.movie_id IS NULL
+                                            GROUP BY b.seq
+                                            HAVING COUNT(*) > 1
+                                            ORDER BY b.seq
+                                            LIMIT 1
+                                            """)).scalar()
+        if ambiguous is not None:
+            connection.execute(text("DELETE FROM rating_batch"))
+            connection.commit()
+            raise AmbiguousTitle(f"Several movies are titled '{ambiguous}'; give the movie id.")
+
+        updated = 0
+        for column, params in _rating_runs(pairs):
+            result = connection.execute(
+                text(f"""
+                     UPDATE movies
+                     SET user_rating  = :rating,
+                         date_updated = CURRENT_TIMESTAMP
+                     WHERE {column} = :key
+                     """),
+                params
+            )
+            updated += result.rowcount
+        changed = []
+        if _write_listeners:
+            changed = connection.execute(text("""
+                                              SELECT DISTINCT m.id, m.title, m.year
+                                              FROM rating_batch b
+                                                       JOIN movies m
+                                                            ON m.id = b.movie_id
+                                                                OR (b.movie_id IS NULL AND m.title = b.title)
+                                              """)).fetchall()
+        connection.execute(text("DELETE FROM rating_batch"))
+        connection.commit()
+
+    _notify_write("update", changed)
+    return {
+        "requested": len(pairs),
+        "updated": updated,
+        "not_found": [pairs[seq][0] for seq in missing]
+    }
+
+
+def reset_ratings_batch(keys):
+    """Remove the personal rating of many movies (ids or titles) in one transaction."""
+    return update_ratings_batch((key, None) for key in keys)
+
+
+def movie_exists(imdb_id, title=None, year=None):
+    """Return True if a movie with this imdbID is stored (unique index lookup).
+
+    Movies added before imdbIDs were recorded have none; passing the title
+    and year also matches such a row, so it is not added a second time.
+    """
+    with engine.connect() as connection:
+        if imdb_id and connection.execute(
+                text("SELECT 1 FROM movies WHERE imdb_id = :imdb_id"),
+                {"imdb_id": imdb_id}
+        ).first() is not None:
+            return True
+        if title is None:
+            return False
+        return connection.execute(
+            text("SELECT 1 FROM movies "
+                 "WHERE title = :title AND year = :year AND imdb_id IS NULL"),
+            {"title": title, "year": year}
+        ).first() is not None
+
+
+def get_movie_by_imdb_id(imdb_id):
+    """Return the movie dict (including its title) for an imdbID, or None."""
+    with engine.connect() as connection:
+        row = connection.execute(
+            text(f"SELECT {INFO_COLUMNS} FROM movies WHERE imdb_id = :imdb_id"),
+            {"imdb_id": imdb_id}
+        ).fetchone()
+    if row is None:
+        return None
+    info = _row_to_info(row)
+    info["title"] = row[0]
+    return info
+
+
+def upsert_movie(imdb_id, title, year, omdb_rating, poster=None, details=None):
+    """Insert a movie or refresh its OMDb data, keyed by imdbID.
+
+    An existing row keeps its id and personal rating; only the OMDb fields
+    (title, year, rating, poster and stored details) are replaced.
+    Returns the movie id.
+    """
+    with engine.connect() as connection:
+        existed = bool(_affected_movies(connection, "imdb_id = :imdb_id", {"imdb_id": imdb_id}))
+        connection.execute(
+            text("""
+                 INSERT INTO movies (imdb_id, title, year, omdb_rating, poster)
+                 VALUES (:imdb_id, :title, :year, :omdb_rating, :poster)
+                 ON CONFLICT (imdb_id) DO UPDATE
+                     SET title        = excluded.title,
+                         year         = excluded.year,
+                         omdb_rating  = excluded.omdb_rating,
+                         poster       = excluded.poster,
+                         date_updated = CURRENT_TIMESTAMP
+                 """),
+            {
+                "imdb_id": imdb_id,
+                "title": title,
+                "year": year,
+                "omdb_rating": omdb_rating,
+                "poster": poster
+            }
+        )
+        movie_id = connection.execute(
+            text("SELECT id FROM movies WHERE imdb_id = :imdb_id"),
+            {"imdb_id": imdb_id}
+        ).scalar_one()
+        if details:
+            _save_movie_details(connection, movie_id, {**details, "imdb_id": imdb_id})
+        connection.commit()
+    _notify_write("update" if existed else "insert", [(movie_id, title, year)])
+    return movie_id
+
+
+def save_movie_details(movie_id, details):
+    """Store or replace the extended OMDb record for an existing movie.
+
+    The movie is identified by its id, since remakes can share a title.
+    """
+    with engine.connect() as connection:
+        exists = connection.execute(
+            text("SELECT 1 FROM movies WHERE id = :movie_id"),
+            {"movie_id": movie_id}
+        ).scalar()
+        if exists is None:
+            print(f"Movie {movie_id} not found.")
+            return False
+        _save_movie_details(connection, movie_id, details)
+        connection.commit()
+    return True
+
+
+def get_movie_details(title, movie_id=None):
+    """Return the full stored record for a movie, or None if it is unknown.
+
+    Everything comes from the local database; fields that were never
+    fetched from OMDb are None and the genre/actor lists are empty. Raises
+    AmbiguousTitle if no id is given and several movies have the title.
+    """
+    with engine.connect() as connection:
+        condition, params = _movie_filter(connection, title, movie_id)
+        row = connection.execute(
+            text(f"""
+                 SELECT m.title, m.year, m.omdb_rating, m.user_rating, m.poster,
+                        m.id, m.imdb_id, d.director, d.plot, d.runtime, d.runtime_minutes
+                 FROM movies m
+                          LEFT JOIN movie_details d ON d.movie_id = m.id
+                 WHERE m.{condition}
+                 """),
+            params
+        ).fetchone()
+        if row is None:
+            return None
+
+        genres = connection.execute(
+            text("""
+                 SELECT g.name
+                 FROM movie_genres mg
+                          JOIN genres g ON g.id = mg.genre_id
+                 WHERE mg.movie_id = :movie_id
+                 ORDER BY g.name
+                 """),
+            {"movie_id": row[5]}
+        ).scalars().all()
+        actors = connection.execute(
+            text("""
+                 SELECT a.name
+                 FROM movie_actors ma
+                          JOIN actors a ON a.id = ma.actor_id
+                 WHERE ma.movie_id = :movie_id
+                 ORDER BY ma.billing
+                 """),
+            {"movie_id": row[5]}
+        ).scalars().all()
+
+    info = _row_to_info(row[:7])
+    info.update({
+        "title": row[0],
+        "director": row[7],
+        "plot": row[8],
+        "runtime": row[9],
+        "runtime_minutes": row[10],
+        "genres": list(genres),
+        "actors": list(actors)
+    })
+    return info
+
+
+def list_movies_by_genre(genre):
+    """Return all movies tagged with a genre (case-insensitive), ordered by title."""
+    with engine.connect() as connection:
+        result = connection.execute(
+            text("""
+                 SELECT m.title, m.year, m.omdb_rating, m.user_rating, m.poster, m.id, m.imdb_id
+                 FROM genres g
+                          JOIN movie_genres mg ON mg.genre_id = g.id
+                          JOIN movies m ON m.id = mg.movie_id
+                 WHERE g.name = :genre
+                 ORDER BY m.title COLLATE NOCASE, m.year, m.id
+                 """),
+            {"genre": genre.strip()}
+        )
+        movies = result.fetchall()
+
+    return _movies_dict(movies)
+
+
+def list_movies_by_director(director):
+    """Return all movies by a director, ordered by title.
+
+    An exact (case-insensitive) name uses the director index; if nothing
+    matches, a partial match is tried so co-directed films are found too.
+    """
+    query = """
+            SELECT m.title, m.year, m.omdb_rating, m.user_rating, m.poster, m.id, m.imdb_id
+            FROM movie_details d
+                     JOIN movies m ON m.id = d.movie_id
+            WHERE {condition}
+            ORDER BY m.title COLLATE NOCASE, m.year, m.id
+            """
+    director = director.strip()
+    with engine.connect() as connection:
+        movies = connection.execute(
+            text(query.format(condition="d.director = :director COLLATE NOCASE")),
+            {"director": director}
+        ).fetchall()
+        if not movies:
+            movies = connection.execute(
+                text(query.format(condition="d.director LIKE :pattern")),
+                {"pattern": f"%{director}%"}
+            ).fetchall()
+
+    return _movies_dict(movies)
+
+
+def list_genres():
+    """Return (genre, movie count) pairs for every stored genre."""
+    with engine.connect() as connection:
+        result = connection.execute(
+            text("""
+                 SELECT g.name, COUNT(mg.movie_id)
+                 FROM genres g
+                          JOIN movie_genres mg ON mg.genre_id = g.id
+                 GROUP BY g.id
+                 ORDER BY g.name
+                 """)
+        )
+        return [(row[0], row[1]) for row in result.fetchall()]
+
+
+# Orderings accepted by iter_movies: the sort columns, after which ties are
+# broken by id for a stable order. "title" is the listing order (see
+# title_sort_key), so remakes come out oldest first everywhere.
+MOVIE_ORDERINGS = {
+    "title": ("title COLLATE NOCASE", "year"),
+    "year": ("year",),
+    "rating": ("COALESCE(user_rating, omdb_rating)",),
+    "omdb_rating": ("omdb_rating",),
+    "added": ("date_added",)
+}
+
+
+def _order_by(order_by, direction):
+    """Return the ORDER BY list for a MOVIE_ORDERINGS key, ending in id."""
+    return ", ".join(f"{column} {direction}" for column in MOVIE_ORDERINGS[order_by] + ("id",))
+
+
+def _title_search(search):
+    """Return a WHERE clause and parameters for a case-insensitive title substring."""
+    if not search:
+        return "", {}
+    escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return " WHERE title LIKE :pattern ESCAPE '\\'", {"pattern": f"%{escaped}%"}
+
+
+def count_movies(search=None):
+    """Return the number of movies (optionally only titles containing ``search``)."""
+    where, params = _title_search(search)
+    with engine.connect() as connection:
+        return connection.execute(text(f"SELECT COUNT(*) FROM movies{where}"), params).scalar_one()
+
+
+def get_change_marker():
+    """Return (latest update/insert timestamp, highest id) for cache validation.
+
+    Both values come from index lookups, so this is cheap even for large
+    collections. The timestamp is a 'YYYY-MM-DD HH:MM:SS' UTC string or None.
+    """
+    with engine.connect() as connection:
+        row = connection.execute(text("""
+                                      SELECT (SELECT MAX(date_updated) FROM movies),
+                                             (SELECT MAX(date_added) FROM movies),
+                                             (SELECT MAX(id) FROM movies)
+                                      """)).fetchone()
+    timestamps = [value for value in row[:2] if value is not None]
+    return (max(timestamps) if timestamps else None), row[2]
+
+
+def iter_movies(order_by="title", descending=False, search=None, limit=None,
+                offset=0, batch_size=1000):
+    """Yield movies one at a time, streaming rows from the database.
+
+    Each movie is a dict like list_movies() values plus its "title". Unlike
+    list_movies() the collection is never held in memory, so this suits
+    exports and scripted use of large libraries.
+
+    Args:
+        order_by: a key of MOVIE_ORDERINGS
+        descending: reverse the order
+        search: only movies whose title contains this text (case-insensitive)
+        limit: stop after this many movies
+        offset: skip this many movies first (for simple pagination)
+        batch_size: rows fetched from the cursor at a time
+    """
+    if order_by not in MOVIE_ORDERINGS:
+        raise ValueError(f"Unknown ordering '{order_by}'. "
+                         f"Choose from: {', '.join(MOVIE_ORDERINGS)}")
+    direction = "DESC" if descending else "ASC"
+    where, params = _title_search(search)
+    query = f"SELECT {INFO_COLUMNS} FROM movies{where}"
+    query += f" ORDER BY {_order_by(order_by, direction)}"
+    if limit is not None or offset:
+        query += " LIMIT :limit OFFSET :offset"
+        params["limit"] = -1 if limit is None else limit
+        params["offset"] = offset
+
+    rows_read = 0
+    with engine.connect() as connection:
+        result = connection.execution_options(yield_per=batch_size).execute(text(query), params)
+        for row in result:
+            rows_read += 1
+            info = _row_to_info(row)
+            info["title"] = row[0]
+            yield info
+    instrumentation.count("db.rows_read", rows_read)
+
+
+def get_movies_by_ids(movie_ids, chunk_size=500):
+    """Return {id: movie dict including its title} for the ids that exist.
+
+    Used by incremental consumers of the change log to re-read only the
+    movies that changed.
+    """
+    movie_ids = list(movie_ids)
+    movies = {}
+    with engine.connect() as connection:
+        for start in range(0, len(movie_ids), chunk_size):
+            chunk = movie_ids[start:start + chunk_size]
+            placeholders = ", ".join(f":id{i}" for i in range(len(chunk)))
+            rows = connection.execute(
+                text(f"SELECT {INFO_COLUMNS} FROM movies WHERE id IN ({placeholders})"),
+                {f"id{i}": movie_id for i, movie_id in enumerate(chunk)}
+            )
+            for row in rows:
+                info = _row_to_info(row)
+                info["title"] = row[0]
+                movies[row[5]] = info
+    instrumentation.count("db.rows_read", len(movies))
+    return movies
+
+
+def find_movies_by_title(title):
+    """Return the movies titled ``title`` ignoring case, in listing order.
+
+    An idx_movies_title_nocase lookup, so only the matching rows are read.
+    """
+    with engine.connect() as connection:
+        rows = connection.execute(
+            text(f"SELECT {INFO_COLUMNS} FROM movies WHERE title = :title COLLATE NOCASE "
+                 f"ORDER BY {_order_by('title', 'ASC')}"),
+            {"title": title}
+        ).fetchall()
+    instrumentation.count("db.rows_read", len(rows))
+    movies = []
+    for row in rows:
+        info = _row_to_info(row)
+        info["title"] = row[0]
+        movies.append(info)
+    return movies
+
+
+def iter_movie_pages(page_size, order_by="title", descending=False):
+    """Yield lists of up to ``page_size`` movies in the given order.
+
+    Uses keyset pagination: each page is a separate indexed query resuming
+    after the previous page's last (sort columns, id), so deep pages cost the
+    same as the first and no transaction stays open while the caller waits
+    (e.g. for the user to press Enter).
+    """
+    if order_by not in MOVIE_ORDERINGS:
+        raise ValueError(f"Unknown ordering '{order_by}'. "
+                         f"Choose from: {', '.join(MOVIE_ORDERINGS)}")
+    columns = MOVIE_ORDERINGS[order_by]
+    direction, comparison = ("DESC", "<") if descending else ("ASC", ">")
+    order = _order_by(order_by, direction)
+    selected = ", ".join(columns)
+    # The range on the leading column lets SQLite seek in the index; the
+    # row value resumes exactly after the last movie of the previous page
+    last_values = ", ".join(f":key{index}" for index in range(len(columns)))
+    first_page = text(f"SELECT {INFO_COLUMNS}, {selected} FROM movies "
+                      f"ORDER BY {order} LIMIT :limit")
+    next_page = text(f"SELECT {INFO_COLUMNS}, {selected} FROM movies "
+                     f"WHERE {columns[0]} {comparison}= :key0 "
+                     f"AND ({selected}, id) {comparison} ({last_values}, :last_id) "
+                     f"ORDER BY {order} LIMIT :limit")
+
+    params = {"limit": page_size}
+    while True:
+        with engine.connect() as connection:
+            rows = connection.execute(next_page if "last_id" in params else first_page,
+                                      params).fetchall()
+        instrumentation.count("db.rows_read", len(rows))
+        if not rows:
+            return
+        page = []
+        for row in rows:
+            info = _row_to_info(row)
+            info["title"] = row[0]
+            page.append(info)
+        yield page
+        if len(rows) < page_size:
+            return
+        for index, value in enumerate(rows[-1][-len(columns):]):
+            params[f"key{index}"] = value
+        params["last_id"] = rows[-1][5]
+
+
+# Random id probes before falling back to counting the matching rows
+RANDOM_PROBES = 32
+# Rejection-sampling rounds for weighted picks before settling
+RANDOM_WEIGHT_ATTEMPTS = 64
+RANDOM_WEIGHTS = (None, "rating")
+
+
+def _random_candidate(connection, conditions, params, rng):
+    """Return one uniformly chosen movie row (INFO_COLUMNS), or None.
+
+    Random ids between MIN(id) and MAX(id) are probed by primary key, each
+    probe also checking the filters; a hit is uniform over the matching
+    movies because every id is equally likely. After RANDOM_PROBES misses
+    (deleted ids, or filters matching few movies) the matching rows are
+    counted and one is picked by offset along an index, which is uniform
+    too but reads every matching row.
+    """
+    low, high = connection.execute(text("SELECT MIN(id), MAX(id) FROM movies")).fetchone()
+    if low is None:
+        return None
+    where = " AND ".join(conditions) or "1"
+    probe = text(f"SELECT {INFO_COLUMNS} FROM movies WHERE id = :id AND {where}")
+    for _ in range(RANDOM_PROBES):
+        row = connection.execute(probe, {**params, "id": rng.randint(low, high)}).fetchone()
+        if row is not None:
+            return row
+
+    total = connection.execute(text(f"SELECT COUNT(*) FROM movies WHERE {where}"), params).scalar_one()
+    if not total:
+        return None
+    order = "year, id" if "decade_start" in params else "id"
+    return connection.execute(
+        text(f"SELECT {INFO_COLUMNS} FROM movies WHERE {where} "
+             f"ORDER BY {order} LIMIT 1 OFFSET :offset"),
+        {**params, "offset": rng.randrange(total)}
+    ).fetchone()
+
+
+def pick_random_movie(weight=None, unrated_only=False, decade=None, rng=random):
+    """Return a random movie dict (including its title), or None if none match.
+
+    Only a handful of indexed lookups are made; the table is never loaded.
+
+    Args:
+        weight: None for a uniform pick, or "rating" to favour movies in
+            proportion to their effective rating (your rating, else OMDb's)
+        unrated_only: only pick movies you have not rated yet
+        decade: only pick movies released in this decade (e.g. 1990)
+        rng: random number source (a random.Random for reproducible picks)
+    """
+    if weight not in RANDOM_WEIGHTS:
+        raise ValueError(f"Unknown weight '{weight}'. Choose from: rating")
+    conditions = []
+    params = {}
+    if unrated_only:
+        conditions.append("user_rating IS NULL")
+    if decade is not None:
+        start = int(decade) // 10 * 10
+        conditions.append("year BETWEEN :decade_start AND :decade_end")
+        params.update(decade_start=start, decade_end=start + 9)
+
+    with engine.connect() as connection:
+        row = _random_candidate(connection, conditions, params, rng)
+        if row is None:
+            return None
+        if weight == "rating":
+            # Rejection sampling: accept a candidate with probability rating / 10
+            for _ in range(RANDOM_WEIGHT_ATTEMPTS):
+                rating = row[3] if row[3] is not None else row[2]
+                if rng.random() * 10 < rating:
+                    break
+                row = _random_candidate(connection, conditions, params, rng)
+
+    info = _row_to_info(row)
+    info["title"] = row[0]
+    return info
+
+
+def _bucket_median(counts, total):
+    """Median of a {bucket: count} histogram (buckets sorted ascending)."""
+    if not total:
+        return None
+    wanted = {(total - 1) // 2, total // 2}
+    values = []
+    seen = 0
+    for bucket, count in sorted(counts.items()):
+        for position in sorted(wanted):
+            if seen <= position < seen + count:
+                values.append(bucket)
+        seen += count
+        if len(values) == len(wanted):
+            break
+    return sum(values) / len(values)
+
+
+def get_stats_snapshot():
+    """Return collection statistics from the trigger-maintained snapshot.
+
+    The cost depends on the number of distinct buckets (at most 101 ratings
+    and one per year), not on the size of the collection. Keys are those of
+    get_rating_stats() plus "omdb_histogram" and "user_histogram"
+    ({rating: count}) and "movies_per_year" ({year: count}).
+    """
+    with engine.connect() as connection:
+        summary, buckets = _stored_stats(connection)
+    if summary is None:
+        summary = dict.fromkeys(STATS_TERMS, 0)
+
+    histograms = {kind: {} for kind in STATS_BUCKETS}
+    for (kind, bucket), count in buckets.items():
+        histograms[kind][bucket] = count
+    omdb, user, years = histograms["omdb"], histograms["user"], histograms["year"]
+    total, rated = summary["total"], summary["rated"]
+
+    def scaled(value):
+        return value / 10 if value is not None else None
+
+    return {
+        "total": total,
+        "avg_omdb": summary["omdb_sum"] / total if total else None,
+        "median_omdb": scaled(_bucket_median(omdb, total)),
+        "min_omdb": scaled(min(omdb, default=None)),
+        "max_omdb": scaled(max(omdb, default=None)),
+        "rated": rated,
+        "avg_user": summary["user_sum"] / rated if rated else None,
+        "median_user": scaled(_bucket_median(user, rated)),
+        "min_user": scaled(min(user, default=None)),
+        "max_user": scaled(max(user, default=None)),
+        "oldest_year": min(years, default=None),
+        "newest_year": max(years, default=None),
+        "higher": summary["higher"],
+        "lower": summary["lower"],
+        "same": summary["same"],
+        "avg_abs_diff": summary["abs_diff_sum"] / rated if rated else None,
+        "omdb_histogram": {bucket / 10: count for bucket, count in sorted(omdb.items())},
+        "user_histogram": {bucket / 10: count for bucket, count in sorted(user.items())},
+        "movies_per_year": dict(sorted(years.items()))
+    }
+
+
+def get_rating_stats():
+    """Return the flat collection statistics (no histograms).
+
+    Keys: total, avg/median/min/max_omdb, rated, avg/median/min/max_user,
+    oldest_year, newest_year, higher, lower, same, avg_abs_diff. Values are
+    None when there is no data. Medians have 0.1 resolution.
+    """
+    snapshot = get_stats_snapshot()
+    for key in ("omdb_histogram", "user_histogram", "movies_per_year"):
+        del snapshot[key]
+    return snapshot
+
+
+def get_titles_for_bucket(kind, value, limit=None):
+    """Return titles in one stats bucket, e.g. the best-rated ones.
+
+    Args:
+        kind: "omdb" or "user" (ratings, matched at 0.1 resolution) or "year"
+        value: the rating or year, e.g. get_stats_snapshot()["max_omdb"]
+        limit: return at most this many titles
+    """
+    if kind == "year":
+        condition, params = "year = :value", {"value": value}
+    elif kind in ("omdb", "user"):
+        bucket = round(value * 10)
+        condition = f"{kind}_rating >= :low AND {kind}_rating < :high"
+        params = {"low": (bucket - 0.5) / 10, "high": (bucket + 0.5) / 10}
+    else:
+        raise ValueError(f"Unknown stats kind '{kind}'")
+    query = f"SELECT title FROM movies WHERE {condition} ORDER BY title COLLATE NOCASE, year, id"
+    if limit is not None:
+        query += " LIMIT :limit"
+        params["limit"] = limit
+    with engine.connect() as connection:
+        return connection.execute(text(query), params).scalars().all()
+
+
+DISAGREEMENT_DIRECTIONS = ("both", "higher", "lower")
+
+
+def get_rating_disagreements(k=3, direction="both"):
+    """Return up to k (title, user_rating - omdb_rating) pairs, largest gap first.
+
+    Each direction is an index-ordered LIMIT k read from one end of
+    idx_movies_rating_gap; "both" merges the two short lists, so the cost
+    is O(k log n) rather than a sort of every rated movie.
+
+    Args:
+        k: number of movies to return
+        direction: "higher" (you rated above OMDb), "lower" or "both"
+    """
+    if direction not in DISAGREEMENT_DIRECTIONS:
+        raise ValueError(f"Unknown direction '{direction}'. "
+                         f"Choose from: {', '.join(DISAGREEMENT_DIRECTIONS)}")
+    queries = []
+    if direction in ("both", "higher"):
+        queries.append("user_rating - omdb_rating > 0 ORDER BY user_rating - omdb_rating DESC")
+    if direction in ("both", "lower"):
+        queries.append("user_rating - omdb_rating < 0 ORDER BY user_rating - omdb_rating ASC")
+
+    candidates = []
+    with engine.connect() as connection:
+        for condition in queries:
+            candidates.extend(connection.execute(
+                text(f"SELECT title, user_rating - omdb_rating FROM movies "
+                     f"WHERE user_rating IS NOT NULL AND {condition} LIMIT :k"),
+                {"k": k}
+            ))
+    top = heapq.nsmallest(k, candidates, key=lambda row: (-abs(row[1]), row[0]))
+    return [(title, round(gap, 1)) for title, gap in top]
+
+
+def rebuild_stats():
+    """Recompute the stats snapshot from the movies table; returns the new stats."""
+    with engine.connect() as connection:
+        _rebuild_stats(connection)
+        connection.commit()
+    return get_rating_stats()
+
+
+def verify_stats():
+    """Compare the stats snapshot with a full recomputation.
+
+    Returns a list of human-readable differences; empty when consistent.
+    """
+    with engine.connect() as connection:
+        expected_summary, expected_buckets = _compute_stats(connection)
+        stored_summary, stored_buckets = _stored_stats(connection)
+
+    if stored_summary is None:
+        return ["movie_stats: summary row is missing"]
+    differences = []
+    for column, expected in expected_summary.items():
+        stored = stored_summary[column]
+        if abs((stored or 0) - (expected or 0)) > 1e-6:
+            differences.append(f"movie_stats.{column}: stored {stored}, expected {expected}")
+    for key in sorted(expected_buckets.keys() | stored_buckets.keys()):
+        stored = stored_buckets.get(key, 0)
+        expected = expected_buckets.get(key, 0)
+        if stored != expected:
+            differences.append(f"movie_stats_buckets {key[0]} {key[1]}: "
+                               f"stored {stored}, expected {expected}")
+    return differences
+
+
+CHANGE_FIELDS = ("seq", "op", "movie_id", "imdb_id", "title", "changed_at")
+
+
+class ChangesCompacted(LookupError):
+    """Raised when changes after a cursor were already compacted away.
+
+    The consumer has missed changes and must rescan the movies table, then
+    continue from get_latest_change_seq() taken before the rescan.
+    """
+
+
+def _change_horizon(connection):
+    """Return the highest sequence number that has been compacted away."""
+    return connection.execute(text("""
+                                   SELECT COALESCE(
+                                       (SELECT MIN(seq) FROM movie_changes) - 1,
+                                       (SELECT seq FROM sqlite_sequence WHERE name = 'movie_changes'),
+                                       0)
+                                   """)).scalar_one()
+
+
+def get_latest_change_seq():
+    """Return the sequence number of the newest change (0 if none yet).
+
+    A new consumer reads this, scans the movies table once, and from then
+    on only processes get_changes_since(that number).
+    """
+    with engine.connect() as connection:
+        return connection.execute(text(
+            "SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'movie_changes'), 0)"
+        )).scalar_one()
+
+
+def get_changes_since(cursor=0, limit=1000):
+    """Return up to ``limit`` changes with a sequence number above ``cursor``.
+
+    Each change is a dict with seq, op ("insert", "update" or "delete"),
+    movie_id, imdb_id, title and changed_at, oldest first. Pass the last
+    seq back as the next cursor. Raises ChangesCompacted if changes after
+    ``cursor`` no longer exist.
+    """
+    with engine.connect() as connection:
+        if cursor < _change_horizon(connection):
+            raise ChangesCompacted(f"changes after {cursor} were compacted; rescan the movies")
+        rows = connection.execute(
+            text(f"SELECT {', '.join(CHANGE_FIELDS)} FROM movie_changes "
+                 f"WHERE seq > :cursor ORDER BY seq LIMIT :limit"),
+            {"cursor": cursor, "limit": limit}
+        ).fetchall()
+    return [dict(zip(CHANGE_FIELDS, row)) for row in rows]
+
+
+def get_consumer_cursor(name):
+    """Return the cursor saved for consumer ``name``, or None if it has none."""
+    with engine.connect() as connection:
+        return connection.execute(
+            text("SELECT seq FROM movie_change_consumers WHERE name = :name"),
+            {"name": name}
+        ).scalar_one_or_none()
+
+
+def save_consumer_cursor(name, seq):
+    """Record that consumer ``name`` has processed every change up to ``seq``."""
+    with engine.connect() as connection:
+        connection.execute(text("""
+                                INSERT INTO movie_change_consumers (name, seq)
+                                VALUES (:name, :seq)
+                                ON CONFLICT (name) DO UPDATE
+                                    SET seq = excluded.seq, updated_at = CURRENT_TIMESTAMP
+                                """), {"name": name, "seq": seq})
+        connection.commit()
+
+
+def remove_consumer(name):
+    """Forget consumer ``name`` so it no longer holds back compaction."""
+    with engine.connect() as connection:
+        connection.execute(text("DELETE FROM movie_change_consumers WHERE name = :name"),
+                           {"name": name})
+        connection.commit()
+
+
+def compact_changes(max_age_days=None):
+    """Delete log entries every registered consumer has processed.
+
+    With ``max_age_days``, entries older than that are deleted as well, even
+    if a consumer lagging behind has not seen them (it then gets
+    ChangesCompacted and rescans). Without registered consumers only the age
+    limit applies. Returns the number of entries deleted.
+    """
+    with engine.connect() as connection:
+        processed = connection.execute(text(
+            "SELECT COALESCE(MIN(seq), 0) FROM movie_change_consumers"
+        )).scalar_one()
+        if max_age_days is not None:
+            expired = connection.execute(
+                text("SELECT MAX(seq) FROM movie_changes "
+                     "WHERE changed_at < datetime('now', :age)"),
+                {"age": f"-{float(max_age_days)} days"}
+            ).scalar_one()
+            processed = max(processed, expired or 0)
+        deleted = connection.execute(text("DELETE FROM movie_changes WHERE seq <= :seq"),
+                                     {"seq": processed}).rowcount
+        connection.commit()
+    return deleted
+
+
+# Diff and merge of another movies database, ATTACHed as schema "other".
+# Movies are matched by imdb_id, or by title and year when either side has
+# no imdb_id.
+DIFF_COLUMNS = ("title", "year", "omdb_rating", "user_rating", "poster", "imdb_id")
+DIFF_FIELDS = ("change", "id", "other_id", "imdb_id", "title", "year", "field", "ours", "theirs")
+
+# How merge_database() settles a user_rating both sides have (a rating only
+# one side has is always kept)
+MERGE_POLICIES = {
+    "keep": "COALESCE(m.user_rating, o.user_rating)",
+    "theirs": "COALESCE(o.user_rating, m.user_rating)",
+    "max": "COALESCE(MAX(m.user_rating, o.user_rating), m.user_rating, o.user_rating)",
+    "min": "COALESCE(MIN(m.user_rating, o.user_rating), m.user_rating, o.user_rating)",
+    # The side whose movie row was written last
+    "newest": "CASE WHEN COALESCE(o.date_updated, o.date_added) "
+              "> COALESCE(m.date_updated, m.date_added) "
+              "THEN COALESCE(o.user_rating, m.user_rating) "
+              "ELSE COALESCE(m.user_rating, o.user_rating) END"
+}
+
+
+def _database_file(source):
+    """Return the file of ``source``, a database path or a collection name."""
+    path = source if os.path.exists(source) else None
+    if path is None and COLLECTION_NAME.fullmatch(source):
+        path = collection_path(source)
+    if path is None or not os.path.exists(path):
+        raise LookupError(f"No database or collection named '{source}'")
+    own = engine.url.database
+    if own and own != ":memory:" and os.path.exists(own) and os.path.samefile(path, own):
+        raise ValueError(f"'{source}' is the database being compared against")
+    return path
+
+
+def _attach_other(connection, path):
+    """ATTACH the database at ``path`` as schema "other" and pair its movies with ours.
+
+    The pairs go to temp.merge_pairs (our id, their id). Returns the names
+    of the tables the other database has.
+    """
+    connection.exec_driver_sql("ATTACH DATABASE ? AS other", (path,))
+    tables = set(connection.execute(text(
+        "SELECT name FROM other.sqlite_master WHERE type = 'table'"
+    )).scalars())
+    columns = {row[1] for row in connection.execute(text("PRAGMA other.table_info(movies)"))}
+    missing = [column for column in DIFF_COLUMNS if column not in columns]
+    if missing:
+        connection.exec_driver_sql("DETACH DATABASE other")
+        raise ValueError(f"'{path}' has no movies table with {', '.join(missing)} "
+                         f"(open it with this app once to upgrade it)")
+
+    connection.execute(text("DROP TABLE IF EXISTS temp.merge_pairs"))
+    connection.execute(text("CREATE TEMP TABLE merge_pairs "
+                            "(movie_id INTEGER PRIMARY KEY, other_id INTEGER UNIQUE)"))
+    # Both lookups use an index of the other movies table
+    connection.execute(text("""
+                            INSERT OR IGNORE INTO merge_pairs (movie_id, other_id)
+                            SELECT m.id, o.id
+                            FROM main.movies m
+                                     JOIN other.movies o ON o.imdb_id = m.imdb_id
+                            """))
+    # One pass per side without an imdb_id, so each starts from the few
+    # such rows (found through the imdb_id index) instead of every movie
+    for unknown, known in (("m", "o"), ("o", "m")):
+        connection.execute(text(f"""
+                                INSERT OR IGNORE INTO merge_pairs (movie_id, other_id)
+                                SELECT m.id, o.id
+                                FROM main.movies m
+                                         JOIN other.movies o ON o.title = m.title AND o.year = m.year
+                                WHERE {unknown}.imdb_id IS NULL
+                                ORDER BY m.id, o.id
+                                """))
+    return tables
+
+
+def _detach_other(connection):
+    for table in ("merge_pairs", "merge_added", "merge_ratings"):
+        connection.execute(text(f"DROP TABLE IF EXISTS temp.{table}"))
+    connection.commit()
+    connection.exec_driver_sql("DETACH DATABASE other")
+
+
+def diff_database(source):
+    """Yield the differences between this collection and another database.
+
+    ``source`` is a database file (e.g. a backup) or a collection name.
+    Each difference is a dict with DIFF_FIELDS: "change" is "added" (only
+    in the other database), "removed" (only in ours) or "changed", which is
+    reported once per differing column ("field", with "ours" and "theirs").
+    Movies are streamed in id order, so even large diffs use little memory.
+
+    Raises:
+        LookupError: right away if ``source`` does not exist.
+        ValueError: right away if it is not a compatible movies database.
+    """
+    rows = _diff_rows(_database_file(source))
+    # Runs up to the pause after ATTACH, so errors surface before any output
+    next(rows)
+    return rows
+
+
+def _diff_rows(path):
+    select_columns = ", ".join(DIFF_COLUMNS)
+    with engine.connect() as connection:
+        _attach_other(connection, path)
+        results = []
+
+        def stream(query):
+            result = connection.execution_options(yield_per=1000).execute(text(query))
+            results.append(result)
+            return result
+
+        try:
+            # Paused here by diff_database(); closing the generator from now
+            # on still detaches the other database
+            yield None
+            for row in stream(f"""
+                                             SELECT id, {select_columns}
+                                             FROM main.movies
+                                             WHERE id NOT IN (SELECT movie_id FROM merge_pairs)
+                                             ORDER BY id
+                                             """):
+                yield {"change": "removed", "id": row[0], "other_id": None,
+                       "imdb_id": row[6], "title": row[1], "year": row[2],
+                       "field": None, "ours": None, "theirs": None}
+            for row in stream(f"""
+                                             SELECT id, {select_columns}
+                                             FROM other.movies
+                                             WHERE id NOT IN (SELECT other_id FROM merge_pairs)
+                                             ORDER BY id
+                                             """):
+                yield {"change": "added", "id": None, "other_id": row[0],
+                       "imdb_id": row[6], "title": row[1], "year": row[2],
+                       "field": None, "ours": None, "theirs": None}
+            # IS NOT treats two NULLs as equal, like EXCEPT, but needs no sort
+            ours = ", ".join(f"m.{column}" for column in DIFF_COLUMNS)
+            theirs = ", ".join(f"o.{column}" for column in DIFF_COLUMNS)
+            differs = " OR ".join(f"m.{column} IS NOT o.{column}" for column in DIFF_COLUMNS)
+            changed = stream(f"""
+                             SELECT p.movie_id, p.other_id, {ours}, {theirs}
+                             FROM merge_pairs p
+                                      JOIN main.movies m ON m.id = p.movie_id
+                                      JOIN other.movies o ON o.id = p.other_id
+                             WHERE {differs}
+                             ORDER BY p.movie_id
+                             """)
+            width = len(DIFF_COLUMNS)
+            for row in changed:
+                mine, other = row[2:2 + width], row[2 + width:]
+                for column, our_value, their_value in zip(DIFF_COLUMNS, mine, other):
+                    if our_value != their_value:
+                        yield {"change": "changed", "id": row[0], "other_id": row[1],
+                               "imdb_id": mine[5], "title": mine[0], "year": mine[1],
+                               "field": column, "ours": our_value, "theirs": their_value}
+        finally:
+            for result in results:
+                result.close()
+            _detach_other(connection)
+
+
+def merge_database(source, policy="keep", dry_run=False):
+    """Merge another database into this collection in one transaction.
+
+    Movies only the other database has are copied with their details,
+    genres and actors. For movies both have, ``user_rating`` is settled by
+    ``policy`` (a key of MERGE_POLICIES: keep ours, take theirs, the higher
+    or lower one, or the newest). A rating only one side has is always
+    kept. Everything else about our movies stays as it is. With ``dry_run``
+    the merge is rolled back after counting.
+
+    Returns {"added", "matched", "ratings_updated", "policy", "dry_run"}.
+    """
+    if policy not in MERGE_POLICIES:
+        raise ValueError(f"Unknown rating policy '{policy}'. "
+                         f"Choose from: {', '.join(MERGE_POLICIES)}")
+    with engine.connect() as connection:
+        tables = _attach_other(connection, _database_file(source))
+        try:
+            matched = connection.execute(text("SELECT COUNT(*) FROM merge_pairs")).scalar_one()
+
+            # New ids follow both our highest id and the AUTOINCREMENT counter
+            connection.execute(text("DROP TABLE IF EXISTS temp.merge_added"))
+            connection.execute(text("""
+                                    CREATE TEMP TABLE merge_added AS
+                                    SELECT o.id AS other_id,
+                                           MAX(COALESCE((SELECT MAX(id) FROM main.movies), 0),
+                                               COALESCE((SELECT seq FROM main.sqlite_sequence
+                                                         WHERE name = 'movies'), 0))
+                                               + ROW_NUMBER() OVER (ORDER BY o.id) AS movie_id
+                                    FROM other.movies o
+                                    WHERE o.id NOT IN (SELECT other_id FROM merge_pairs)
+                                    """))
+            added = connection.execute(text(
+                "INSERT INTO main.movies (id, title, year, omdb_rating, user_rating, poster, "
+                "date_added, date_updated, imdb_id) "
+                "SELECT a.movie_id, o.title, o.year, o.omdb_rating, o.user_rating, o.poster, "
+                "COALESCE(o.date_added, CURRENT_TIMESTAMP), o.date_updated, o.imdb_id "
+                "FROM merge_added a JOIN other.movies o ON o.id = a.other_id "
+                "ORDER BY a.movie_id"
+            )).rowcount
+            _merge_details(connection, tables)
+
+            # Ratings the policy changes, staged so listeners learn which movies moved
+            connection.execute(text("DROP TABLE IF EXISTS temp.merge_ratings"))
+            connection.execute(text(f"""
+                                    CREATE TEMP TABLE merge_ratings AS
+                                    SELECT movie_id, rating
+                                    FROM (SELECT p.movie_id, m.user_rating AS current,
+                                                 {MERGE_POLICIES[policy]} AS rating
+                                          FROM merge_pairs p
+                                                   JOIN main.movies m ON m.id = p.movie_id
+                                                   JOIN other.movies o ON o.id = p.other_id
+                                          WHERE m.user_rating IS NOT o.user_rating)
+                                    WHERE rating IS NOT current
+                                    """))
+            ratings_updated = connection.execute(text("""
+                                                      UPDATE main.movies
+                                                      SET user_rating  = r.rating,
+                                                          date_updated = CURRENT_TIMESTAMP
+                                                      FROM merge_ratings r
+                                                      WHERE movies.id = r.movie_id
+                                                      """)).rowcount
+
+            inserted_rows, updated_rows = [], []
+            if _write_listeners and not dry_run:
+                inserted_rows = connection.execute(text(
+                    "SELECT m.id, m.title, m.year FROM merge_added a "
+                    "JOIN main.movies m ON m.id = a.movie_id"
+                )).fetchall()
+                updated_rows = connection.execute(text(
+                    "SELECT m.id, m.title, m.year FROM merge_ratings r "
+                    "JOIN main.movies m ON m.id = r.movie_id"
+                )).fetchall()
+            if dry_run:
+                connection.rollback()
+            else:
+                connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            _detach_other(connection)
+
+    _notify_write("insert", inserted_rows)
+    _notify_write("update", updated_rows)
+    return {"added": added, "matched": matched, "ratings_updated": ratings_updated,
+            "policy": policy, "dry_run": dry_run}
+
+
+def _merge_details(connection, tables):
+    """Copy the details, genres and actors of the movies in temp.merge_added."""
+    if "movie_details" in tables:
+        connection.execute(text("""
+                                INSERT INTO main.movie_details
+                                    (movie_id, imdb_id, director, plot, runtime, runtime_minutes)
+                                SELECT a.movie_id, d.imdb_id, d.director, d.plot, d.runtime, d.runtime_minutes
+                                FROM merge_added a
+                                         JOIN other.movie_details d ON d.movie_id = a.other_id
+                                """))
+    for names, links, key, copied in (("genres", "movie_genres", "genre_id", ()),
+                                      ("actors", "movie_actors", "actor_id", ("billing",))):
+        if names not in tables or links not in tables:
+            continue
+        # Names are matched case-insensitively (the name columns are NOCASE)
+        connection.execute(text(f"""
+                                INSERT OR IGNORE INTO main.{names} (name)
+                                SELECT DISTINCT n.name
+                                FROM merge_added a
+                                         JOIN other.{links} l ON l.movie_id = a.other_id
+                                         JOIN other.{names} n ON n.id = l.{key}
+                                """))
+        columns = "".join(f", {column}" for column in copied)
+        values = "".join(f", l.{column}" for column in copied)
+        connection.execute(text(f"""
+                                INSERT OR IGNORE INTO main.{links} (movie_id, {key}{columns})
+                                SELECT a.movie_id, mine.id{values}
+                                FROM merge_added a
+                                         JOIN other.{links} l ON l.movie_id = a.other_id
+                                         JOIN other.{names} n ON n.id = l.{key}
+                                         JOIN main.{names} mine ON mine.name = n.name
+                                """))
 
 
 # Wrapper functions for compatibility with the main program
@@ -164,17 +1996,17 @@ def get_movies():
     return list_movies()
 
 
-def add_movie_to_storage(title, year, rating, poster=None):
+def add_movie_to_storage(title, year, rating, poster=None, details=None):
     """Wrapper for add_movie to maintain compatibility."""
-    add_movie(title, year, rating, poster)
+    return add_movie(title, year, rating, poster, details)
 
 
-def delete_movie_from_storage(title):
+def delete_movie_from_storage(title, movie_id=None):
     """Wrapper for delete_movie to maintain compatibility."""
-    delete_movie(title)
+    return delete_movie(title, movie_id)
 
 
-def update_movie_in_storage(title, rating, year):
+def update_movie_in_storage(title, rating, year, movie_id=None):
     """Wrapper for update_movie to maintain compatibility.
     Note: Now only updates user rating, year parameter is ignored."""
-    update_movie(title, rating)
\ No newline at end of file
+    return update_movie(title, rating, movie_id)
\ No newline at end of file
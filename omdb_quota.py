@@ -0,0 +1,242 @@
+"""
+Daily OMDb request budget, shared by every process using the API key.
+
+OMDb plans allow a fixed number of requests per day (1,000 on the free
+plan). Each request that goes out to the network is first booked in a small
+SQLite file (OMDB_QUOTA_DB), per UTC day and priority class, so the app,
+the JSON server and cron jobs all draw from one count:
+
+    interactive   someone is waiting (the menu, `add`): may use everything
+    bulk          scripted adds and refreshes: stop while BULK_RESERVE of
+                  the day's budget is left, keeping it for interactive use
+    prefetch      speculative detail/page prefetches: stop even earlier,
+                  while PREFETCH_RESERVE is left
+
+reserve() books a request or, when its class may no longer spend, raises
+QuotaExceeded. Callers tell it apart from network failures: refused bulk
+work should be retried after the reset (see status()["resets_in"]).
+Cached responses never reach reserve(), and a request retried after a
+server error or timeout is booked once.
+
+The budget applies to the live OMDb API; against another server (such as
+the offline stub) requests are only counted if OMDB_DAILY_LIMIT is set.
+Functions take the server's ``base_url``; without it, OMDB_BASE_URL (or the
+live API) is assumed.
+
+Example:
+    status()    # -> {"day": "2026-10-19", "limit": 1000, "used": 412,
+                #     "remaining": 588, "by_priority": {...}, ...}
+"""
+import math
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, text
+
+import instrumentation
+
+# Requests allowed per UTC day (0 = count without limiting); unset means
+# 1000 for the live API and no accounting for other servers
+LIMIT_SETTING = os.environ.get("OMDB_DAILY_LIMIT")
+DEFAULT_DAILY_LIMIT = 1000
+
+QUOTA_DB = os.environ.get("OMDB_QUOTA_DB", "omdb_quota.db")
+
+LIVE_BASE_URL = "http://www.omdbapi.com/"
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PREFETCH = "prefetch"
+PRIORITIES = (INTERACTIVE, BULK, PREFETCH)
+
+# Share of the daily limit each class must leave untouched
+RESERVES = {
+    INTERACTIVE: 0.0,
+    BULK: float(os.environ.get("OMDB_BULK_RESERVE", "0.1")),
+    PREFETCH: float(os.environ.get("OMDB_PREFETCH_RESERVE", "0.25"))
+}
+
+# Days of history kept for `quota --days`
+KEEP_DAYS = 30
+
+_engine = None
+
+
+class QuotaExceeded(Exception):
+    """The day's budget does not admit another request of this priority."""
+
+    def __init__(self, message, priority=None):
+        super().__init__(message)
+        self.priority = priority
+
+
+def daily_limit(base_url=None):
+    """Return the daily limit, 0 for unlimited, or None when not accounting."""
+    if LIMIT_SETTING not in (None, ""):
+        return int(LIMIT_SETTING)
+    base_url = base_url or os.environ.get("OMDB_BASE_URL", LIVE_BASE_URL)
+    return DEFAULT_DAILY_LIMIT if base_url == LIVE_BASE_URL else None
+
+
+def _today():
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def _seconds_to_reset():
+    now = datetime.now(timezone.utc)
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), timezone.utc)
+    return int((midnight - now).total_seconds())
+
+
+def _get_engine():
+    """Open the quota database on first use, creating its tables."""
+    global _engine
+    if _engine is None:
+        engine = create_engine(f"sqlite:///{QUOTA_DB}", connect_args={"timeout": 30})
+        with engine.begin() as connection:
+            connection.execute(text("""
+                                    CREATE TABLE IF NOT EXISTS omdb_quota (
+                                        day TEXT NOT NULL,
+                                        priority TEXT NOT NULL,
+                                        requests INTEGER NOT NULL DEFAULT 0,
+                                        deferred INTEGER NOT NULL DEFAULT 0,
+                                        PRIMARY KEY (day, priority)
+                                    )
+                                    """))
+            # Days on which OMDb itself answered "Request limit reached!"
+            connection.execute(text("""
+                                    CREATE TABLE IF NOT EXISTS omdb_quota_exhausted (
+                                        day TEXT PRIMARY KEY
+                                    )
+                                    """))
+            cutoff = (datetime.now(timezone.utc).date() - timedelta(days=KEEP_DAYS)).isoformat()
+            connection.execute(text("DELETE FROM omdb_quota WHERE day < :cutoff"), {"cutoff": cutoff})
+            connection.execute(text("DELETE FROM omdb_quota_exhausted WHERE day < :cutoff"),
+                               {"cutoff": cutoff})
+        _engine = engine
+    return _engine
+
+
+def _allowance(limit, priority):
+    """Requests of the day after which ``priority`` may no longer spend."""
+    return limit - math.ceil(limit * RESERVES[priority])
+
+
+def reserve(priority=INTERACTIVE, base_url=None):
+    """Book one request for ``priority`` or raise QuotaExceeded.
+
+    The check and the booking are one statement, so concurrent processes
+    cannot overspend the budget between them.
+    """
+    if priority not in RESERVES:
+        raise ValueError(f"Unknown priority '{priority}'. Choose from: {', '.join(PRIORITIES)}")
+    limit = daily_limit(base_url)
+    if limit is None:
+        return
+    params = {"day": _today(), "priority": priority}
+    booking = """
+              INSERT INTO omdb_quota (day, priority, requests)
+              SELECT :day, :priority, 1
+              WHERE {condition}
+              ON CONFLICT (day, priority) DO UPDATE SET requests = requests + 1
+              """
+    if limit:
+        condition = ("NOT EXISTS (SELECT 1 FROM omdb_quota_exhausted WHERE day = :day) "
+                     "AND (SELECT COALESCE(SUM(requests), 0) FROM omdb_quota "
+                     "WHERE day = :day) < :allowance")
+        params["allowance"] = _allowance(limit, priority)
+    else:
+        condition = "1"
+    with _get_engine().begin() as connection:
+        booked = connection.execute(text(booking.format(condition=condition)), params).rowcount
+    if not booked:
+        defer(priority, base_url)
+        hours, seconds = divmod(_seconds_to_reset(), 3600)
+        raise QuotaExceeded(
+            f"OMDb daily quota: no {priority} requests left today "
+            f"(resets in {hours}h {seconds // 60}m)", priority
+        )
+    instrumentation.count(f"omdb.quota_used.{priority}")
+
+
+def defer(priority, base_url=None):
+    """Count a request of ``priority`` that was put off because of the quota."""
+    if daily_limit(base_url) is None:
+        return
+    instrumentation.count(f"omdb.quota_deferred.{priority}")
+    with _get_engine().begin() as connection:
+        connection.execute(text("""
+                                INSERT INTO omdb_quota (day, priority, deferred)
+                                VALUES (:day, :priority, 1)
+                                ON CONFLICT (day, priority) DO UPDATE SET deferred = deferred + 1
+                                """), {"day": _today(), "priority": priority})
+
+
+def mark_exhausted(base_url=None):
+    """Record that OMDb refused a request for today's limit; nothing more is sent today."""
+    if daily_limit(base_url) is None:
+        return
+    with _get_engine().begin() as connection:
+        connection.execute(text("INSERT OR IGNORE INTO omdb_quota_exhausted (day) VALUES (:day)"),
+                           {"day": _today()})
+
+
+def admits(priority=INTERACTIVE, base_url=None):
+    """Whether a request of ``priority`` would be admitted right now."""
+    report = status(base_url=base_url)
+    if report["limit"] is None or not report["limit"]:
+        return True
+    return report["available"][priority] > 0
+
+
+def status(day=None, base_url=None):
+    """Return the budget for ``day`` (default: today).
+
+    Returns:
+        {"day", "limit", "used", "remaining", "exhausted", "resets_in"
+        (seconds), "by_priority": {priority: {"requests", "deferred"}},
+        "available": requests each priority may still make}
+    """
+    day = day or _today()
+    limit = daily_limit(base_url)
+    by_priority = {priority: {"requests": 0, "deferred": 0} for priority in PRIORITIES}
+    exhausted = False
+    if limit is not None:
+        with _get_engine().connect() as connection:
+            for priority, used, deferred in connection.execute(
+                    text("SELECT priority, requests, deferred FROM omdb_quota WHERE day = :day"),
+                    {"day": day}):
+                by_priority[priority] = {"requests": used, "deferred": deferred}
+            exhausted = connection.execute(
+                text("SELECT 1 FROM omdb_quota_exhausted WHERE day = :day"), {"day": day}
+            ).scalar() is not None
+    used = sum(counts["requests"] for counts in by_priority.values())
+    if limit:
+        remaining = 0 if exhausted else max(0, limit - used)
+        available = {priority: 0 if exhausted else max(0, _allowance(limit, priority) - used)
+                     for priority in PRIORITIES}
+    else:
+        remaining = available = None
+    return {
+        "day": day,
+        "limit": limit,
+        "used": used,
+        "remaining": remaining,
+        "exhausted": exhausted,
+        "resets_in": _seconds_to_reset() if day == _today() else None,
+        "by_priority": by_priority,
+        "available": available
+    }
+
+
+def history(days=7, base_url=None):
+    """Yield (day, priority, requests, deferred) rows for the last ``days`` days, newest first."""
+    if daily_limit(base_url) is None:
+        return
+    cutoff = (datetime.now(timezone.utc).date() - timedelta(days=days - 1)).isoformat()
+    with _get_engine().connect() as connection:
+        yield from connection.execute(
+            text("SELECT day, priority, requests, deferred FROM omdb_quota "
+                 "WHERE day >= :cutoff ORDER BY day DESC, priority"),
+            {"cutoff": cutoff}
+        )
@@ -0,0 +1,335 @@
+"""
+Offline stand-in for the OMDb API.
+
+Serves OMDb-compatible JSON from recorded fixtures so the API layer can be
+exercised and benchmarked without network access or an API key. Latency,
+server errors and quota errors can be injected to test concurrency, caching
+and retry behaviour reproducibly.
+
+Usage:
+    python omdb_stub_server.py --port 8765 --latency-ms 50 --error-rate 0.05
+    OMDB_BASE_URL=http://127.0.0.1:8765/ python movie_app.py
+
+Request lookup order:
+    1. Exact recorded responses ("responses" in the fixture file)
+    2. Movie records ("movies"), answering i=, t= (+ y=) and s= queries
+    3. Deterministic synthetic movies, if --synthesize is enabled
+    4. OMDb's "Movie not found!" response
+
+With --record, misses are forwarded to the live API (OMDB_API_KEY must be
+set) and the responses are appended to the fixture file.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import requests
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "fixtures", "omdb_fixtures.json")
+LIVE_URL = "http://www.omdbapi.com/"
+PAGE_SIZE = 10
+
+# Query parameters that do not change which response OMDb returns
+IGNORED_PARAMS = ("apikey", "type", "r", "v", "callback")
+
+
+def request_key(params):
+    """Return the canonical fixture key for a set of query parameters."""
+    items = sorted(
+        (name, value.strip().lower())
+        for name, value in params.items()
+        if name not in IGNORED_PARAMS and value.strip()
+    )
+    return "&".join(f"{name}={value}" for name, value in items)
+
+
+def not_found(message="Movie not found!"):
+    """Return OMDb's error body."""
+    return {"Response": "False", "Error": message}
+
+
+def search_entry(movie):
+    """Return the short record OMDb uses in search results."""
+    return {
+        "Title": movie["Title"],
+        "Year": movie["Year"],
+        "imdbID": movie["imdbID"],
+        "Type": movie.get("Type", "movie"),
+        "Poster": movie.get("Poster", "N/A")
+    }
+
+
+def synthesize_movie(title, year=None):
+    """Build a deterministic fake OMDb record for any title."""
+    digest = int(hashlib.sha1(title.lower().encode("utf-8")).hexdigest(), 16)
+    year = year or str(1950 + digest % 75)
+    return {
+        "Title": title,
+        "Year": str(year),
+        "Rated": "PG-13",
+        "Released": f"01 Jan {year}",
+        "Runtime": f"{80 + digest % 100} min",
+        "Genre": ["Drama", "Comedy", "Action", "Thriller", "Sci-Fi"][digest % 5],
+        "Director": f"Director {digest % 997}",
+        "Writer": "N/A",
+        "Actors": ", ".join(f"Actor {(digest >> shift) % 5000}" for shift in (0, 8, 16)),
+        "Plot": f"A synthetic movie called {title}.",
+        "Language": "English",
+        "Country": "USA",
+        "Poster": "N/A",
+        "imdbRating": f"{1 + (digest % 90) / 10:.1f}",
+        "imdbID": f"tt{9000000 + digest % 1000000}",
+        "Type": "movie",
+        "Response": "True"
+    }
+
+
+class FixtureStore:
+    """Recorded responses and movie records, indexed for lookups."""
+
+    def __init__(self, path=None, synthesize=False, record=False):
+        self.path = path
+        self.synthesize = synthesize
+        self.record = record
+        self.responses = {}
+        self.movies = []
+        self._synthetic = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.responses = data.get("responses", {})
+            self.movies = data.get("movies", [])
+        self._by_id = {movie["imdbID"]: movie for movie in self.movies}
+        self._by_title = {}
+        for movie in self.movies:
+            self._by_title.setdefault(movie["Title"].lower(), []).append(movie)
+
+    def lookup(self, params):
+        """Return the JSON body for a request."""
+        key = request_key(params)
+        if key in self.responses:
+            return self.responses[key]
+
+        body = self._from_movies(params)
+        if body is None and self.record:
+            body = self._record(key, params)
+        return body if body is not None else not_found()
+
+    def _from_movies(self, params):
+        """Answer i=, t= and s= queries from the movie records."""
+        if params.get("i"):
+            imdb_id = params["i"].strip()
+            movie = self._by_id.get(imdb_id) or self._synthetic.get(imdb_id)
+            if movie is None and self.synthesize:
+                movie = self._synthesized(f"Synthetic {imdb_id}")
+                movie = dict(movie, imdbID=imdb_id)
+            return movie
+
+        if params.get("t"):
+            candidates = self._by_title.get(params["t"].strip().lower(), [])
+            year = params.get("y", "").strip()
+            if year:
+                candidates = [m for m in candidates if m["Year"].startswith(year)]
+            if candidates:
+                return candidates[0]
+            if self.synthesize:
+                return self._synthesized(params["t"].strip(), year or None)
+            return None
+
+        if params.get("s"):
+            term = params["s"].strip().lower()
+            page = max(1, int(params.get("page") or 1))
+            matches = [search_entry(m) for m in self.movies if term in m["Title"].lower()]
+            if not matches and self.synthesize:
+                total = 5 + int(hashlib.sha1(term.encode("utf-8")).hexdigest(), 16) % 60
+                matches = [
+                    search_entry(self._synthesized(f"{params['s'].strip()} {number}"))
+                    for number in range(1, total + 1)
+                ]
+            if not matches:
+                return None
+            page_results = matches[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+            if not page_results:
+                return None
+            return {
+                "Search": page_results,
+                "totalResults": str(len(matches)),
+                "Response": "True"
+            }
+
+        return not_found("Incorrect IMDb ID.")
+
+    def _synthesized(self, title, year=None):
+        """Return a synthetic movie, remembering it for later i= lookups."""
+        movie = synthesize_movie(title, year)
+        with self._lock:
+            self._synthetic.setdefault(movie["imdbID"], movie)
+        return movie
+
+    def _record(self, key, params):
+        """Forward a miss to the live API and store the response."""
+        api_key = os.environ.get("OMDB_API_KEY")
+        if not api_key:
+            return None
+        response = requests.get(LIVE_URL, params=dict(params, apikey=api_key), timeout=10)
+        body = response.json()
+        with self._lock:
+            self.responses[key] = body
+            if self.path:
+                self.save()
+        return body
+
+    def save(self):
+        """Write responses and movies back to the fixture file."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"movies": self.movies, "responses": self.responses},
+                      f, indent=2, ensure_ascii=False)
+
+
+class StubConfig:
+    """Fault and latency injection settings (shared by all handler threads)."""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0,
+                 limit_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.limit_rate = limit_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "limited": 0, "not_found": 0}
+
+    def draw(self):
+        """Return (delay in seconds, fault) for the next request."""
+        with self.lock:
+            delay = max(0.0, self.latency_ms + self.random.uniform(-1, 1) * self.jitter_ms) / 1000
+            roll = self.random.random()
+            if roll < self.error_rate:
+                fault = "error"
+            elif roll < self.error_rate + self.limit_rate:
+                fault = "limit"
+            else:
+                fault = None
+        return delay, fault
+
+    def count(self, name):
+        """Increment a request statistic."""
+        with self.lock:
+            self.stats[name] += 1
+
+
+class OMDbStubHandler(BaseHTTPRequestHandler):
+    """Answers OMDb-style GET requests from the server's fixture store."""
+
+    protocol_version = "HTTP/1.1"
+    # Buffer headers and body into one write (avoids Nagle/delayed-ACK stalls)
+    wbufsize = -1
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        config = self.server.config
+
+        if url.path == "/__stats":
+            with config.lock:
+                self._send(200, dict(config.stats))
+            return
+
+        config.count("requests")
+        delay, fault = config.draw()
+        if delay:
+            time.sleep(delay)
+
+        if fault == "error":
+            config.count("errors")
+            self._send(503, {"Response": "False", "Error": "Service Unavailable"})
+            return
+        if fault == "limit":
+            config.count("limited")
+            self._send(401, not_found("Request limit reached!"))
+            return
+
+        params = dict(parse_qsl(url.query))
+        body = self.server.store.lookup(params)
+        if body.get("Response") == "False":
+            config.count("not_found")
+        self._send(200, body)
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def start_stub_server(host="127.0.0.1", port=0, fixtures=DEFAULT_FIXTURES,
+                      synthesize=False, record=False, latency_ms=0.0,
+                      jitter_ms=0.0, error_rate=0.0, limit_rate=0.0,
+                      seed=None, verbose=False):
+    """
+    Start the stub server on a background thread.
+
+    Returns:
+        tuple: (server, base_url); call server.shutdown() to stop it
+    """
+    server = ThreadingHTTPServer((host, port), OMDbStubHandler)
+    server.daemon_threads = True
+    server.store = FixtureStore(fixtures, synthesize=synthesize, record=record)
+    server.config = StubConfig(latency_ms, jitter_ms, error_rate, limit_rate, seed)
+    server.verbose = verbose
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline OMDb API stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES,
+                        help="fixture JSON file (default: %(default)s)")
+    parser.add_argument("--synthesize", action="store_true",
+                        help="invent deterministic movies for unknown titles")
+    parser.add_argument("--record", action="store_true",
+                        help="forward misses to the live API and save them")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="fraction of requests answered with HTTP 503")
+    parser.add_argument("--limit-rate", type=float, default=0.0,
+                        help="fraction answered with 'Request limit reached!'")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(
+        args.host, args.port, args.fixtures, args.synthesize, args.record,
+        args.latency_ms, args.jitter_ms, args.error_rate, args.limit_rate,
+        args.seed, args.verbose
+    )
+    print(f"OMDb stub serving {args.fixtures} at {base_url}")
+    print(f"Use it with: OMDB_BASE_URL={base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print("\nStub server stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Tests for TitleIndex (run with: python -m pytest tests)."""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from title_matcher import EXACT, SUBSTRING, TYPO, TitleIndex, normalize_title
+
+
+class NormalizeTitleTest(unittest.TestCase):
+    def test_folds_accents_case_articles_and_punctuation(self):
+        self.assertEqual(normalize_title("The Amélie!"), "amelie")
+        self.assertEqual(normalize_title("A Fish Called Wanda"), "fish called wanda")
+        self.assertEqual(normalize_title("Se7en: Director's Cut"), "se7en director s cut")
+
+    def test_keeps_a_title_that_is_only_an_article(self):
+        self.assertEqual(normalize_title("The"), "the")
+
+
+class TitleIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = TitleIndex()
+        self.index.add(1, "The Godfather", data=1972)
+        self.index.add(2, "Amélie", data=2001)
+        self.index.add(3, "The Godfather Part II", data=1974)
+        self.index.add(4, "Dark City", data=1998)
+
+    def keys(self, query, **kwargs):
+        return [match.key for match in self.index.search(query, **kwargs)]
+
+    def test_exact_match_ranks_first(self):
+        matches = self.index.search("the godfather")
+        self.assertEqual(matches[0].key, 1)
+        self.assertEqual(matches[0].tier, EXACT)
+        self.assertEqual(matches[0].data, 1972)
+        self.assertEqual(matches[1].key, 3)
+        self.assertEqual(matches[1].tier, SUBSTRING)
+
+    def test_typo(self):
+        matches = self.index.search("godfahter")
+        self.assertEqual(matches[0].key, 1)
+        self.assertEqual(matches[0].tier, TYPO)
+        self.assertEqual(matches[0].distance, 2)
+
+    def test_accents_and_articles_are_ignored(self):
+        self.assertEqual(self.keys("amelie")[:1], [2])
+        self.assertEqual(self.keys("The Amélie")[:1], [2])
+        self.assertEqual(self.keys("A Dark City")[:1], [4])
+
+    def test_no_match(self):
+        self.assertEqual(self.keys("zzzz"), [])
+        self.assertEqual(self.keys("!!!"), [])
+
+    def test_limit(self):
+        self.assertEqual(self.keys("godfather", limit=1), [1])
+
+    def test_remove(self):
+        self.index.remove(1)
+        self.assertNotIn(1, self.index)
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.keys("the godfather"), [3])
+        self.index.remove(1)  # unknown keys are ignored
+
+    def test_add_replaces_the_title_of_a_key(self):
+        self.index.add(4, "Metropolis")
+        self.assertEqual(self.keys("dark city"), [])
+        self.assertEqual(self.keys("metropolis"), [4])
+
+    def test_out_of_order_keys(self):
+        index = TitleIndex()
+        for key in (50, 10, 30, 20, 40):
+            index.add(key, f"Alien {key}")
+        for postings in index._postings.values():
+            self.assertEqual(list(postings), sorted(postings))
+        self.assertEqual(sorted(match.key for match in index.search("alien")),
+                         [10, 20, 30, 40, 50])
+        index.remove(30)
+        index.remove(10)
+        for postings in index._postings.values():
+            self.assertEqual(list(postings), sorted(postings))
+        self.assertEqual(sorted(match.key for match in index.search("alien")), [20, 40, 50])
+        self.assertEqual(index.search("alien 20")[0].key, 20)
+
+    def test_built_from_pairs(self):
+        index = TitleIndex([(7, "Heat"), (8, "Alien")])
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.search("alein")[0].key, 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
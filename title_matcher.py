@@ -0,0 +1,259 @@
+"""
+Ranked fuzzy matching of movie titles.
+
+TitleIndex keeps every title in normalized form (accents stripped, case
+folded, a leading "The"/"A"/"An" dropped, punctuation collapsed to spaces)
+together with an inverted index from character trigrams to titles. A lookup:
+
+1. counts, per title, how many of the query's trigrams it shares by merging
+   the query's posting lists (no per-title work for non-candidates);
+2. scores titles sharing at least ``min_similarity`` of the query trigrams
+   by trigram containment and Jaccard similarity;
+3. ranks exact and substring hits first, then titles within a bounded
+   Levenshtein distance of the query (typos, checked for a shortlist of
+   the best-scoring candidates only), then the rest by score.
+
+Candidates are pruned by score, so a substring hit sharing few of the
+query's trigrams (e.g. "dark" in "Darkness") is only ranked as such when
+it scores among the shortlist.
+
+The index is built once and kept current with add()/remove(). Posting
+lists are sorted arrays, so a write finds its keys by binary search and
+costs no Python-level scan even for trigrams millions of titles share.
+
+Example:
+    index = TitleIndex()
+    index.add(1, "The Godfather")
+    index.add(2, "Amélie")
+    index.search("godfahter")   # -> [Match(key=1, title='The Godfather', ...)]
+"""
+import bisect
+import heapq
+import math
+import re
+import unicodedata
+from array import array
+from collections import Counter, namedtuple
+
+LEADING_ARTICLES = ("the ", "a ", "an ")
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+# Match tiers, best first
+EXACT, SUBSTRING, TYPO, SIMILAR = 3, 2, 1, 0
+
+# Candidates (per requested match) that get an edit-distance check
+SHORTLIST_FACTOR = 10
+
+Match = namedtuple("Match", "key title score distance tier data")
+
+# SQLite's NOCASE collation folds ASCII letters only
+_NOCASE = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def fold_title(title):
+    """Return ``title`` as COLLATE NOCASE compares it (ASCII letters lowercased)."""
+    return title.translate(_NOCASE)
+
+
+def title_sort_key(title, year, movie_id):
+    """Sort key matching the listing order, ORDER BY title COLLATE NOCASE, year, id.
+
+    For code that orders movies itself (snapshots, incremental site builds)
+    and must agree with the database.
+    """
+    return fold_title(title), year, movie_id
+
+
+def normalize_title(title):
+    """Fold a title for matching: 'The Amélie!' -> 'amelie'."""
+    decomposed = unicodedata.normalize("NFKD", title)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    folded = _NON_ALNUM.sub(" ", stripped.casefold()).strip()
+    for article in LEADING_ARTICLES:
+        if folded.startswith(article) and len(folded) > len(article):
+            return folded[len(article):]
+    return folded
+
+
+def pad_words(normalized):
+    """Pad every word like PostgreSQL's pg_trgm: 'dark city' -> '  dark   city '.
+
+    A trigram occurs in this string exactly when it is one of the title's
+    trigrams, so membership can be tested with a substring search.
+    """
+    return "".join(f"  {word} " for word in normalized.split())
+
+
+def trigrams(normalized):
+    """Return the set of padded word trigrams of a normalized title."""
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        for start in range(len(padded) - 2):
+            grams.add(padded[start:start + 3])
+    return grams
+
+
+def bounded_levenshtein(a, b, max_distance):
+    """Edit distance between a and b, or max_distance + 1 if it is larger.
+
+    Only the diagonal band of width 2 * max_distance + 1 is computed and the
+    loop stops as soon as a row exceeds the bound.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if len(a) > len(b):
+        a, b = b, a
+    too_far = max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        low = max(1, i - max_distance)
+        high = min(len(b), i + max_distance)
+        current = [too_far] * (len(b) + 1)
+        if low == 1:
+            current[0] = i
+        char = a[i - 1]
+        row_min = current[0] if low == 1 else too_far
+        for j in range(low, high + 1):
+            cost = 0 if char == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > max_distance:
+            return too_far
+        previous = current
+    return min(previous[len(b)], too_far)
+
+
+class TitleIndex:
+    """Incrementally maintained trigram index over titles.
+
+    Keys are caller-chosen (movie ids); ``data`` is any value to hand back
+    with matches (e.g. the release year).
+    """
+
+    def __init__(self, titles=()):
+        self._entries = {}    # key -> (title, normalized, padded words, trigram count, data)
+        self._postings = {}   # trigram -> sorted array of keys
+        for key, title in titles:
+            self.add(key, title)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def add(self, key, title, data=None):
+        """Index ``title`` under ``key`` (replacing any previous title)."""
+        if key in self._entries:
+            self.remove(key)
+        normalized = normalize_title(title)
+        grams = trigrams(normalized)
+        self._entries[key] = (title, normalized, pad_words(normalized), len(grams), data)
+        for gram in grams:
+            postings = self._postings.get(gram)
+            if postings is None:
+                postings = self._postings[gram] = array("q")
+            # Keys usually arrive in ascending order (ids), making this an append
+            if not postings or postings[-1] < key:
+                postings.append(key)
+            else:
+                postings.insert(bisect.bisect_left(postings, key), key)
+
+    def remove(self, key):
+        """Forget ``key``; unknown keys are ignored."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for gram in trigrams(entry[1]):
+            postings = self._postings.get(gram)
+            if postings is None:
+                continue
+            position = bisect.bisect_left(postings, key)
+            if position < len(postings) and postings[position] == key:
+                del postings[position]
+            if not postings:
+                del self._postings[gram]
+
+    def search(self, query, limit=10, min_similarity=0.3, max_distance=None):
+        """Return up to ``limit`` Match tuples, best first.
+
+        Args:
+            query: the text the user typed
+            limit: number of matches to return
+            min_similarity: share of the query's trigrams a title must contain
+            max_distance: edit-distance bound for typo matches
+                (default: a third of the query length, at least 1)
+        """
+        normalized = normalize_title(query)
+        if not normalized:
+            return []
+        if max_distance is None:
+            max_distance = max(1, len(normalized) // 3)
+        query_grams = trigrams(normalized)
+        required = max(1, math.ceil(min_similarity * len(query_grams)))
+        shortlist_size = max(limit * SHORTLIST_FACTOR, limit)
+
+        # A title sharing `required` trigrams must appear in at least one of
+        # the rarest (n - required + 1) posting lists, so only those are
+        # merged; the commonest (required - 1) lists are never read
+        by_rarity = sorted(query_grams, key=lambda gram: len(self._postings.get(gram, ())))
+        unread = required - 1
+        unread_grams = set(by_rarity[len(by_rarity) - unread:])
+        partial_counts = Counter()
+        for gram in by_rarity[:len(by_rarity) - unread]:
+            postings = self._postings.get(gram)
+            if postings is not None:
+                partial_counts.update(postings)
+
+        # Verify candidates best partial count first. Jaccard never exceeds
+        # containment, so a title sharing s trigrams scores at most s / n;
+        # stop once even the unread lists could not lift a score into the
+        # shortlist
+        best_scores = []   # min-heap of the shortlist's scores
+        scored = []
+        for key, partial in partial_counts.most_common():
+            if (len(best_scores) >= shortlist_size
+                    and (partial + unread) / len(query_grams) < best_scores[0]):
+                break
+            title, candidate, padded, gram_count, data = self._entries[key]
+            shared = partial
+            for gram in unread_grams:
+                if gram in padded:
+                    shared += 1
+            if shared < required:
+                continue
+            containment = shared / len(query_grams)
+            jaccard = shared / (len(query_grams) + gram_count - shared)
+            score = (containment + jaccard) / 2
+            if len(best_scores) < shortlist_size:
+                heapq.heappush(best_scores, score)
+            elif score > best_scores[0]:
+                heapq.heapreplace(best_scores, score)
+            if candidate == normalized:
+                tier = EXACT
+            elif normalized in candidate:
+                tier = SUBSTRING
+            else:
+                tier = SIMILAR
+            scored.append((tier, score, key))
+
+        # Edit distances only for a shortlist: typo matches score highly on
+        # trigrams, so they are among the best-scoring candidates anyway
+        shortlist = heapq.nlargest(shortlist_size, scored)
+        matches = []
+        for tier, score, key in shortlist:
+            title, candidate, _, _, data = self._entries[key]
+            if tier == SIMILAR:
+                distance = bounded_levenshtein(normalized, candidate, max_distance)
+                if distance <= max_distance:
+                    tier = TYPO
+            else:
+                # Deleting the surrounding characters is the cheapest edit
+                distance = len(candidate) - len(normalized)
+            matches.append(Match(key, title, round(score, 4), distance, tier, data))
+
+        matches.sort(key=lambda match: (-match.tier, match.distance, -match.score, match.title))
+        return matches[:limit]
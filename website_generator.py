@@ -1,8 +1,13 @@
 import os
 import requests
 import hashlib
-from movie_storage_sql import get_movies
+from html import escape
+from string import Template
+import movie_storage_sql
+from movie_storage_sql import get_stats_snapshot, get_titles_for_bucket
+from movie_snapshot import get_movies
 from datetime import datetime
+import instrumentation
 
 # Output directory for the website
 OUTPUT_DIR = "website"
@@ -11,6 +16,20 @@ CSS_FILE = "style.css"
 HTML_FILE = "index.html"
 
 
+def set_output_dir(path):
+    """Write the website (and its posters) to ``path``."""
+    global OUTPUT_DIR, IMAGES_DIR
+    OUTPUT_DIR = path
+    IMAGES_DIR = os.path.join(path, "images")
+
+
+def use_collection_output_dir():
+    """Give a non-default collection its own site in a subdirectory (website/NAME)."""
+    collection = movie_storage_sql.current_collection
+    if collection != movie_storage_sql.DEFAULT_COLLECTION:
+        set_output_dir(os.path.join(OUTPUT_DIR, collection))
+
+
 def create_output_directory():
     """Create the output directories if they don't exist."""
     if not os.path.exists(OUTPUT_DIR):
@@ -42,12 +61,16 @@ def download_poster(poster_url, movie_title):
 
         # Check if already downloaded
         if os.path.exists(filepath):
+            instrumentation.count("site.posters_cached")
             return f"images/{filename}"
 
         # Download the image
         print(f"  Downloading poster for {movie_title}...")
-        response = requests.get(poster_url, timeout=10)
-        response.raise_for_status()
+        with instrumentation.span("site.poster_download"):
+            response = requests.get(poster_url, timeout=10)
+            response.raise_for_status()
+        instrumentation.count("site.posters_downloaded")
+        instrumentation.count("site.bytes_downloaded", len(response.content))
 
         # Save the image
         with open(filepath, 'wb') as f:
@@ -193,10 +216,61 @@ def save_css():
     print(f"Created CSS file: {css_path}")
 
 
+# Card templates, one per layout (split title or not, poster or placeholder),
+# assembled once at import so rendering a card is a single substitution
+TITLE_HTML = '<div class="movie-title" title="$title">$title</div>'
+SPLIT_TITLE_HTML = '''
+            <div class="movie-title" title="$title">
+                <div>
+                    <div class="movie-main-title">$main_title</div>
+                    <div class="movie-subtitle">$subtitle</div>
+                </div>
+            </div>'''
+POSTER_HTML = '<img src="$poster" alt="$title" class="movie-poster">'
+NO_POSTER_HTML = '<div class="movie-poster no-poster">No poster<br>available</div>'
+CARD_HTML = """
+        <li>
+            <div class="movie">
+                $poster_html
+                $title_html
+                <div class="movie-year">$year</div>
+                <div class="movie-rating">$rating</div>
+            </div>
+        </li>"""
+
+
+def _compile_card(split, has_poster):
+    """Assemble one card layout into a %-format string (the fastest to fill)."""
+    layout = Template(CARD_HTML).safe_substitute(
+        title_html=SPLIT_TITLE_HTML if split else TITLE_HTML,
+        poster_html=POSTER_HTML if has_poster else NO_POSTER_HTML
+    )
+    return Template(layout.replace("%", "%%")).substitute(
+        {field: f"%({field})s" for field in CARD_FIELDS}
+    )
+
+
+CARD_FIELDS = ("title", "main_title", "subtitle", "poster", "year", "rating")
+CARD_TEMPLATES = {
+    (split, has_poster): _compile_card(split, has_poster)
+    for split in (False, True)
+    for has_poster in (False, True)
+}
+
+# Changes whenever a template does, invalidating cached fragments
+TEMPLATE_VERSION = hashlib.sha1(
+    "\0".join((TITLE_HTML, SPLIT_TITLE_HTML, POSTER_HTML, NO_POSTER_HTML, CARD_HTML)).encode("utf-8")
+).hexdigest()[:12]
+
+FRAGMENT_CACHE_FILE = ".fragment_cache"
+# Off by default: the cards are cheap enough that rendering them costs
+# about as much as loading and hashing their cached copies
+USE_FRAGMENT_CACHE = os.environ.get("SITE_FRAGMENT_CACHE", "0").lower() in ("1", "true", "yes")
+
+
 def generate_movie_html(movie_data, local_poster_path=None):
     """Generate HTML for a single movie."""
     title = movie_data['title']
-    year = movie_data['year']
     omdb_rating = movie_data['omdb_rating']
     user_rating = movie_data.get('user_rating')
 
@@ -206,93 +280,112 @@ def generate_movie_html(movie_data, local_poster_path=None):
         title_parts = title.split(':', 1)
     elif ' - ' in title:
         title_parts = title.split(' - ', 1)
+    split = len(title_parts) == 2
 
-    # Create title HTML
-    if len(title_parts) == 2:
-        title_html = f'''
-            <div class="movie-title" title="{title}">
-                <div>
-                    <div class="movie-main-title">{title_parts[0].strip()}</div>
-                    <div class="movie-subtitle">{title_parts[1].strip()}</div>
-                </div>
-            </div>'''
-    else:
-        title_html = f'<div class="movie-title" title="{title}">{title}</div>'
-
-    # Use local poster if available, otherwise show placeholder
-    if local_poster_path:
-        poster_html = f'<img src="{local_poster_path}" alt="{title}" class="movie-poster">'
-    else:
-        poster_html = f'<div class="movie-poster no-poster">No poster<br>available</div>'
-
-    # Create rating HTML
-    rating_html = f'<div class="movie-rating">OMDb: {omdb_rating:.1f}'
+    rating = f'OMDb: {omdb_rating:.1f}'
     if user_rating is not None:
-        rating_html += f' | You: {user_rating:.1f}'
-    rating_html += '</div>'
-
-    # Create movie HTML (using li for the template)
-    movie_html = f"""
-        <li>
-            <div class="movie">
-                {poster_html}
-                {title_html}
-                <div class="movie-year">{year}</div>
-                {rating_html}
-            </div>
-        </li>"""
-
-    return movie_html
+        rating += f' | You: {user_rating:.1f}'
+
+    return CARD_TEMPLATES[(split, bool(local_poster_path))] % {
+        'title': escape(title),
+        'main_title': escape(title_parts[0].strip()) if split else '',
+        'subtitle': escape(title_parts[1].strip()) if split else '',
+        'poster': escape(local_poster_path) if local_poster_path else '',
+        'year': movie_data['year'],
+        'rating': rating
+    }
 
 
-def calculate_statistics(movies):
-    """Calculate statistics for the movie collection."""
-    if not movies:
+class FragmentCache:
+    """Rendered movie cards kept between runs in the output directory.
+
+    A card is keyed by a hash of the fields it displays, and the file by the
+    template version, so an unchanged movie is reused verbatim and any edit
+    (or a template change) renders it again. Only the cards used in a run
+    are saved, so removed movies drop out. The file is plain text (records
+    split by control characters), which loads several times faster than JSON.
+    """
+
+    RECORD_SEPARATOR = '\x1e'
+    KEY_SEPARATOR = '\x1f'
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(OUTPUT_DIR, FRAGMENT_CACHE_FILE)
+        self._cached = {}
+        self._used = {}
+        self.hits = 0
+        self.misses = 0
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                version, _, records = f.read().partition('\n')
+        except (OSError, ValueError):
+            return
+        if version == TEMPLATE_VERSION and records:
+            self._cached = dict(record.split(self.KEY_SEPARATOR, 1)
+                                for record in records.split(self.RECORD_SEPARATOR))
+
+    def card(self, movie_data, local_poster_path=None):
+        """Return the card HTML, from the cache when the movie is unchanged."""
+        key = hashlib.sha1(
+            f"{movie_data['title']}\0{movie_data['year']}\0{movie_data['omdb_rating']}\0"
+            f"{movie_data.get('user_rating')}\0{local_poster_path}".encode('utf-8')
+        ).hexdigest()
+        html = self._cached.get(key)
+        if html is None:
+            html = generate_movie_html(movie_data, local_poster_path)
+            self.misses += 1
+            if self.RECORD_SEPARATOR in html:
+                return html     # Can't be stored; rendered again next time
+        else:
+            self.hits += 1
+        self._used[key] = html
+        return html
+
+    def save(self):
+        """Write the cards used in this run, unless they are exactly the cached ones."""
+        if not self.misses and len(self._used) == len(self._cached):
+            return
+        temp_path = self.path + '.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(TEMPLATE_VERSION + '\n')
+                f.write(self.RECORD_SEPARATOR.join(key + self.KEY_SEPARATOR + html
+                                                   for key, html in self._used.items()))
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"  Could not save the fragment cache: {e}")
+            return
+        self._cached = self._used
+        self._used = {}
+        self.hits = self.misses = 0
+
+
+def calculate_statistics():
+    """Read the collection statistics from the maintained stats snapshot."""
+    stats = get_stats_snapshot()
+    if not stats['total']:
         return None
 
-    # Basic counts
-    total_movies = len(movies)
-    rated_by_user = sum(1 for m in movies.values() if m.get('user_rating') is not None)
-
-    # OMDb statistics
-    omdb_ratings = [m['omdb_rating'] for m in movies.values()]
-    avg_omdb = sum(omdb_ratings) / len(omdb_ratings)
-    highest_omdb = max(movies.items(), key=lambda x: x[1]['omdb_rating'])
-    lowest_omdb = min(movies.items(), key=lambda x: x[1]['omdb_rating'])
-
-    # User statistics
-    user_ratings = [m['user_rating'] for m in movies.values() if m.get('user_rating') is not None]
-    if user_ratings:
-        avg_user = sum(user_ratings) / len(user_ratings)
-        highest_user = max(
-            ((k, v) for k, v in movies.items() if v.get('user_rating') is not None),
-            key=lambda x: x[1]['user_rating']
-        )
-        lowest_user = min(
-            ((k, v) for k, v in movies.items() if v.get('user_rating') is not None),
-            key=lambda x: x[1]['user_rating']
-        )
-    else:
-        avg_user = None
-        highest_user = None
-        lowest_user = None
-
-    # Year statistics
-    years = [m['year'] for m in movies.values()]
-    newest = max(movies.items(), key=lambda x: x[1]['year'])
-    oldest = min(movies.items(), key=lambda x: x[1]['year'])
+    def first_title(kind, value):
+        titles = get_titles_for_bucket(kind, value, limit=1)
+        return titles[0] if titles else ""
+
+    highest_user = lowest_user = None
+    if stats['rated']:
+        highest_user = (first_title('user', stats['max_user']), {'user_rating': stats['max_user']})
+        lowest_user = (first_title('user', stats['min_user']), {'user_rating': stats['min_user']})
 
     return {
-        'total_movies': total_movies,
-        'rated_by_user': rated_by_user,
-        'avg_omdb': avg_omdb,
-        'avg_user': avg_user,
-        'highest_omdb': highest_omdb,
-        'lowest_omdb': lowest_omdb,
+        'total_movies': stats['total'],
+        'rated_by_user': stats['rated'],
+        'avg_omdb': stats['avg_omdb'],
+        'avg_user': stats['avg_user'],
+        'highest_omdb': (first_title('omdb', stats['max_omdb']), {'omdb_rating': stats['max_omdb']}),
+        'lowest_omdb': (first_title('omdb', stats['min_omdb']), {'omdb_rating': stats['min_omdb']}),
         'highest_user': highest_user,
         'lowest_user': lowest_user,
-        'newest': newest,
-        'oldest': oldest
+        'newest': (first_title('year', stats['newest_year']), {'year': stats['newest_year']}),
+        'oldest': (first_title('year', stats['oldest_year']), {'year': stats['oldest_year']})
     }
 
 
@@ -352,38 +445,7 @@ def generate_statistics_html(stats):
     return html
 
 
-def generate_html(movies):
-    """Generate the main HTML file using the provided template."""
-    # Sort movies by title
-    sorted_movies = sorted(movies.items(), key=lambda x: x[0].lower())
-
-    # Download posters
-    print("\nDownloading movie posters...")
-    poster_paths = {}
-    for title, data in sorted_movies:
-        poster_url = data.get('poster')
-        if poster_url and poster_url != 'N/A':
-            local_path = download_poster(poster_url, title)
-            if local_path:
-                poster_paths[title] = local_path
-
-    print(f"Downloaded {len(poster_paths)} posters")
-
-    # Generate movie grid HTML
-    movie_grid_html = ""
-    for title, data in sorted_movies:
-        movie_info = {
-            'title': title,
-            'year': data['year'],
-            'omdb_rating': data['omdb_rating'],
-            'user_rating': data.get('user_rating'),
-            'poster': data.get('poster')
-        }
-        local_poster = poster_paths.get(title)
-        movie_grid_html += generate_movie_html(movie_info, local_poster)
-
-    # Use the provided template
-    html_template = """<html>
+PAGE_TEMPLATE = """<html>
 <head>
     <title>My Movie App</title>
     <link rel="stylesheet" href="style.css"/>
@@ -400,14 +462,79 @@ def generate_html(movies):
 </body>
 </html>"""
 
-    # Replace template variables
-    html = html_template.replace("__TEMPLATE_TITLE__", f"My Movies ({len(movies)})")
-    html = html.replace("__TEMPLATE_MOVIE_GRID__", movie_grid_html)
 
-    return html
+def render_page(movie_grid_html, movie_count):
+    """Fill the page template with the rendered movie cards."""
+    html = PAGE_TEMPLATE.replace("__TEMPLATE_TITLE__", f"My Movies ({movie_count})")
+    return html.replace("__TEMPLATE_MOVIE_GRID__", movie_grid_html)
 
 
-def generate_website():
+def write_page(html_content):
+    """Write index.html atomically, so readers never see a half-written page."""
+    html_path = os.path.join(OUTPUT_DIR, HTML_FILE)
+    temp_path = html_path + ".tmp"
+    with instrumentation.span("site.write"):
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(html_content)
+        os.replace(temp_path, html_path)
+    instrumentation.count("site.bytes_written", len(html_content))
+    return html_path
+
+
+def generate_html(movies, use_cache=None):
+    """Generate the main HTML file using the provided template.
+
+    Movies are shown in the mapping's order; get_movies() already returns
+    them in listing order (title ignoring case, then year), straight from
+    the title index or the snapshot, so nothing is sorted here.
+
+    With ``use_cache`` (default: SITE_FRAGMENT_CACHE) the cards of unchanged
+    movies come from the fragment cache in the output directory.
+    """
+    if use_cache is None:
+        use_cache = USE_FRAGMENT_CACHE
+    # Download posters
+    print("\nDownloading movie posters...")
+    poster_paths = {}
+    with instrumentation.span("site.posters"):
+        for title, data in movies.items():
+            poster_url = data.get('poster')
+            if poster_url and poster_url != 'N/A':
+                local_path = download_poster(poster_url, title)
+                if local_path:
+                    poster_paths[title] = local_path
+
+    print(f"Downloaded {len(poster_paths)} posters")
+
+    # Generate movie grid HTML, reusing the cards of unchanged movies
+    fragments = FragmentCache() if use_cache else None
+    cards = []
+    with instrumentation.span("site.render"):
+        for title, data in movies.items():
+            movie_info = {
+                'title': title,
+                'year': data['year'],
+                'omdb_rating': data['omdb_rating'],
+                'user_rating': data.get('user_rating'),
+                'poster': data.get('poster')
+            }
+            local_poster = poster_paths.get(title)
+            if fragments is None:
+                cards.append(generate_movie_html(movie_info, local_poster))
+            else:
+                cards.append(fragments.card(movie_info, local_poster))
+    movie_grid_html = "".join(cards)
+    if fragments is not None:
+        instrumentation.count("site.fragments_reused", fragments.hits)
+        instrumentation.count("site.fragments_rendered", fragments.misses)
+        with instrumentation.span("site.fragment_cache"):
+            fragments.save()
+
+    return render_page(movie_grid_html, len(movies))
+
+
+@instrumentation.traced("site.generate_website")
+def generate_website(open_browser=True):
     """Main function to generate the complete website."""
     print("Generating movie website...")
     print("-" * 40)
@@ -416,7 +543,8 @@ def generate_website():
     create_output_directory()
 
     # Get movies from database
-    movies = get_movies()
+    with instrumentation.span("site.load_movies"):
+        movies = get_movies()
     if not movies:
         print("No movies found in database!")
         return
@@ -427,16 +555,16 @@ def generate_website():
     save_css()
 
     # Generate and save HTML
-    html_content = generate_html(movies)
-    html_path = os.path.join(OUTPUT_DIR, HTML_FILE)
-    with open(html_path, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    html_path = write_page(generate_html(movies))
     print(f"Created HTML file: {html_path}")
 
     print("-" * 40)
     print("Website generated successfully!")
     print(f"Open {html_path} in your browser to view.")
 
+    if not open_browser:
+        return
+
     # Try to open in default browser
     try:
         import webbrowser
@@ -0,0 +1,407 @@
+"""
+Watch mode for the static website.
+
+Keeps website/ in step with the database while it runs:
+
+1. A dedicated connection polls ``PRAGMA data_version``, which changes
+   whenever another connection commits a write. Bursts of writes are
+   debounced: the rebuild starts once the database has been quiet for
+   --debounce seconds, but never later than --max-delay after the first
+   write.
+2. The movies that changed are read from the change log (movie_changes), and
+   only their cards are re-rendered (and their posters fetched). The page is
+   reassembled from the cached cards of every other movie and written only if
+   it actually differs. If the log was compacted past our cursor, the site is
+   rebuilt from scratch.
+3. website/ is served over HTTP. Served pages carry a small script that
+   long-polls /__reload and reloads the page after each rebuild.
+   /__metrics reports rebuild latencies.
+
+Usage:
+    python website_watch.py [--port 8001] [--no-serve] [--debounce 0.25]
+"""
+import argparse
+import bisect
+import json
+import os
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import instrumentation
+import movie_storage_sql as storage
+import website_generator as site
+
+POLL_INTERVAL = 0.1
+DEBOUNCE = 0.25
+MAX_DELAY = 0.5
+# Long-poll requests are answered after this many seconds even without a rebuild
+RELOAD_TIMEOUT = 25
+METRICS_KEPT = 200
+
+RELOAD_SCRIPT = """<script>
+(function poll(version) {
+    fetch("/__reload?since=" + version)
+        .then(function (response) { return response.json(); })
+        .then(function (data) { if (data.version > version) location.reload(); else poll(version); })
+        .catch(function () { setTimeout(function () { poll(version); }, 1000); });
+})(%d);
+</script>
+"""
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class IncrementalSite:
+    """The rendered movie cards, patched from the change log.
+
+    Cards are cached per movie id together with their position in the title
+    order, so a change costs one card render plus reassembling the page.
+    Remakes sharing a title are shown as 'Title (year)', as in a full build,
+    so cards of movies whose title is shared by a changed movie are
+    re-rendered too.
+    """
+
+    def __init__(self):
+        self.cursor = 0
+        self.version = 0                # bumped whenever index.html is rewritten
+        self._movies = {}               # id -> (title, year, sort key)
+        self._cards = {}                # id -> card HTML
+        self._order = []                # sorted title_sort_key()s, ending in the id
+        self._by_title = {}             # title -> set of ids
+        self._html = None
+        self._changed = threading.Condition()
+
+    def full_build(self):
+        """Render every movie; returns the number of cards rendered."""
+        # Take the cursor first: changes committed during the scan are
+        # applied again afterwards, which is harmless
+        self.cursor = storage.get_latest_change_seq()
+        self._movies, self._cards, self._order, self._by_title = {}, {}, [], {}
+        site.create_output_directory()
+        site.save_css()
+        movies = {movie["id"]: movie for movie in storage.iter_movies()}
+        for movie in movies.values():
+            self._by_title.setdefault(movie["title"], set()).add(movie["id"])
+        for movie in movies.values():
+            self._render(movie, keep_order=False)
+        self._order.sort()
+        self._write()
+        return len(movies)
+
+    def apply_changes(self):
+        """Apply the logged changes since the cursor.
+
+        Returns (kind, changes read, cards rendered), kind being
+        "incremental", or "full" when the log no longer reaches back to the
+        cursor and everything was rebuilt.
+        """
+        changes = []
+        try:
+            while True:
+                batch = storage.get_changes_since(self.cursor)
+                if not batch:
+                    break
+                changes.extend(batch)
+                self.cursor = batch[-1]["seq"]
+        except storage.ChangesCompacted:
+            return "full", 0, self.full_build()
+        if not changes:
+            return "incremental", 0, 0
+
+        changed_ids = {change["movie_id"] for change in changes}
+        current = storage.get_movies_by_ids(changed_ids)
+        affected_titles = set()
+        for movie_id in changed_ids:
+            if movie_id in self._movies:
+                old_title = self._movies[movie_id][0]
+                affected_titles.add(old_title)
+                self._by_title[old_title].discard(movie_id)
+                if not self._by_title[old_title]:
+                    del self._by_title[old_title]
+                self._remove(movie_id)
+        for movie in current.values():
+            affected_titles.add(movie["title"])
+            self._by_title.setdefault(movie["title"], set()).add(movie["id"])
+
+        # The changed movies plus unchanged ones sharing their (old or new) title
+        to_render = dict(current)
+        neighbours = {movie_id for title in affected_titles
+                      for movie_id in self._by_title.get(title, ()) if movie_id not in current}
+        if neighbours:
+            to_render.update(storage.get_movies_by_ids(neighbours))
+        for movie_id, movie in to_render.items():
+            if movie_id in self._movies:
+                self._remove(movie_id)
+            self._render(movie)
+        self._write()
+        return "incremental", len(changes), len(to_render)
+
+    def _display_title(self, movie):
+        if len(self._by_title.get(movie["title"], ())) > 1:
+            return f"{movie['title']} ({movie['year']})"
+        return movie["title"]
+
+    def _render(self, movie, keep_order=True):
+        title = self._display_title(movie)
+        poster = None
+        if movie.get("poster") and movie["poster"] != "N/A":
+            poster = site.download_poster(movie["poster"], title)
+        self._cards[movie["id"]] = site.generate_movie_html(
+            {**movie, "title": title}, poster
+        )
+        key = storage.title_sort_key(movie["title"], movie["year"], movie["id"])
+        self._movies[movie["id"]] = (movie["title"], movie["year"], key)
+        if keep_order:
+            bisect.insort(self._order, key)
+        else:
+            self._order.append(key)
+
+    def _remove(self, movie_id):
+        _, _, key = self._movies.pop(movie_id)
+        del self._cards[movie_id]
+        del self._order[bisect.bisect_left(self._order, key)]
+
+    def _write(self):
+        with instrumentation.span("site.render"):
+            html = site.render_page("".join(self._cards[key[-1]] for key in self._order),
+                                    len(self._order))
+        if html == self._html:
+            return
+        site.write_page(html)
+        self._html = html
+        with self._changed:
+            self.version += 1
+            self._changed.notify_all()
+
+    def wait_for_version(self, since, timeout):
+        """Block until the page version exceeds ``since`` (or the timeout)."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version > since, timeout)
+            return self.version
+
+
+class RebuildMetrics:
+    """Timings of recent rebuilds, in milliseconds."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rebuilds = []
+        self.skipped = 0
+
+    def record(self, kind, changes, cards, wait, build):
+        entry = {
+            "kind": kind,
+            "changes": changes,
+            "cards": cards,
+            "debounce_ms": round(wait * 1000, 1),
+            "build_ms": round(build * 1000, 1),
+            "latency_ms": round((wait + build) * 1000, 1),
+            "at": time.strftime("%H:%M:%S")
+        }
+        with self._lock:
+            self.rebuilds.append(entry)
+            del self.rebuilds[:-METRICS_KEPT]
+        return entry
+
+    def skip(self):
+        with self._lock:
+            self.skipped += 1
+
+    def summary(self):
+        with self._lock:
+            rebuilds = list(self.rebuilds)
+            skipped = self.skipped
+        incremental = [entry for entry in rebuilds if entry["kind"] == "incremental"]
+
+        def spread(key):
+            values = [entry[key] for entry in incremental]
+            return {"p50": _percentile(values, 0.5), "p90": _percentile(values, 0.9),
+                    "max": max(values, default=None)}
+
+        return {
+            "rebuilds": len(rebuilds),
+            "incremental": len(incremental),
+            "skipped": skipped,
+            "build_ms": spread("build_ms"),
+            "latency_ms": spread("latency_ms"),
+            "last": rebuilds[-1] if rebuilds else None
+        }
+
+
+class DatabaseWatcher:
+    """Detects commits by other connections with PRAGMA data_version."""
+
+    def __init__(self, poll_interval=POLL_INTERVAL, debounce=DEBOUNCE, max_delay=MAX_DELAY):
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.max_delay = max_delay
+        # data_version is per connection, so this one stays open and is
+        # never used for writes
+        self._connection = storage.engine.connect()
+        self._version = self._data_version()
+
+    def _data_version(self):
+        return self._connection.exec_driver_sql("PRAGMA data_version").scalar_one()
+
+    def wait_for_change(self, stop):
+        """Block until a debounced burst of writes ends; returns the seconds waited
+        after the first write, or None if ``stop`` was set."""
+        while not stop.wait(self.poll_interval):
+            version = self._data_version()
+            if version == self._version:
+                continue
+            first_write = time.perf_counter()
+            self._version = version
+            while True:
+                remaining = self.max_delay - (time.perf_counter() - first_write)
+                if remaining <= 0 or stop.wait(min(self.debounce, remaining)):
+                    break
+                version = self._data_version()
+                if version == self._version:
+                    break
+                self._version = version
+            return time.perf_counter() - first_write
+        return None
+
+    def close(self):
+        self._connection.close()
+
+
+def watch(incremental_site, metrics, stop, watcher=None, verbose=True):
+    """Rebuild the site after every burst of writes until ``stop`` is set."""
+    watcher = watcher or DatabaseWatcher()
+    try:
+        while True:
+            waited = watcher.wait_for_change(stop)
+            if waited is None:
+                return
+            started = time.perf_counter()
+            with instrumentation.span("site.incremental_build"):
+                kind, changes, cards = incremental_site.apply_changes()
+            if not cards:
+                # Commits that changed nothing on the page (stats, cursors, ...)
+                metrics.skip()
+                continue
+            entry = metrics.record(kind, changes, cards, waited,
+                                   time.perf_counter() - started)
+            if verbose:
+                print(f"[{entry['at']}] Rebuilt {cards} card(s) for {changes} change(s) "
+                      f"in {entry['build_ms']} ms ({entry['latency_ms']} ms after the write)")
+    finally:
+        watcher.close()
+
+
+class LiveReloadHandler(SimpleHTTPRequestHandler):
+    """Serves website/ and injects the live-reload script into pages."""
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/__reload":
+            try:
+                since = int(parse_qs(url.query).get("since", ["0"])[0])
+            except ValueError:
+                since = 0
+            version = self.server.site.wait_for_version(since, RELOAD_TIMEOUT)
+            self._send(200, "application/json", json.dumps({"version": version}).encode("utf-8"))
+        elif url.path == "/__metrics":
+            self._send(200, "application/json",
+                       json.dumps(self.server.metrics.summary(), indent=2).encode("utf-8"))
+        elif url.path in ("/", "/" + site.HTML_FILE):
+            version = self.server.site.version
+            try:
+                with open(os.path.join(site.OUTPUT_DIR, site.HTML_FILE), encoding="utf-8") as f:
+                    html = f.read()
+            except FileNotFoundError:
+                self.send_error(404, "The site has not been built yet")
+                return
+            html = html.replace("</body>", RELOAD_SCRIPT % version + "</body>", 1)
+            self._send(200, "text/html; charset=utf-8", html.encode("utf-8"))
+        else:
+            super().do_GET()
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def start_server(incremental_site, metrics, host="127.0.0.1", port=0, verbose=False):
+    """Serve the site in a background thread; returns (server, base_url)."""
+    handler = partial(LiveReloadHandler, directory=os.path.abspath(site.OUTPUT_DIR))
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.site = incremental_site
+    server.metrics = metrics
+    server.verbose = verbose
+    thread = threading.Thread(target=server.serve_forever, name="site-server", daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate the website whenever the database changes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--no-serve", action="store_true", help="only rebuild, don't serve the site")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE,
+                        help="quiet seconds to wait for after a write (default: %(default)s)")
+    parser.add_argument("--max-delay", type=float, default=MAX_DELAY,
+                        help="rebuild at most this many seconds after the first write "
+                             "(default: %(default)s)")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    parser.add_argument("--collection", metavar="NAME",
+                        help="watch this collection (its site goes to website/NAME)")
+    args = parser.parse_args()
+
+    if args.collection:
+        storage.use_collection(args.collection)
+        site.use_collection_output_dir()
+
+    incremental_site = IncrementalSite()
+    metrics = RebuildMetrics()
+    started = time.perf_counter()
+    cards = incremental_site.full_build()
+    entry = metrics.record("full", 0, cards, 0, time.perf_counter() - started)
+    print(f"Built {cards} movie cards in {entry['build_ms']} ms")
+
+    server = None
+    if not args.no_serve:
+        server, base_url = start_server(incremental_site, metrics, args.host, args.port, args.verbose)
+        print(f"Serving {site.OUTPUT_DIR}/ at {base_url} with live reload "
+              f"(metrics at {base_url}/__metrics)")
+    print(f"Watching {storage.engine.url}; press Ctrl+C to stop")
+
+    stop = threading.Event()
+    watcher = DatabaseWatcher(debounce=args.debounce, max_delay=args.max_delay)
+    try:
+        watch(incremental_site, metrics, stop, watcher)
+    except KeyboardInterrupt:
+        stop.set()
+        print("\nStopping")
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        summary = metrics.summary()
+        latency = summary["latency_ms"]
+        print(f"{summary['incremental']} incremental rebuild(s), {summary['skipped']} skipped; "
+              f"latency ms p50 {latency['p50']}  p90 {latency['p90']}  max {latency['max']}")
+
+
+if __name__ == "__main__":
+    main()